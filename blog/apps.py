@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class BlogConfig(AppConfig):
     name = 'blog'
     verbose_name = '博客'
+
+    def ready(self):
+        # 注册信号处理函数
+        from . import signals  # noqa: F401
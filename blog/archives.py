@@ -0,0 +1,73 @@
+from collections import Counter
+from datetime import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.utils import timezone
+
+from .models import ArchiveMonth, Blog
+
+
+def archive_month(created_time):
+    """发布时间所属的归档月份(按当前时区)"""
+    local = timezone.localtime(created_time)
+    return local.year, local.month
+
+
+def month_range(year, month=None):
+    """
+    年份/月份对应的发布时间区间[start, end)
+
+    以区间条件代替created_time__year/__month, 查询可以使用created_time上的索引
+    """
+    if month is None:
+        start, end = datetime(year, 1, 1), datetime(year + 1, 1, 1)
+    else:
+        start = datetime(year, month, 1)
+        end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return timezone.make_aware(start), timezone.make_aware(end)
+
+
+def archive_filter(queryset, year, month=None):
+    """按归档年份/月份过滤博客, 年份或月份无效时返回空结果"""
+    try:
+        start, end = month_range(int(year), None if month is None else int(month))
+    except (TypeError, ValueError, OverflowError):
+        return queryset.none()
+    return queryset.filter(created_time__gte=start, created_time__lt=end)
+
+
+def update_archive_counts(counts):
+    """
+    按{(year, month): delta}增减归档月份的博客数
+
+    使用F()原子更新, 并发发布博客时计数不会丢失; 月份不存在时创建
+    """
+    for (year, month), delta in counts.items():
+        if not delta:
+            continue
+        updated = ArchiveMonth.objects.filter(year=year, month=month).update(blog_count=F('blog_count') + delta)
+        if updated or delta < 0:
+            continue
+        try:
+            with transaction.atomic():
+                ArchiveMonth.objects.create(year=year, month=month, blog_count=delta)
+        except IntegrityError:
+            # 其他请求已创建该月份
+            ArchiveMonth.objects.filter(year=year, month=month).update(blog_count=F('blog_count') + delta)
+
+
+def rebuild_archives():
+    """全表统计重建归档数据, 返回归档月份数"""
+    counts = Counter({
+        (row['year'], row['month']): row['blog_count']
+        for row in Blog.objects.annotate(year=ExtractYear('created_time'), month=ExtractMonth('created_time'))
+        .values('year', 'month').order_by().annotate(blog_count=Count('pk'))
+    })
+    with transaction.atomic():
+        ArchiveMonth.objects.all().delete()
+        ArchiveMonth.objects.bulk_create([
+            ArchiveMonth(year=year, month=month, blog_count=count) for (year, month), count in counts.items()
+        ])
+    return len(counts)
@@ -0,0 +1,206 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import posixpath
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.http import FileResponse, Http404
+from django.templatetags.static import static
+from django.utils.html import format_html_join
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+# 构建产物目录, 位于blog应用的静态文件目录中, 对应的静态文件路径为blog/dist/
+DIST_DIR = Path(__file__).resolve().parent / 'static' / 'blog' / 'dist'
+DIST_PREFIX = 'blog/dist/'
+MANIFEST_FILE = DIST_DIR / 'manifest.json'
+
+# 代码高亮主题, 每个主题单独构建
+HIGHLIGHT_THEMES = sorted(
+    path.stem for path in (Path(__file__).resolve().parent / 'static' / 'blog' / 'css' / 'highlights').glob('*.css')
+)
+
+# 资源包名称 -> 按顺序合并的静态文件
+BUNDLES = {
+    'blog.css': ['blog/css/bootstrap.min.css', 'blog/css/pace.css', 'blog/css/custom.css'],
+    # 页面头部加载的第三方脚本
+    'blog-vendor.js': [
+        'blog/js/jquery-2.1.3.min.js', 'blog/js/bootstrap.min.js', 'blog/js/pace.min.js',
+        'blog/js/modernizr.custom.js',
+    ],
+    # 页面底部加载的脚本, 需要页面元素已经存在
+    'blog.js': ['blog/js/script.js'],
+    **{f'highlights/{theme}.css': [f'blog/css/highlights/{theme}.css'] for theme in HIGHLIGHT_THEMES},
+}
+
+# 构建产物带有内容哈希, 内容变化时文件名随之变化, 浏览器可以永久缓存
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+CSS_STRING_RE = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''')
+CSS_URL_RE = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+
+def minify_css(css):
+    """
+    去除CSS注释与多余空白
+
+    安装了rcssmin时使用rcssmin; 否则按字符串分段处理, 字符串内容保持不变
+    """
+    if rcssmin is not None:
+        return rcssmin.cssmin(css)
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    parts = CSS_STRING_RE.split(css)
+    for i in range(0, len(parts), 2):
+        part = re.sub(r'\s+', ' ', parts[i])
+        part = re.sub(r'\s*([{};,>])\s*', r'\1', part)
+        part = part.replace(';}', '}')
+        parts[i] = part
+    return ''.join(parts).strip()
+
+
+def minify_js(js):
+    """
+    压缩JavaScript
+
+    安装了rjsmin时使用rjsmin; 否则只做保守的处理: 去除行首尾空白/空行/整行的//注释
+    """
+    if rjsmin is not None:
+        return rjsmin.jsmin(js)
+    lines = (line.strip() for line in js.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+def rewrite_css_urls(css, source, target):
+    """CSS合并到其他目录后, 将相对路径的url()改为相对于合并后的文件"""
+    source_dir, target_dir = posixpath.dirname(source), posixpath.dirname(target)
+
+    def rewrite(match):
+        quote, url = match.groups()
+        if url.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+            return match.group(0)
+        path = posixpath.normpath(posixpath.join(source_dir, url))
+        return f'url({quote}{posixpath.relpath(path, target_dir)}{quote})'
+
+    return CSS_URL_RE.sub(rewrite, css)
+
+
+def build_bundle(name, sources):
+    """合并并压缩资源包, 返回内容(bytes)"""
+    target = DIST_PREFIX + name
+    contents = []
+    for source in sources:
+        path = finders.find(source)
+        if path is None:
+            raise FileNotFoundError(f'找不到静态文件 {source}')
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+        if name.endswith('.css'):
+            contents.append(minify_css(rewrite_css_urls(text, source, target)))
+        else:
+            contents.append(minify_js(text))
+    # 脚本之间加分号, 防止前一个文件末尾缺少分号
+    separator = '\n' if name.endswith('.css') else ';\n'
+    return separator.join(contents).encode('utf-8')
+
+
+def hashed_name(name, content):
+    stem, ext = posixpath.splitext(name)
+    return f'{stem}.{hashlib.sha256(content).hexdigest()[:12]}{ext}'
+
+
+def build(bundles=None):
+    """
+    构建全部资源包: 写入带内容哈希的文件与gzip预压缩文件, 生成清单, 删除过期的构建产物
+
+    返回清单{资源包名称: 静态文件路径}
+    """
+    bundles = BUNDLES if bundles is None else bundles
+    manifest, written = {}, set()
+    for name, sources in bundles.items():
+        content = build_bundle(name, sources)
+        filename = hashed_name(name, content)
+        path = DIST_DIR / filename
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+        # mtime固定为0, 内容相同时压缩结果相同
+        gz_path = path.with_name(path.name + '.gz')
+        gz_path.write_bytes(gzip.compress(content, compresslevel=9, mtime=0))
+        written.update([path, gz_path])
+        manifest[name] = DIST_PREFIX + filename
+
+    for path in DIST_DIR.rglob('*'):
+        if path.is_file() and path not in written and path != MANIFEST_FILE:
+            path.unlink()
+    MANIFEST_FILE.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding='utf-8')
+    _manifest_cache.clear()
+    return manifest
+
+
+_manifest_cache = {}
+
+
+def load_manifest():
+    """读取构建清单, 文件修改后重新读取; 未构建时返回空字典"""
+    try:
+        mtime = MANIFEST_FILE.stat().st_mtime
+    except FileNotFoundError:
+        return {}
+    if _manifest_cache.get('mtime') != mtime:
+        with open(MANIFEST_FILE, encoding='utf-8') as f:
+            _manifest_cache.update(mtime=mtime, manifest=json.load(f))
+    return _manifest_cache['manifest']
+
+
+def bundle_urls(name):
+    """资源包的URL列表: 已构建时为构建产物, 否则为合并前的各个文件"""
+    manifest = load_manifest()
+    if name in manifest:
+        return [static(manifest[name])]
+    return [static(source) for source in BUNDLES[name]]
+
+
+def bundle_tags(name):
+    urls = bundle_urls(name)
+    if name.endswith('.css'):
+        return format_html_join('\n', '<link rel="stylesheet" href="{}">', ((url,) for url in urls))
+    return format_html_join('\n', '<script src="{}"></script>', ((url,) for url in urls))
+
+
+def serve(request, path):
+    """
+    提供构建产物: 浏览器支持时返回gzip预压缩文件, 响应允许永久缓存
+
+    开发环境的runserver在URL配置之前处理静态文件请求, 不会使用此视图
+    """
+    full_path = (DIST_DIR / path).resolve()
+    if DIST_DIR not in full_path.parents or full_path.suffix == '.gz' or not full_path.is_file():
+        raise Http404
+    content_type = mimetypes.guess_type(full_path.name)[0] or 'application/octet-stream'
+
+    gz_path = full_path.with_name(full_path.name + '.gz')
+    use_gzip = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '') and gz_path.is_file()
+    response = FileResponse(open(gz_path if use_gzip else full_path, 'rb'), content_type=content_type)
+    if use_gzip:
+        response['Content-Encoding'] = 'gzip'
+    response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+def serve_pattern():
+    """构建产物的URL正则, 由STATIC_URL确定"""
+    prefix = settings.STATIC_URL.lstrip('/') + DIST_PREFIX
+    return rf'^{re.escape(prefix)}(?P<path>.+)$'
+
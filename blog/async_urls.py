@@ -0,0 +1,4 @@
+from .urls import app_name, get_urlpatterns  # noqa: F401
+
+# 与blog.urls相同的路由, 页面使用异步视图
+urlpatterns = get_urlpatterns(async_views=True)
@@ -0,0 +1,35 @@
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from .routers import use_primary
+
+# 缓存的用户对象的有效期(秒), 用户信息修改/删除时主动失效
+USER_CACHE_TIMEOUT = 60 * 60
+
+
+def user_cache_key(user_id):
+    return f'blog:user:{user_id}'
+
+
+def invalidate_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    从缓存读取已登录用户的认证后端
+
+    AuthenticationMiddleware在每个已登录的请求中按会话中的用户id调用get_user,
+    默认每次查询一次用户表; 用户信息很少变化, 缓存后只在修改(信号中失效)或过期时查询.
+    写入缓存的用户读取主库: 从库延迟时读到的修改密码/停用前的用户会在缓存中保留一小时
+    """
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            with use_primary():
+                user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, USER_CACHE_TIMEOUT)
+        return user
@@ -0,0 +1,414 @@
+import asyncio
+import json
+import statistics
+import time
+import tracemalloc
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from asgiref.sync import async_to_sync
+from django.db import connection, connections
+from django.core.cache import cache
+from django.db.models import Max
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.pagination import Cursor
+from rest_framework.renderers import JSONRenderer
+
+from .counters import page_view_buffer
+from .models import Blog, Comment, MyUser
+from .pagination import KeysetPagination
+from .renderers import renderer_pool
+from .serializers import BlogListSerializer, BlogRetrieveSerializer, FastJSONRenderer, \
+    fast_blog_list_serializer, fast_blog_retrieve_serializer
+from .throttling import override_rates, throttle_store
+
+# 基准测试中发表的评论内容
+COMMENT_TEXT = '测试评论'
+# 基准测试中的限流频率: 仍然统计限流的开销, 但不会拒绝请求
+BENCHMARK_THROTTLE_RATE = '1000000/min'
+
+# name: 报告中的名称, auth: 是否需要登录, status: 期望的响应状态码
+Endpoint = namedtuple('Endpoint', ['name', 'method', 'path', 'data', 'auth', 'status'])
+
+
+def endpoint(name, path, method='get', data=None, auth=False, status=200):
+    return Endpoint(name, method, path, data, auth, status)
+
+
+def default_endpoints():
+    """根据数据库中的数据生成需要测试的全部页面与接口"""
+    blog = Blog.objects.select_related('category', 'author').order_by('-created_time', '-id').first()
+    if blog is None:
+        raise ValueError('数据库中没有博客, 请先生成测试数据')
+    tag = blog.tags.first()
+    total = Blog.objects.count()
+    # 位于中间位置的博客, 用于测试深度翻页
+    middle = Blog.objects.order_by('-created_time', '-id').only('pk', 'created_time')[total // 2]
+    paginator = KeysetPagination()
+    paginator.base_url = reverse('blog:blog-list')
+    deep_cursor = paginator.encode_cursor(Cursor(offset=0, reverse=False, position=(middle.created_time, middle.pk)))
+
+    endpoints = [
+        endpoint('list', reverse('blog:list')),
+        endpoint('list (deep page)', reverse('blog:list') + f'?page={max(total // 5 // 2, 1)}'),
+        endpoint('detail', reverse('blog:detail', kwargs={'pk': blog.pk})),
+        endpoint('archive', reverse('blog:archive', kwargs={
+            'year': blog.created_time.year, 'month': blog.created_time.month,
+        })),
+        endpoint('category', reverse('blog:category', kwargs={'pk': blog.category_id})),
+        endpoint('author', reverse('blog:author', kwargs={'pk': blog.author_id})),
+        endpoint('search', reverse('blog:search') + f'?query={blog.title.split()[0][:4]}'),
+        endpoint('create (form)', reverse('blog:create'), auth=True),
+        endpoint('comment (post)', reverse('blog:comment', kwargs={'pk': blog.pk}), method='post',
+                 data={'text': COMMENT_TEXT}, auth=True, status=302),
+        endpoint('login', reverse('login:login')),
+        endpoint('register', reverse('login:register')),
+        endpoint('api blog list', reverse('blog:blog-list')),
+        endpoint('api blog list (deep page)', deep_cursor),
+        endpoint('api blog retrieve', reverse('blog:blog-detail', kwargs={'pk': blog.pk})),
+        endpoint('api blog comments', reverse('blog:blog-list-comments', kwargs={'pk': blog.pk})),
+        endpoint('api blog search', reverse('blog:blog-search') + f'?query={blog.title.split()[0][:4]}'),
+        endpoint('api tag list', reverse('blog:tag-list')),
+        endpoint('api category list', reverse('blog:category-list')),
+        endpoint('api comment list', reverse('blog:comment-list')),
+        endpoint('api comment create', reverse('blog:comment-list'), method='post', data={
+            'text': COMMENT_TEXT, 'blog': blog.pk, 'user': blog.author_id,
+        }, auth=True, status=201),
+    ]
+    if tag is not None:
+        endpoints.append(endpoint('tag', reverse('blog:tag', kwargs={'pk': tag.pk})))
+    return endpoints
+
+
+@contextmanager
+def benchmark_throttling():
+    """基准测试期间使用临时的令牌桶文件(不消耗真实客户端的令牌), 并调高全部限流频率"""
+    with throttle_store.temporary(), override_rates(BENCHMARK_THROTTLE_RATE):
+        yield
+
+
+@contextmanager
+def discard_benchmark_data():
+    """
+    结束后丢弃基准测试产生的阅读量, 并删除测试中发表的评论
+
+    只删除开始后新增的评论, 使用--existing在已有数据上测试时不会删除用户的评论
+    """
+    last_pk = Comment.objects.aggregate(last=Max('id'))['last'] or 0
+    try:
+        yield
+    finally:
+        page_view_buffer.clear()
+        Comment.objects.filter(pk__gt=last_pk, text=COMMENT_TEXT).delete()
+
+
+class Benchmark:
+    """使用测试客户端逐个请求页面/接口, 统计耗时/SQL/内存"""
+
+    def __init__(self, iterations=20, warmup=2, user=None):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.anonymous = Client()
+        self.authenticated = Client()
+        user = user or MyUser.objects.filter(is_superuser=True).first() or MyUser.objects.first()
+        if user is not None:
+            self.authenticated.force_login(user)
+        self._requests = 0
+
+    def request(self, ep):
+        client = self.authenticated if ep.auth else self.anonymous
+        self._requests += 1
+        # 每次请求使用不同的IP, 避免匿名请求被限流
+        remote_addr = f'10.{self._requests // 65536 % 256}.{self._requests // 256 % 256}.{self._requests % 256}'
+        response = getattr(client, ep.method)(ep.path, data=ep.data, REMOTE_ADDR=remote_addr)
+        if response.status_code != ep.status:
+            raise AssertionError(f'{ep.name}: {ep.method.upper()} {ep.path} 返回 {response.status_code}, '
+                                 f'期望 {ep.status}')
+        return response
+
+    def measure(self, ep):
+        for _ in range(self.warmup):
+            self.request(ep)
+
+        latencies, sql_times, query_counts = [], [], []
+        for _ in range(self.iterations):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                self.request(ep)
+                latencies.append((time.perf_counter() - started) * 1000)
+            query_counts.append(len(queries))
+            sql_times.append(sum(float(q['time']) for q in queries.captured_queries) * 1000)
+
+        # 单独请求一次统计内存峰值, 避免tracemalloc影响耗时统计
+        tracemalloc.start()
+        try:
+            self.request(ep)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'queries': max(query_counts),
+            'sql_ms': statistics.mean(sql_times),
+            'peak_kb': peak / 1024,
+        }
+
+    def run(self, endpoints):
+        with benchmark_throttling(), discard_benchmark_data():
+            return {ep.name: self.measure(ep) for ep in endpoints}
+
+
+# 比较吞吐量使用的页面(有异步版本的视图)
+THROUGHPUT_PAGES = ['list', 'detail', 'archive', 'category', 'tag', 'author', 'search']
+
+
+def throughput_benchmark(endpoints=None, concurrency=8, requests=200):
+    """
+    比较WSGI与ASGI部署的吞吐量(请求/秒)
+
+    WSGI: concurrency个线程各自使用同步测试客户端请求(同步视图, 对应多线程的WSGI服务器);
+    ASGI: 在一个事件循环中并发concurrency个异步测试客户端(异步视图, 侧边栏/评论查询并发执行)
+    """
+    if endpoints is None:
+        endpoints = [ep for ep in default_endpoints() if ep.name in THROUGHPUT_PAGES]
+    counts = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+
+    def check(ep, response):
+        if response.status_code != ep.status:
+            raise AssertionError(f'{ep.name}: GET {ep.path} 返回 {response.status_code}, 期望 {ep.status}')
+
+    def wsgi_worker(count):
+        client = Client()
+        try:
+            for i in range(count):
+                ep = endpoints[i % len(endpoints)]
+                check(ep, client.get(ep.path))
+        finally:
+            # 测试客户端不会在请求结束时关闭连接
+            connections.close_all()
+
+    async def asgi_worker(count):
+        client = AsyncClient()
+        for i in range(count):
+            ep = endpoints[i % len(endpoints)]
+            check(ep, await client.get(ep.path))
+
+    async def asgi():
+        await asyncio.gather(*(asgi_worker(count) for count in counts))
+
+    results = {}
+    try:
+        with benchmark_throttling():
+            started = time.perf_counter()
+            with ThreadPoolExecutor(concurrency) as pool:
+                list(pool.map(wsgi_worker, counts))
+            results['wsgi'] = requests / (time.perf_counter() - started)
+
+            started = time.perf_counter()
+            async_to_sync(asgi)()
+            results['asgi'] = requests / (time.perf_counter() - started)
+    finally:
+        page_view_buffer.clear()
+    return results
+
+
+# 比较会话/用户查询使用的页面, 均以登录用户请求
+SESSION_PAGES = ['list', 'detail', 'create (form)', 'comment (post)', 'api comment create']
+
+# 优化前的会话与认证设置: 每个已登录的请求查询一次会话表和一次用户表
+DATABASE_SESSION_SETTINGS = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+    'AUTHENTICATION_BACKENDS': ['django.contrib.auth.backends.ModelBackend'],
+}
+
+
+def session_benchmark(endpoints=None, iterations=5, user=None):
+    """
+    比较数据库会话/认证与缓存会话/认证下, 已登录请求的SQL查询数
+
+    每种设置使用新的测试客户端重新登录(会话引擎与认证后端记录在会话中), 取预热后的最大查询数
+    """
+    if endpoints is None:
+        endpoints = [ep._replace(auth=True) for ep in default_endpoints() if ep.name in SESSION_PAGES]
+    user = user or MyUser.objects.filter(is_superuser=True).first() or MyUser.objects.first()
+
+    def measure():
+        benchmark = Benchmark(iterations=iterations, warmup=1, user=user)
+        counts = {}
+        for ep in endpoints:
+            benchmark.request(ep)
+            queries = []
+            for _ in range(iterations):
+                with CaptureQueriesContext(connection) as captured:
+                    benchmark.request(ep)
+                queries.append(len(captured))
+            counts[ep.name] = max(queries)
+        return counts
+
+    with benchmark_throttling(), discard_benchmark_data():
+        cache.clear()
+        with override_settings(**DATABASE_SESSION_SETTINGS):
+            database = measure()
+        cached = measure()
+    return {name: {'database': database[name], 'cached': cached[name]} for name in database}
+
+
+def format_session_table(results):
+    header = f'{"endpoint":<24}{"db session":>12}{"cached":>8}{"saved":>7}'
+    lines = [header, '-' * len(header)]
+    for name, r in results.items():
+        lines.append(f'{name:<24}{r["database"]:>12}{r["cached"]:>8}{r["database"] - r["cached"]:>7}')
+    return '\n'.join(lines)
+
+
+def renderer_benchmark(documents, rounds=3):
+    """
+    比较每次创建Markdown对象与使用对象池的渲染速度(次/秒)
+
+    documents为{配置: [文本]}, 配置对应renderer_pool中的Markdown配置
+    """
+    results = {}
+    for profile, texts in documents.items():
+        factory = renderer_pool.factories[profile]
+
+        def new_instance():
+            for text in texts:
+                factory().convert(text)
+
+        def pooled():
+            for text in texts:
+                with renderer_pool.renderer(profile) as md:
+                    md.convert(text)
+
+        rates = []
+        for run in [new_instance, pooled]:
+            elapsed = []
+            for _ in range(rounds):
+                started = time.perf_counter()
+                run()
+                elapsed.append(time.perf_counter() - started)
+            rates.append(len(texts) / min(elapsed))
+        results[profile] = {'documents': len(texts), 'new_rps': rates[0], 'pooled_rps': rates[1]}
+    return results
+
+
+def format_renderer_table(results):
+    header = f'{"profile":<12}{"docs":>8}{"new(docs/s)":>14}{"pooled(docs/s)":>16}{"speedup":>9}'
+    lines = [header, '-' * len(header)]
+    for name, r in results.items():
+        lines.append(f'{name:<12}{r["documents"]:>8}{r["new_rps"]:>14.0f}{r["pooled_rps"]:>16.0f}'
+                     f'{r["pooled_rps"] / r["new_rps"]:>8.1f}x')
+    return '\n'.join(lines)
+
+
+def serialization_benchmark(rows=1000, rounds=3):
+    """
+    比较序列化器+JSONRenderer与高性能序列化+FastJSONRenderer的吞吐量(行/秒)
+
+    统计从查询数据到输出JSON的全部耗时, 取rounds轮中最快的一轮
+    """
+    queryset = Blog.objects.select_related('category', 'author').order_by('-created_time', '-id')
+    ids = list(queryset.values_list('id', flat=True)[:rows])
+    if not ids:
+        raise ValueError('数据库中没有博客, 请先生成测试数据')
+
+    def serializer(serializer_class):
+        def run():
+            blogs = queryset.filter(id__in=ids)
+            if serializer_class is BlogRetrieveSerializer:
+                blogs = blogs.prefetch_related('tags')
+            return JSONRenderer().render(serializer_class(blogs, many=True).data)
+        return run
+
+    def fast(fast_serializer):
+        def run():
+            return FastJSONRenderer().render(fast_serializer.to_representation(
+                fast_serializer.values(queryset.filter(id__in=ids))
+            ))
+        return run
+
+    cases = [
+        ('list', serializer(BlogListSerializer), fast(fast_blog_list_serializer)),
+        ('retrieve', serializer(BlogRetrieveSerializer), fast(fast_blog_retrieve_serializer)),
+    ]
+    results = {}
+    for name, *runs in cases:
+        rates = []
+        for run in runs:
+            elapsed = []
+            for _ in range(rounds):
+                started = time.perf_counter()
+                run()
+                elapsed.append(time.perf_counter() - started)
+            rates.append(len(ids) / min(elapsed))
+        results[name] = {'rows': len(ids), 'serializer_rps': rates[0], 'fast_rps': rates[1]}
+    return results
+
+
+def format_serialization_table(results):
+    header = f'{"serializer":<12}{"rows":>8}{"drf(rows/s)":>14}{"fast(rows/s)":>14}{"speedup":>9}'
+    lines = [header, '-' * len(header)]
+    for name, r in results.items():
+        lines.append(f'{name:<12}{r["rows"]:>8}{r["serializer_rps"]:>14.0f}{r["fast_rps"]:>14.0f}'
+                     f'{r["fast_rps"] / r["serializer_rps"]:>8.1f}x')
+    return '\n'.join(lines)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))
+    return values[index]
+
+
+def compare(results, baseline, tolerance=0.2, min_delta_ms=1.0):
+    """
+    与基准结果比较, 返回退化项列表
+
+    耗时超过基准(1 + tolerance)倍且差值超过min_delta_ms毫秒, 或SQL查询数增加时视为退化
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for key in ['p50_ms', 'p95_ms']:
+            if result[key] > base[key] * (1 + tolerance) and result[key] - base[key] > min_delta_ms:
+                regressions.append(f'{name}: {key} {base[key]:.2f} -> {result[key]:.2f}')
+        if result['queries'] > base['queries']:
+            regressions.append(f'{name}: queries {base["queries"]} -> {result["queries"]}')
+    return regressions
+
+
+def format_table(results, baseline=None):
+    baseline = baseline or {}
+    header = f'{"endpoint":<28}{"p50(ms)":>10}{"p95(ms)":>10}{"queries":>9}{"sql(ms)":>10}{"peak(KB)":>10}'
+    lines = [header, '-' * len(header)]
+    for name, r in results.items():
+        line = f'{name:<28}{r["p50_ms"]:>10.2f}{r["p95_ms"]:>10.2f}{r["queries"]:>9}' \
+               f'{r["sql_ms"]:>10.2f}{r["peak_kb"]:>10.1f}'
+        base = baseline.get(name)
+        if base is not None:
+            line += f'  (p50 {_change(r["p50_ms"], base["p50_ms"])}, queries {base["queries"]}->{r["queries"]})'
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def _change(value, base):
+    if not base:
+        return 'n/a'
+    return f'{(value - base) / base:+.0%}'
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(path, results):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
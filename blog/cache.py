@@ -0,0 +1,60 @@
+import time
+
+from django.core.cache import cache
+
+from .routers import use_primary
+
+# 侧边栏缓存命名空间, 博客/分类/标签变化时递增版本号
+SIDEBAR = 'sidebar'
+# 评论命名空间, 任意评论变化时递增版本号
+COMMENTS = 'comments'
+
+
+def model_namespace(model):
+    """模型的缓存命名空间, 该模型的数据变化时递增版本号"""
+    return f'model:{model._meta.label_lower}'
+
+
+def comments_namespace(blog_pk):
+    """单篇博客评论列表的缓存命名空间"""
+    return f'comments:{blog_pk}'
+
+
+def _generation_key(namespace):
+    return f'blog:generation:{namespace}'
+
+
+def get_generation(namespace):
+    """获取命名空间当前的版本号"""
+    key = _generation_key(namespace)
+    generation = cache.get(key)
+    if generation is None:
+        # 版本号丢失(缓存被清空或淘汰)时以当前时间重新初始化, 避免与旧版本号重复而读到过期数据
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(*namespaces):
+    """
+    更换命名空间的版本号, 使该命名空间下的所有缓存失效
+
+    以当前时间作为新版本号直接写入, 不使用incr: FileBasedCache等后端的incr是非原子的读取-加一-写入,
+    两个进程同时递增会得到相同的版本号, 其间按旧数据生成的缓存就会留在新版本号下
+    """
+    for namespace in namespaces:
+        cache.set(_generation_key(namespace), time.time_ns(), None)
+
+
+def versioned_key(namespace, *parts):
+    """生成带有命名空间版本号的缓存键"""
+    return ':'.join(['blog', namespace, str(get_generation(namespace)), *map(str, parts)])
+
+
+def get_or_set_versioned(namespace, parts, default, timeout=None):
+    """读取带版本号的缓存, 不存在时调用default()生成并写入缓存, 生成时读取主库"""
+    def fill():
+        with use_primary():
+            return default()
+
+    return cache.get_or_set(versioned_key(namespace, *parts), fill, timeout)
@@ -0,0 +1,34 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+
+def _in_own_thread(func):
+    def wrapper():
+        try:
+            return func()
+        finally:
+            # 线程池中的线程不会收到request_finished信号, 查询结束后按CONN_MAX_AGE处理连接
+            close_old_connections()
+    return wrapper
+
+
+def run_query(func):
+    """
+    在异步视图中执行同步的查询函数
+
+    Django 3.2没有异步ORM, 开启ASYNC_CONCURRENT_QUERIES时查询在线程池的独立线程中执行,
+    每个线程使用独立的数据库连接, 多个查询可以同时进行; 否则与其他同步代码一样在同一线程中依次执行
+    """
+    if getattr(settings, 'ASYNC_CONCURRENT_QUERIES', False):
+        return sync_to_async(_in_own_thread(func), thread_sensitive=False)()
+    return sync_to_async(func)()
+
+
+async def gather_queries(funcs):
+    """并发执行{名称: 查询函数}中的全部查询, 返回{名称: 结果}"""
+    names = list(funcs)
+    results = await asyncio.gather(*(run_query(funcs[name]) for name in names))
+    return dict(zip(names, results))
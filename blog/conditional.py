@@ -0,0 +1,40 @@
+import hashlib
+
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+
+def make_etag(request, *parts):
+    """
+    根据校验数据生成ETag
+
+    页面内容与当前用户有关(导航栏/评论表单), 因此ETag包含用户id;
+    有待显示的消息时页面内容无法由校验数据确定, 返回None不做条件请求处理
+    """
+    if get_messages(request):
+        return None
+    parts = [getattr(request.user, 'pk', None), *parts]
+    return hashlib.md5('|'.join(map(str, parts)).encode()).hexdigest()
+
+
+def conditional_response(request, etag, last_modified, get_response):
+    """
+    条件请求处理: If-None-Match/If-Modified-Since与校验器匹配时直接返回304,
+    不调用get_response渲染页面或序列化数据; 否则为响应设置ETag/Last-Modified
+    """
+    if etag is not None:
+        etag = quote_etag(etag)
+    timestamp = int(last_modified.timestamp()) if last_modified is not None else None
+
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        return response
+
+    response = get_response()
+    if 200 <= response.status_code < 300:
+        if etag is not None and not response.has_header('ETag'):
+            response['ETag'] = etag
+        if timestamp is not None and not response.has_header('Last-Modified'):
+            response['Last-Modified'] = http_date(timestamp)
+    return response
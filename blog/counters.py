@@ -0,0 +1,126 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+
+from .routers import untracked_writes
+
+logger = logging.getLogger(__name__)
+
+
+class PageViewBuffer:
+    """
+    博客阅读量写缓冲
+
+    每次访问只在进程内存中累加, 未写入的阅读量达到阈值或距上次写入超过间隔时,
+    按增量分组批量执行 UPDATE ... SET page_view = page_view + n, 避免每次访问都写一行,
+    也避免多进程同时 读取-加一-保存 造成的更新丢失
+    """
+
+    def __init__(self, flush_threshold=100, flush_interval=10, background=True):
+        self.flush_threshold = flush_threshold
+        self.flush_interval = flush_interval
+        # 为False时不启动定时写入线程, 只在计数时按阈值/间隔写入
+        self.background = background
+        self._pending = Counter()
+        # 正在写入数据库的增量, 写入完成前仍计入pending()
+        self._inflight = Counter()
+        self._pending_total = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+
+    def incr(self, pk, n=1):
+        with self._lock:
+            self._pending[pk] += n
+            self._pending_total += n
+            due = (self._pending_total >= self.flush_threshold
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+        if self.background:
+            self._ensure_timer()
+        if due:
+            self.flush()
+
+    def pending(self, pk):
+        """某篇博客尚未写入数据库的阅读量"""
+        return self._pending.get(pk, 0) + self._inflight.get(pk, 0)
+
+    def clear(self):
+        """丢弃缓冲的阅读量"""
+        with self._lock:
+            self._pending.clear()
+            self._pending_total = 0
+
+    def flush(self):
+        """将缓冲的阅读量写入数据库, 返回写入的阅读量总数"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, Counter()
+                self._inflight.update(pending)
+                self._pending_total = 0
+                self._last_flush = time.monotonic()
+            if not pending:
+                return 0
+
+            # 增量相同的博客合并为一条UPDATE语句
+            groups = defaultdict(list)
+            for pk, n in pending.items():
+                groups[n].append(pk)
+
+            from .models import Blog
+            try:
+                # 阅读量与请求内容无关, 不使之后的读取使用主库
+                with untracked_writes(), transaction.atomic():
+                    for n, pks in groups.items():
+                        Blog.objects.filter(pk__in=pks).update(page_view=F('page_view') + n)
+            except DatabaseError:
+                # 写入失败则放回缓冲区等待下次写入
+                logger.exception('写入博客阅读量失败')
+                with self._lock:
+                    self._pending.update(pending)
+                    self._pending_total += sum(pending.values())
+                return 0
+            finally:
+                with self._lock:
+                    self._inflight.subtract(pending)
+                    self._inflight += Counter()  # 去除计数为0的键
+            return sum(pending.values())
+
+    def _ensure_timer(self):
+        # 定时写入, 保证访问量较少时缓冲的阅读量也能及时写入
+        # 在首次计数时才启动线程, 以兼容gunicorn等先fork后处理请求的部署方式
+        if self._timer is not None and self._timer.is_alive():
+            return
+        with self._lock:
+            if self._timer is not None and self._timer.is_alive():
+                return
+            self._timer = threading.Thread(target=self._run_timer, name='page-view-flush', daemon=True)
+            self._timer.start()
+
+    def _run_timer(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            finally:
+                # 定时线程使用独立的数据库连接, 用完即关闭
+                connection.close()
+
+
+_settings = getattr(settings, 'PAGE_VIEW_BUFFER', {})
+
+page_view_buffer = PageViewBuffer(
+    flush_threshold=_settings.get('FLUSH_THRESHOLD', 100),
+    flush_interval=_settings.get('FLUSH_INTERVAL', 10),
+    background=_settings.get('BACKGROUND', True),
+)
+
+if page_view_buffer.background:
+    # 进程退出前写入剩余的阅读量
+    atexit.register(page_view_buffer.flush)
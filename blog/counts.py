@@ -0,0 +1,44 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Blog, Category, Comment, Tag
+
+
+def adjust_count(model, pks, field, delta):
+    """
+    将pks对应记录的冗余计数字段增加delta
+
+    使用F()在数据库中原子更新, 计数出现偏差时不会减为负数
+    """
+    pks = [pk for pk in pks if pk is not None]
+    if not pks or not delta:
+        return
+    value = F(field) + delta
+    if delta < 0:
+        value = Greatest(value, Value(0))
+    model.objects.filter(pk__in=pks).update(**{field: value})
+
+
+def _count_subquery(model, field):
+    # 按field分组统计model的记录数, 没有记录时为0
+    counts = model.objects.filter(**{field: OuterRef('pk')}).order_by().values(field)\
+        .annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counts), Value(0))
+
+
+def repair_counts():
+    """
+    全表统计修复冗余计数, 每张表一条UPDATE语句
+
+    返回{模型名: 修复的记录数}
+    """
+    repairs = [
+        (Blog, 'comment_count', _count_subquery(Comment, 'blog')),
+        (Category, 'blog_count', _count_subquery(Blog, 'category')),
+        (Tag, 'blog_count', _count_subquery(Blog.tags.through, 'tag')),
+    ]
+    result = {}
+    for model, field, actual in repairs:
+        # 只更新计数不正确的记录
+        result[model._meta.verbose_name] = model.objects.exclude(**{field: actual}).update(**{field: actual})
+    return result
@@ -1,16 +1,15 @@
 from django_filters import rest_framework as drf_filters
 
+from .archives import archive_filter
 from .models import Blog, Category, Tag
 
 
 class BlogFilter(drf_filters.FilterSet):
-    # 等价于查询条件created_time__year
-    created_year = drf_filters.NumberFilter(
-        field_name="created_time", lookup_expr="year", label='年份', help_text='根据年份过滤'
-    )
-    # 等价于查询条件created_time__month
+    # 等价于查询条件created_time__year, 转换为发布时间区间以利用索引
+    created_year = drf_filters.NumberFilter(method='filter_created_year', label='年份', help_text='根据年份过滤')
+    # 等价于查询条件created_time__month, 与年份同时传入时合并为一个月的区间
     created_month = drf_filters.NumberFilter(
-        field_name="created_time", lookup_expr="month", label='月份', help_text='根据月份过滤'
+        method='filter_created_month', label='月份', help_text='根据月份过滤'
     )
     # 配合接口文档添加help_text
     category = drf_filters.ModelChoiceFilter(queryset=Category.objects.all(), help_text='根据分类过滤')
@@ -20,3 +19,13 @@ class BlogFilter(drf_filters.FilterSet):
         model = Blog
         # category和tags不附加过滤条件的话直接传入, 也可直接通过视图集的filter_fields属性传入
         fields = ["category", "tags", "created_year", "created_month"]
+
+    def filter_created_year(self, queryset, name, value):
+        return archive_filter(queryset, value, self.form.cleaned_data.get('created_month'))
+
+    def filter_created_month(self, queryset, name, value):
+        if self.form.cleaned_data.get('created_year') is not None:
+            # 已由年份过滤处理
+            return queryset
+        # 只有月份时无法转换为一个区间
+        return queryset.filter(created_time__month=value)
@@ -0,0 +1,91 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from markdown.extensions import codehilite, fenced_code
+
+
+class HighlightCache:
+    """
+    代码高亮结果的LRU缓存
+
+    技术博客的正文大部分是代码, Pygments的词法分析与格式化是渲染正文最慢的部分,
+    相同的代码块(同一篇博客重新渲染, 或多篇博客引用同一段代码)只需要高亮一次
+    """
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return html
+
+    def set(self, key, html):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+_settings = getattr(settings, 'CODE_HIGHLIGHT_CACHE', {})
+
+highlight_cache = HighlightCache(max_entries=_settings.get('MAX_ENTRIES', 1000))
+
+
+class CachedCodeHilite(codehilite.CodeHilite):
+    """高亮前先查询缓存的CodeHilite"""
+
+    def hilite(self, shebang=True):
+        # 键: (语言, 代码哈希, 样式), 以及其他影响输出的选项(行号/CSS类名/高亮行等)
+        options = {k: v for k, v in self.options.items() if k != 'style'}
+        key = (
+            self.lang, hashlib.sha1(self.src.encode()).hexdigest(), self.options.get('style'),
+            shebang, self.guess_lang, self.use_pygments, self.lang_prefix, repr(self.pygments_formatter),
+            repr(sorted(options.items())),
+        )
+        html = highlight_cache.get(key)
+        if html is None:
+            html = super().hilite(shebang)
+            highlight_cache.set(key, html)
+        return html
+
+
+def install():
+    """
+    使codehilite与fenced_code拓展使用带缓存的CodeHilite
+
+    两个拓展都在处理代码块时按模块全局名称创建CodeHilite对象, 没有提供替换的配置项;
+    子类的输出与原类完全相同, 替换后只增加了缓存
+    """
+    codehilite.CodeHilite = CachedCodeHilite
+    fenced_code.CodeHilite = CachedCodeHilite
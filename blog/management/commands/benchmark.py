@@ -0,0 +1,100 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from blog.benchmarks import Benchmark, compare, default_endpoints, format_renderer_table, \
+    format_serialization_table, format_session_table, format_table, load_baseline, renderer_benchmark, \
+    save_baseline, serialization_benchmark, session_benchmark, throughput_benchmark
+from blog.models import Blog, Comment
+
+
+class Command(BaseCommand):
+    help = '对全部页面与接口进行性能基准测试, 统计p50/p95耗时、SQL查询数/耗时与内存峰值'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000, help='生成的博客数量')
+        parser.add_argument('--comments', type=int, default=5000, help='生成的评论数量')
+        parser.add_argument('--users', type=int, default=100, help='生成的用户数量')
+        parser.add_argument('--tags', type=int, default=50, help='生成的标签数量')
+        parser.add_argument('--seed', type=int, default=0, help='随机种子')
+        parser.add_argument('--iterations', type=int, default=20, help='每个接口的请求次数')
+        parser.add_argument('--warmup', type=int, default=2, help='每个接口统计前的预热请求次数')
+        parser.add_argument('--existing', action='store_true',
+                            help='直接测试当前数据库中的数据, 默认在新建的测试数据库中生成数据')
+        parser.add_argument('--only', nargs='*', help='只测试名称包含这些关键字的接口')
+        parser.add_argument('--save-baseline', metavar='PATH', help='将结果保存为基准文件')
+        parser.add_argument('--compare', metavar='PATH', help='与基准文件比较, 存在退化时以非0状态退出')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='允许的耗时增长比例')
+        parser.add_argument('--throughput', type=int, metavar='REQUESTS', nargs='?', const=500,
+                            help='只比较WSGI与ASGI部署的页面吞吐量(请求/秒), 默认每种部署请求500次')
+        parser.add_argument('--concurrency', type=int, default=8, help='比较吞吐量时的并发请求数')
+        parser.add_argument('--serialization', type=int, metavar='ROWS', nargs='?', const=1000,
+                            help='只测试博客接口序列化的吞吐量(行/秒), 默认序列化1000行')
+        parser.add_argument('--renderers', type=int, metavar='DOCS', nargs='?', const=200,
+                            help='只测试Markdown对象池的渲染速度(次/秒), 默认每种配置渲染200篇')
+        parser.add_argument('--sessions', action='store_true',
+                            help='只比较数据库会话/认证与缓存会话/认证下已登录请求的SQL查询数')
+
+    def handle(self, *args, **options):
+        # 测试客户端使用testserver作为主机名, 需要测试环境的ALLOWED_HOSTS等设置
+        setup_test_environment()
+        old_name = None
+        report = None
+        try:
+            if not options['existing']:
+                old_name = connection.settings_dict['NAME']
+                connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+                call_command(
+                    'seed', posts=options['posts'], comments=options['comments'], users=options['users'],
+                    tags=options['tags'], seed=options['seed'], index=True, stdout=self.stdout,
+                )
+            if options['throughput']:
+                throughput = throughput_benchmark(concurrency=options['concurrency'], requests=options['throughput'])
+                report = '\n'.join(f'{deployment.upper()}: {rps:.1f} 请求/秒' for deployment, rps in throughput.items())
+            elif options['serialization']:
+                report = format_serialization_table(serialization_benchmark(options['serialization']))
+            elif options['renderers']:
+                report = format_renderer_table(self.run_renderers(options['renderers']))
+            elif options['sessions']:
+                report = format_session_table(session_benchmark())
+            else:
+                results = self.run(options)
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if report is not None:
+            self.stdout.write(report)
+            return
+
+        baseline = load_baseline(options['compare']) if options['compare'] else None
+        self.stdout.write(format_table(results, baseline))
+
+        if options['save_baseline']:
+            save_baseline(options['save_baseline'], results)
+            self.stdout.write(self.style.SUCCESS(f'基准结果已保存到 {options["save_baseline"]}'))
+
+        if baseline is not None:
+            regressions = compare(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError('性能退化:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('与基准相比没有性能退化'))
+
+    def run(self, options):
+        endpoints = default_endpoints()
+        if options['only']:
+            endpoints = [ep for ep in endpoints if any(key in ep.name for key in options['only'])]
+        benchmark = Benchmark(iterations=options['iterations'], warmup=options['warmup'])
+        self.stdout.write(f'测试 {len(endpoints)} 个接口, 每个请求 {options["iterations"]} 次')
+        return benchmark.run(endpoints)
+
+    @staticmethod
+    def run_renderers(count):
+        bodies = list(Blog.objects.values_list('body', flat=True)[:count])
+        return renderer_benchmark({
+            'body': bodies,
+            'excerpt': bodies,
+            'comment': list(Comment.objects.values_list('text', flat=True)[:count]),
+        })
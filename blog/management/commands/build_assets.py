@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from blog.assets import DIST_DIR, build
+
+
+class Command(BaseCommand):
+    help = '合并压缩静态资源, 生成带内容哈希的文件名与gzip预压缩文件'
+
+    def handle(self, *args, **options):
+        manifest = build()
+        for name, path in manifest.items():
+            size = (DIST_DIR / path.split('/', 2)[2]).stat().st_size
+            self.stdout.write(f'{name} -> {path} ({size / 1024:.1f}KB)')
+        self.stdout.write(self.style.SUCCESS(f'已构建 {len(manifest)} 个资源包到 {DIST_DIR}'))
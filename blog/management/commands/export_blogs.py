@@ -0,0 +1,32 @@
+import gzip
+import sys
+
+from django.core.management.base import BaseCommand
+
+from blog.transfer import export_lines
+
+
+class Command(BaseCommand):
+    help = '以NDJSON格式流式导出分类/标签/博客/评论'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-o', '--output', default='-', help='输出文件, 以.gz结尾时压缩, 默认输出到标准输出')
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批读取的记录数')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        if output == '-':
+            self._write(sys.stdout, options['batch_size'])
+            return
+        opener = gzip.open if output.endswith('.gz') else open
+        with opener(output, 'wt', encoding='utf-8') as stream:
+            total = self._write(stream, options['batch_size'])
+        self.stderr.write(self.style.SUCCESS(f'已导出 {total} 条记录到 {output}'))
+
+    @staticmethod
+    def _write(stream, batch_size):
+        total = 0
+        for line in export_lines(batch_size):
+            stream.write(line)
+            total += 1
+        return total
@@ -0,0 +1,39 @@
+import gzip
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.transfer import clear_content, import_lines
+
+
+class Command(BaseCommand):
+    help = '导入export_blogs导出的NDJSON数据'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='导入的文件, 以.gz结尾时解压, -表示从标准输入读取')
+        parser.add_argument('--batch-size', type=int, default=1000, help='每个事务写入的记录数')
+        parser.add_argument('--clear', action='store_true', help='导入前清空已有的博客数据')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if options['clear']:
+            self.stdout.write('清空数据库旧数据')
+            clear_content()
+
+        path = options['input']
+        if path == '-':
+            stream = sys.stdin
+        else:
+            opener = gzip.open if path.endswith('.gz') else open
+            stream = opener(path, 'rt', encoding='utf-8')
+        try:
+            counts = import_lines(stream, options['batch_size'])
+        except ValueError as e:
+            raise CommandError(e)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        summary = ', '.join(f'{kind} {count}' for kind, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'导入结束({summary}), 耗时 {time.monotonic() - started:.1f}s'))
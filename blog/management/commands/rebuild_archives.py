@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from blog.archives import rebuild_archives
+from blog.cache import SIDEBAR, bump_generation
+
+
+class Command(BaseCommand):
+    help = '按全部博客重新统计归档数据'
+
+    def handle(self, *args, **options):
+        total = rebuild_archives()
+        bump_generation(SIDEBAR)
+        self.stdout.write(self.style.SUCCESS(f'已统计 {total} 个月份的归档'))
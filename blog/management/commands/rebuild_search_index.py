@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import Blog, SearchPosting
+from blog.search import index_blog
+
+
+class Command(BaseCommand):
+    help = '重建博客全文检索索引'
+
+    def handle(self, *args, **options):
+        SearchPosting.objects.all().delete()
+        total = 0
+        for blog in Blog.objects.only('pk', 'title', 'body').order_by('pk').iterator():
+            index_blog(blog)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(f'已为 {total} 篇博客建立索引'))
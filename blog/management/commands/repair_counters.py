@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from blog.cache import SIDEBAR, bump_generation
+from blog.counts import repair_counts
+
+
+class Command(BaseCommand):
+    help = '重新统计博客评论数与分类/标签博客数等冗余计数'
+
+    def handle(self, *args, **options):
+        for name, repaired in repair_counts().items():
+            self.stdout.write(f'{name}: 修复 {repaired} 条记录')
+        bump_generation(SIDEBAR)
+        self.stdout.write(self.style.SUCCESS('冗余计数修复完成'))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import Blog
+from blog.highlight import highlight_cache
+from blog.renderers import RENDERER_VERSION
+
+
+class Command(BaseCommand):
+    help = '重新渲染博客正文HTML与目录(修改Markdown拓展配置后执行)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='重新渲染全部博客, 默认只渲染版本过期的博客')
+        parser.add_argument('--batch-size', type=int, default=500, help='每批更新的博客数量')
+
+    def handle(self, *args, **options):
+        queryset = Blog.objects.only('pk', 'body')
+        if not options['all']:
+            queryset = queryset.exclude(render_version=RENDERER_VERSION)
+
+        batch_size = options['batch_size']
+        batch, total = [], 0
+        for blog in queryset.order_by('pk').iterator(chunk_size=batch_size):
+            blog.render()
+            batch.append(blog)
+            if len(batch) >= batch_size:
+                total += self._flush(batch, batch_size)
+        total += self._flush(batch, batch_size)
+
+        stats = highlight_cache.stats()
+        self.stdout.write(f'代码高亮缓存: 命中 {stats["hits"]} 次, 未命中 {stats["misses"]} 次, '
+                          f'淘汰 {stats["evictions"]} 次')
+        self.stdout.write(self.style.SUCCESS(f'已重新渲染 {total} 篇博客'))
+
+    @staticmethod
+    def _flush(batch, batch_size):
+        # bulk_update不会调用save(), 因此不会更新最后修改时间
+        Blog.objects.bulk_update(batch, ['body_html', 'toc', 'render_version'], batch_size=batch_size)
+        count = len(batch)
+        batch.clear()
+        return count
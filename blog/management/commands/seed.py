@@ -0,0 +1,235 @@
+import multiprocessing
+import random
+import time
+import zlib
+from collections import Counter
+from datetime import timedelta
+
+import faker
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from blog.archives import archive_month, update_archive_counts
+from blog.cache import COMMENTS, SIDEBAR, bump_generation, model_namespace
+from blog.counts import repair_counts
+from blog.models import Blog, Category, Comment, MyUser, SearchPosting, Tag
+from blog.renderers import RENDERER_VERSION, render_body, render_comment, render_excerpt
+from blog.search import build_postings, count_terms
+from blog.transfer import clear_content
+
+# 博客创建时间分布在最近一年内
+TIME_SPAN = timedelta(days=365)
+
+# 子进程通过fork继承的数据池, 避免在每个子进程中重复生成
+_pools = None
+
+
+class Pools:
+    """
+    预先生成的随机文本池
+
+    Faker生成文本与Markdown渲染都很慢, 先生成pool_size份文本并渲染好,
+    之后每条记录从池中取用, 数据量再大也不需要重复生成与渲染
+    """
+
+    def __init__(self, fake, size):
+        self.titles = [fake.sentence().rstrip('.。') for _ in range(size)]
+        self.bodies = []
+        for _ in range(size):
+            body = '\n\n'.join(fake.paragraphs(10))
+            body_html, toc = render_body(body)
+            self.bodies.append((body, body_html, toc, render_excerpt(body)))
+        self.comments = []
+        for _ in range(size):
+            text = fake.paragraph()
+            self.comments.append((text, render_comment(text)))
+        # 检索索引的词频也按池缓存
+        self.title_terms = [count_terms(title, '') for title in self.titles]
+        self.body_terms = [count_terms('', body[0]) for body in self.bodies]
+
+
+class Command(BaseCommand):
+    help = '批量生成压测数据(用户/分类/标签/博客/评论)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100, help='用户数量')
+        parser.add_argument('--categories', type=int, default=10, help='分类数量')
+        parser.add_argument('--tags', type=int, default=50, help='标签数量')
+        parser.add_argument('--posts', type=int, default=1000, help='博客数量')
+        parser.add_argument('--comments', type=int, default=5000, help='评论总数')
+        parser.add_argument('--max-tags', type=int, default=3, help='每篇博客最多的标签数')
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批写入的记录数')
+        parser.add_argument('--pool-size', type=int, default=200, help='预生成的文本数量')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='并行写入的进程数(SQLite不支持并发写入, 只适用于MySQL等数据库)')
+        parser.add_argument('--seed', type=int, default=0, help='随机种子, 相同参数与种子生成相同的数据')
+        parser.add_argument('--index', action='store_true', help='同时建立全文检索索引')
+        parser.add_argument('--clear', action='store_true', help='生成前清空已有数据')
+
+    def handle(self, *args, **options):
+        global _pools
+
+        if options['workers'] > 1 and connection.vendor == 'sqlite':
+            raise CommandError('SQLite不支持多个进程并发写入, 请使用 --workers 1')
+
+        started = time.monotonic()
+        seed = options['seed']
+        batch_size = options['batch_size']
+
+        if options['clear']:
+            self.stdout.write('清空数据库旧数据')
+            clear_content()
+            MyUser.objects.filter(is_superuser=False).delete()
+
+        self.stdout.write('生成文本池')
+        fake = faker.Faker(locale='zh_CN')
+        fake.seed_instance(seed)
+        _pools = Pools(fake, options['pool_size'])
+
+        rng = random.Random(seed)
+        self.stdout.write('创建用户/分类/标签')
+        user_ids = self._create_users(options['users'], rng, batch_size)
+        category_ids = self._create_named(Category, options['categories'], '分类', fake, batch_size)
+        tag_ids = self._create_named(Tag, options['tags'], '标签', fake, batch_size)
+        if not (user_ids and category_ids):
+            raise CommandError('至少需要一个用户和一个分类')
+
+        # 预先分配主键区间, 各批次(进程)写入互不重叠的主键, 不依赖bulk_create回填主键
+        blog_start = (Blog.objects.aggregate(m=Max('id'))['m'] or 0) + 1
+        comment_start = (Comment.objects.aggregate(m=Max('id'))['m'] or 0) + 1
+        now = timezone.now()
+        context = {
+            'seed': seed, 'now': now, 'user_ids': user_ids, 'category_ids': category_ids, 'tag_ids': tag_ids,
+            'max_tags': options['max_tags'], 'index': options['index'],
+            'blog_start': blog_start, 'blog_count': options['posts'],
+        }
+        tasks = [
+            ('blog', start, min(batch_size, options['posts'] - offset), context)
+            for offset, start in self._batches(blog_start, options['posts'], batch_size)
+        ]
+        if options['posts']:
+            tasks += [
+                ('comment', start, min(batch_size, options['comments'] - offset), context)
+                for offset, start in self._batches(comment_start, options['comments'], batch_size)
+            ]
+
+        self.stdout.write(f'写入 {options["posts"]} 篇博客与 {options["comments"]} 条评论')
+        if options['workers'] > 1:
+            # 子进程不能共用父进程的数据库连接
+            connections.close_all()
+            with multiprocessing.get_context('fork').Pool(options['workers']) as pool:
+                # 先写博客再写评论, 评论依赖博客主键
+                blog_tasks = [t for t in tasks if t[0] == 'blog']
+                pool.map(_run_task, blog_tasks)
+                pool.map(_run_task, [t for t in tasks if t[0] == 'comment'])
+        else:
+            for task in tasks:
+                _run_task(task)
+
+        # 显式指定了主键, 需要重置自增序列(PostgreSQL等)
+        sequence_sql = connection.ops.sequence_reset_sql(no_style(), [MyUser, Category, Tag, Blog, Comment])
+        if sequence_sql:
+            with connection.cursor() as cursor:
+                for sql in sequence_sql:
+                    cursor.execute(sql)
+
+        # bulk_create不触发信号, 重新统计冗余计数并使缓存失效
+        self.stdout.write('统计评论数与博客数')
+        repair_counts()
+        bump_generation(SIDEBAR, COMMENTS, *(model_namespace(model) for model in [Blog, Category, Tag, Comment]))
+
+        self.stdout.write(self.style.SUCCESS(f'创建测试数据结束, 耗时 {time.monotonic() - started:.1f}s'))
+
+    @staticmethod
+    def _batches(start, total, batch_size):
+        for offset in range(0, total, batch_size):
+            yield offset, start + offset
+
+    @staticmethod
+    def _create_users(count, rng, batch_size):
+        if not MyUser.objects.filter(username='admin').exists():
+            MyUser.objects.create_superuser('admin', 'admin@hellogithub.com', 'admin')
+        # 密码哈希很慢, 所有生成的用户共用一个密码哈希
+        password = make_password('password')
+        start = (MyUser.objects.aggregate(m=Max('id'))['m'] or 0) + 1
+        suffix = rng.randrange(10 ** 6)
+        MyUser.objects.bulk_create([
+            MyUser(id=pk, username=f'user{suffix}_{pk}', email=f'user{suffix}_{pk}@example.com', password=password)
+            for pk in range(start, start + count)
+        ], batch_size=batch_size)
+        return list(MyUser.objects.values_list('id', flat=True))
+
+    @staticmethod
+    def _create_named(model, count, label, fake, batch_size):
+        existing = set(model.objects.values_list('name', flat=True))
+        names = []
+        while len(names) < count:
+            name = f'{fake.word()}{label}{len(names)}'
+            if name not in existing:
+                names.append(name)
+        model.objects.bulk_create([model(name=name) for name in names], batch_size=batch_size)
+        return list(model.objects.values_list('id', flat=True))
+
+
+def _blog_created_time(context, blog_id):
+    # 由主键确定博客创建时间, 写评论时无需查询博客
+    ratio = zlib.crc32(f'{context["seed"]}:{blog_id}'.encode()) / 0xffffffff
+    return context['now'] - TIME_SPAN * ratio
+
+
+def _run_task(task):
+    kind, start, count, context = task
+    # 每批使用独立的随机数生成器, 结果与进程数无关
+    rng = random.Random(f'{context["seed"]}:{kind}:{start}')
+    with transaction.atomic():
+        if kind == 'blog':
+            _create_blogs(rng, start, count, context)
+        else:
+            _create_comments(rng, start, count, context)
+
+
+def _create_blogs(rng, start, count, context):
+    blogs, blog_tags, postings = [], [], []
+    archives = Counter()
+    for pk in range(start, start + count):
+        title_index = rng.randrange(len(_pools.titles))
+        body_index = rng.randrange(len(_pools.bodies))
+        body, body_html, toc, excerpt = _pools.bodies[body_index]
+        created_time = _blog_created_time(context, pk)
+        archives[archive_month(created_time)] += 1
+        blogs.append(Blog(
+            id=pk, author_id=rng.choice(context['user_ids']), category_id=rng.choice(context['category_ids']),
+            title=_pools.titles[title_index], body=body, excerpt=excerpt,
+            body_html=body_html, toc=toc, render_version=RENDERER_VERSION,
+            created_time=created_time, modified_time=created_time, page_view=rng.randrange(1000),
+        ))
+        if context['tag_ids']:
+            k = rng.randint(1, min(context['max_tags'], len(context['tag_ids'])))
+            blog_tags.extend(
+                Blog.tags.through(blog_id=pk, tag_id=tag_id) for tag_id in rng.sample(context['tag_ids'], k)
+            )
+        if context['index']:
+            postings.extend(build_postings(pk, _pools.title_terms[title_index] + _pools.body_terms[body_index]))
+
+    Blog.objects.bulk_create(blogs)
+    Blog.tags.through.objects.bulk_create(blog_tags)
+    SearchPosting.objects.bulk_create(postings, batch_size=5000)
+    # bulk_create不触发信号, 在同一事务中增量更新归档数据
+    update_archive_counts(archives)
+
+
+def _create_comments(rng, start, count, context):
+    comments = []
+    for pk in range(start, start + count):
+        blog_id = context['blog_start'] + rng.randrange(context['blog_count'])
+        blog_created_time = _blog_created_time(context, blog_id)
+        text, text_html = rng.choice(_pools.comments)
+        comments.append(Comment(
+            id=pk, user_id=rng.choice(context['user_ids']), blog_id=blog_id, text=text, text_html=text_html,
+            created_time=blog_created_time + (context['now'] - blog_created_time) * rng.random(),
+        ))
+    Comment.objects.bulk_create(comments)
@@ -0,0 +1,28 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = '将SQLite主库完整复制到从库, 用于在本地测试读写分离(模拟一次复制)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--replica', default='replica', help='从库的数据库别名')
+
+    def handle(self, *args, **options):
+        if options['replica'] not in connections.databases:
+            raise CommandError(f'未配置数据库 {options["replica"]}')
+        primary, replica = connections[DEFAULT_DB_ALIAS], connections[options['replica']]
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError('只支持SQLite数据库, 其他数据库使用数据库自身的复制功能')
+
+        source = sqlite3.connect(primary.settings_dict['NAME'])
+        target = sqlite3.connect(replica.settings_dict['NAME'])
+        try:
+            # SQLite在线备份, 复制期间主库仍可读写
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+        self.stdout.write(self.style.SUCCESS(f'已将主库复制到 {replica.settings_dict["NAME"]}'))
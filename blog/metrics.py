@@ -0,0 +1,331 @@
+import contextvars
+import functools
+import hmac
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+from django.template.backends.django import DjangoTemplates, Template
+
+
+class RequestMetrics:
+    """单个请求的SQL查询数/耗时与各计时器的累计耗时"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.timers = defaultdict(float)
+        # 异步视图的并发查询在其他线程中执行, 共用同一个对象
+        self._lock = threading.Lock()
+
+    def add_query(self, duration):
+        with self._lock:
+            self.sql_count += 1
+            self.sql_time += duration
+
+    def add_timer(self, name, duration):
+        with self._lock:
+            self.timers[name] += duration
+
+    def server_timing(self, total):
+        """Server-Timing响应头, 耗时单位为毫秒"""
+        entries = [f'total;dur={total * 1000:.1f}',
+                   f'sql;dur={self.sql_time * 1000:.1f};desc="{self.sql_count} queries"']
+        entries += [f'{name};dur={duration * 1000:.1f}' for name, duration in sorted(self.timers.items())]
+        return ', '.join(entries)
+
+
+# 当前请求的统计数据, 随上下文传递到sync_to_async的线程中
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def current_metrics():
+    """当前请求的统计数据, 不在请求中时返回None"""
+    return _current.get()
+
+
+@contextmanager
+def timer(name):
+    """统计代码块的耗时, 累加到当前请求的同名计时器; 不在请求中时不统计"""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_timer(name, time.perf_counter() - started)
+
+
+def timed(name):
+    """以timer(name)统计函数耗时的装饰器"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(time.perf_counter() - started)
+
+
+def instrument_connection(connection):
+    if sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_wrapper)
+
+
+@receiver(connection_created)
+def instrument_new_connection(sender, connection, **kwargs):
+    # 每个线程使用独立的连接, 在连接创建时统一加上SQL统计
+    instrument_connection(connection)
+
+
+class Histogram:
+    """Prometheus直方图, 按标签分别统计"""
+
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # 标签值 -> [各桶计数..., 总和, 次数]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.setdefault(label_values, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self):
+        """当前进程的统计数据: {标签值: [各桶计数..., 总和, 次数]}"""
+        with self._lock:
+            return {label_values: list(values) for label_values, values in self._series.items()}
+
+    def render(self, series=None):
+        """以Prometheus文本格式输出series(默认为当前进程的统计数据)"""
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        series = sorted((self.snapshot() if series is None else series).items())
+        for label_values, values in series:
+            labels = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+            prefix = labels + ',' if labels else ''
+            for bound, count in zip(self.buckets, values):
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {values[-1]}')
+            labels = f'{{{labels}}}' if labels else ''
+            lines.append(f'{self.name}_sum{labels} {values[-2]}')
+            lines.append(f'{self.name}_count{labels} {values[-1]}')
+        return '\n'.join(lines)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+request_duration = Histogram('blog_request_duration_seconds', '请求耗时', ['view', 'method', 'status'],
+                             DURATION_BUCKETS)
+request_queries = Histogram('blog_request_sql_queries', '每个请求的SQL查询数', ['view'], QUERY_BUCKETS)
+request_sql_duration = Histogram('blog_request_sql_duration_seconds', '每个请求的SQL查询耗时', ['view'],
+                                 DURATION_BUCKETS)
+request_timer_duration = Histogram('blog_request_timer_seconds', '每个请求中各计时器(模板/Markdown等)的耗时',
+                                   ['view', 'timer'], DURATION_BUCKETS)
+HISTOGRAMS = [request_duration, request_queries, request_sql_duration, request_timer_duration]
+
+
+class MetricsStore:
+    """
+    多进程共享的统计数据
+
+    直方图保存在各个进程的内存中, 多worker部署时每次抓取到的是随机一个进程的数据. 各进程每隔interval秒
+    把自己的直方图写入同一个SQLite文件(每个进程一组记录), 抓取时汇总所有进程的记录; 已退出的进程的记录保留
+    retention秒, 汇总的计数不会因为进程重启而减少. path为None时使用进程独立的临时文件(测试)
+    """
+
+    def __init__(self, path=None, interval=5, retention=24 * 60 * 60):
+        if path is None:
+            self._tmpdir = tempfile.TemporaryDirectory(prefix='blog-project-metrics-')
+            path = os.path.join(self._tmpdir.name, 'metrics.sqlite3')
+        self.path = str(path)
+        self.interval = interval
+        self.retention = retention
+        self._local = threading.local()
+        self._save_lock = threading.Lock()
+        self._last_save = 0.0
+        self._pid = None
+
+    def connection(self):
+        # 每个线程使用独立的连接; fork出的worker进程不能使用父进程的连接
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS series (worker TEXT NOT NULL, name TEXT NOT NULL, labels TEXT NOT NULL, '
+                'data TEXT NOT NULL, updated REAL NOT NULL, PRIMARY KEY (worker, name, labels))'
+            )
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    @property
+    def worker(self):
+        # 进程id会被重启后的进程复用, 加上随机后缀区分
+        if self._pid != os.getpid():
+            self._pid, self._worker = os.getpid(), f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+            self._last_save = 0.0
+        return self._worker
+
+    def save(self, histograms, force=False):
+        """写入当前进程的统计数据; 距上次写入不足interval秒时跳过, 除非force为True"""
+        if not force and time.monotonic() - self._last_save < self.interval:
+            return
+        if not self._save_lock.acquire(blocking=False):
+            return
+        try:
+            worker, now = self.worker, time.time()
+            rows = [(worker, histogram.name, json.dumps(label_values), json.dumps(values), now)
+                    for histogram in histograms for label_values, values in histogram.snapshot().items()]
+            conn = self.connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany('INSERT OR REPLACE INTO series VALUES (?, ?, ?, ?, ?)', rows)
+                conn.execute('DELETE FROM series WHERE updated < ?', [now - self.retention])
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            self._last_save = time.monotonic()
+        finally:
+            self._save_lock.release()
+
+    def load(self, histograms):
+        """汇总所有进程的统计数据: {直方图名称: {标签值: [各桶计数..., 总和, 次数]}}"""
+        merged = {histogram.name: {} for histogram in histograms}
+        for name, labels, data in self.connection().execute('SELECT name, labels, data FROM series'):
+            if name not in merged:
+                continue
+            values = json.loads(data)
+            total = merged[name].setdefault(tuple(json.loads(labels)), [0] * len(values))
+            for i, value in enumerate(values):
+                total[i] += value
+        return merged
+
+    def clear(self):
+        self.connection().execute('DELETE FROM series')
+
+
+_store_settings = getattr(settings, 'METRICS', {})
+
+metrics_store = MetricsStore(
+    _store_settings.get('STORE', os.path.join(tempfile.gettempdir(), 'blog-project-metrics.sqlite3')),
+    interval=_store_settings.get('SYNC_INTERVAL', 5),
+)
+
+
+def start_request():
+    """开始统计当前请求, 返回(统计数据, 用于结束统计的令牌)"""
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish_request(request, response, metrics, token):
+    """结束统计: 记录直方图并添加Server-Timing响应头"""
+    _current.reset(token)
+    total = time.perf_counter() - metrics.started
+    match = getattr(request, 'resolver_match', None)
+    view = match.view_name if match is not None else 'unresolved'
+    request_duration.observe(total, view, request.method, response.status_code)
+    request_queries.observe(metrics.sql_count, view)
+    request_sql_duration.observe(metrics.sql_time, view)
+    for name, duration in metrics.timers.items():
+        request_timer_duration.observe(duration, view, name)
+    metrics_store.save(HISTOGRAMS)
+    response['Server-Timing'] = metrics.server_timing(total)
+    return response
+
+
+def metrics_allowed(request):
+    """
+    配置了TOKEN时要求请求头 Authorization: Bearer <TOKEN>, 否则按REMOTE_ADDR判断
+
+    在同一台主机的nginx等反向代理之后部署时, 所有请求的REMOTE_ADDR都是127.0.0.1, 按IP判断等于公开访问,
+    此时必须配置TOKEN(或只在不经过代理的地址上提供该接口)
+    """
+    config = getattr(settings, 'METRICS', {})
+    token = config.get('TOKEN')
+    if token:
+        return hmac.compare_digest(request.META.get('HTTP_AUTHORIZATION', '').encode(), f'Bearer {token}'.encode())
+    return request.META.get('REMOTE_ADDR') in config.get('ALLOWED_IPS', ['127.0.0.1', '::1'])
+
+
+def metrics_view(request):
+    """
+    Prometheus格式的统计数据
+
+    汇总metrics_store中所有worker进程的统计数据, 其他进程的数据最多延迟METRICS['SYNC_INTERVAL']秒
+    """
+    if not metrics_allowed(request):
+        raise Http404
+    metrics_store.save(HISTOGRAMS, force=True)
+    merged = metrics_store.load(HISTOGRAMS)
+    body = '\n'.join(histogram.render(merged[histogram.name]) for histogram in HISTOGRAMS) + '\n'
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# 是否正在渲染模板, 模板中(如模板标签)再渲染的模板不重复计时
+_rendering = contextvars.ContextVar('rendering_template', default=False)
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        if _rendering.get():
+            return super().render(context, request)
+        token = _rendering.set(True)
+        try:
+            with timer('template'):
+                return super().render(context, request)
+        finally:
+            _rendering.reset(token)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """统计模板渲染耗时的模板后端, 只统计最外层的模板(include及模板标签中渲染的模板计入其中)"""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name).template, self)
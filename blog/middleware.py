@@ -0,0 +1,107 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connection
+from django.utils.decorators import sync_and_async_middleware
+
+from .metrics import finish_request, instrument_connection, start_request
+from .profiling import RequestProfiler, profile_requested, should_profile
+from . import routers
+
+
+@sync_and_async_middleware
+def async_views_middleware(get_response):
+    """
+    ASGI部署时使用ASYNC_ROOT_URLCONF解析URL, 页面由异步视图处理; WSGI部署不受影响
+
+    视图函数在加载URL配置时确定, 同一份代码同时用于两种部署, 因此按请求选择URL配置
+    """
+    def select_urlconf(request):
+        urlconf = getattr(settings, 'ASYNC_ROOT_URLCONF', None)
+        if urlconf and isinstance(request, ASGIRequest):
+            request.urlconf = urlconf
+
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            select_urlconf(request)
+            return await get_response(request)
+    else:
+        def middleware(request):
+            select_urlconf(request)
+            return get_response(request)
+    return middleware
+
+
+@sync_and_async_middleware
+def instrumentation_middleware(get_response):
+    """
+    统计每个请求的耗时/SQL查询数与耗时/各计时器(模板/Markdown/评论/侧边栏/序列化)耗时
+
+    结果写入Server-Timing响应头(浏览器开发者工具中可以查看), 并汇总到/metrics/的直方图中
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            metrics, token = start_request()
+            response = await get_response(request)
+            return finish_request(request, response, metrics, token)
+    else:
+        def middleware(request):
+            # 在connection_created信号注册之前建立的连接
+            instrument_connection(connection)
+            metrics, token = start_request()
+            response = get_response(request)
+            return finish_request(request, response, metrics, token)
+    return middleware
+
+
+@sync_and_async_middleware
+def profiling_middleware(get_response):
+    """
+    按需分析请求性能: 管理员带X-Profile请求头或_profile查询参数的请求, 以及按PROFILING['SAMPLE_RATE']抽样的请求
+
+    需要放在AuthenticationMiddleware之后; 结果保存到磁盘, 在/blog/profiles/中查看. 每个进程同时只分析一个请求.
+    异步请求只能分析事件循环所在线程, 在线程池中执行的同步代码不在结果中, 同时在事件循环中执行的其他请求
+    却会计入结果, 因此异步请求不抽样分析, 只分析管理员指定的请求
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            reason = None
+            if profile_requested(request):
+                # 读取request.user需要查询数据库, 不能在事件循环中执行
+                reason = await sync_to_async(should_profile)(request, sampling=False)
+            if reason is None:
+                return await get_response(request)
+            with RequestProfiler(request, reason) as profiler:
+                response = await get_response(request)
+            return profiler.save(response)
+    else:
+        def middleware(request):
+            reason = should_profile(request)
+            if reason is None:
+                return get_response(request)
+            with RequestProfiler(request, reason) as profiler:
+                response = get_response(request)
+            return profiler.save(response)
+    return middleware
+
+
+@sync_and_async_middleware
+def replica_routing_middleware(get_response):
+    """
+    为PrimaryReplicaRouter记录请求的路由状态: 请求中的读取使用从库, 写入后(及客户端最近写入过)使用主库
+
+    需要放在SessionMiddleware之前, 保存会话也算作写入
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = routers.start_request(request)
+            response = await get_response(request)
+            return routers.finish_request(response, token)
+    else:
+        def middleware(request):
+            token = routers.start_request(request)
+            response = get_response(request)
+            return routers.finish_request(response, token)
+    return middleware
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='body_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='博客正文HTML'),
+        ),
+        migrations.AddField(
+            model_name='blog',
+            name='render_version',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='渲染版本'),
+        ),
+        migrations.AddField(
+            model_name='blog',
+            name='toc',
+            field=models.TextField(blank=True, editable=False, verbose_name='博客目录'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_blog_rendered_body'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='词项')),
+                ('weight', models.FloatField(verbose_name='权重')),
+                ('blog', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_postings', to='blog.blog', verbose_name='博客')),
+            ],
+            options={
+                'verbose_name': '检索索引',
+                'verbose_name_plural': '检索索引',
+                'unique_together': {('term', 'blog')},
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:11
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def build_archives(apps, schema_editor):
+    # 按已有博客统计归档数据
+    Blog = apps.get_model('blog', 'Blog')
+    ArchiveMonth = apps.get_model('blog', 'ArchiveMonth')
+    rows = Blog.objects.annotate(year=ExtractYear('created_time'), month=ExtractMonth('created_time'))\
+        .values('year', 'month').order_by().annotate(blog_count=Count('pk'))
+    ArchiveMonth.objects.bulk_create([ArchiveMonth(**row) for row in rows])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_comment_text_html'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveMonth',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='年份')),
+                ('month', models.PositiveSmallIntegerField(verbose_name='月份')),
+                ('blog_count', models.IntegerField(default=0, verbose_name='博客数')),
+            ],
+            options={
+                'verbose_name': '归档',
+                'verbose_name_plural': '归档',
+                'ordering': ['year', 'month'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='blog',
+            index=models.Index(fields=['created_time', 'id'], name='blog_created_time_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='archivemonth',
+            unique_together={('year', 'month')},
+        ),
+        migrations.RunPython(build_archives, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:13
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field):
+    counts = model.objects.filter(**{field: OuterRef('pk')}).order_by().values(field)\
+        .annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counts), Value(0))
+
+
+def fill_counts(apps, schema_editor):
+    # 按已有数据统计冗余计数
+    Blog = apps.get_model('blog', 'Blog')
+    Category = apps.get_model('blog', 'Category')
+    Tag = apps.get_model('blog', 'Tag')
+    Comment = apps.get_model('blog', 'Comment')
+    Blog.objects.update(comment_count=count_subquery(Comment, 'blog'))
+    Category.objects.update(blog_count=count_subquery(Blog, 'category'))
+    Tag.objects.update(blog_count=count_subquery(Blog.tags.through, 'tag'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_archivemonth'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='评论数'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='blog_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='博客数'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='blog_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='博客数'),
+        ),
+        migrations.RunPython(fill_counts, migrations.RunPython.noop),
+    ]
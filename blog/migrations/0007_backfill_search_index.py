@@ -0,0 +1,34 @@
+from django.db import migrations
+
+# 每批建立索引的博客数
+BATCH_SIZE = 500
+
+
+def build_index(apps, schema_editor):
+    # 为还没有索引的已有博客建立检索索引, 按主键分批读取
+    from blog.search import build_postings, count_terms
+
+    Blog = apps.get_model('blog', 'Blog')
+    SearchPosting = apps.get_model('blog', 'SearchPosting')
+    blogs = Blog.objects.filter(search_postings__isnull=True).order_by('pk').values_list('pk', 'title', 'body')
+    last_pk = 0
+    while True:
+        batch = list(blogs.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            break
+        postings = []
+        for pk, title, body in batch:
+            postings.extend(build_postings(pk, count_terms(title, body), SearchPosting))
+        SearchPosting.objects.bulk_create(postings, batch_size=5000)
+        last_pk = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_denormalized_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
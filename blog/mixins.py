@@ -0,0 +1,133 @@
+import asyncio
+import hashlib
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.template.response import TemplateResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+
+from .cache import get_generation, model_namespace
+from .concurrency import gather_queries
+from .routers import use_primary
+from .templatetags.blog_extras import sidebar_data
+
+# 缓存响应时保留的响应头
+CACHED_HEADERS = ['Content-Type', 'ETag', 'Last-Modified']
+
+
+class CachedResponseMixin:
+    """
+    只读视图集的响应缓存
+
+    缓存键由视图集/action/URL参数/规范化后的查询参数/响应格式, 以及响应依赖的模型的版本号组成,
+    任意依赖模型的数据变化后版本号递增, 旧的缓存不再被读取
+    """
+    # action -> 响应依赖的模型, 未列出的action使用default
+    cache_dependencies = {}
+    # 缓存过期时间, 仅作为兜底(如阅读量等不递增版本号的数据)
+    cache_timeout = 60
+    # 只缓存这些格式的响应, 可浏览API的HTML页面包含当前用户等信息, 不能缓存
+    cache_formats = ['json']
+
+    def get_cache_dependencies(self):
+        return self.cache_dependencies.get(self.action, self.cache_dependencies.get('default', []))
+
+    def get_response_cache_key(self, request):
+        if request.accepted_renderer.format not in self.cache_formats:
+            return None
+        # 规范化查询参数: 参数与参数值排序后拼接
+        query = urlencode(sorted(
+            (key, value) for key, values in request.query_params.lists() for value in values
+        ))
+        generations = [get_generation(model_namespace(model)) for model in self.get_cache_dependencies()]
+        parts = [self.basename, self.action, sorted(self.kwargs.items()), query,
+                 request.accepted_renderer.format, generations]
+        return 'blog:response:' + hashlib.md5(repr(parts).encode()).hexdigest()
+
+    def cached_response(self, request, get_response):
+        """读取缓存的响应, 不存在时调用get_response生成响应并在渲染后写入缓存"""
+        key = self.get_response_cache_key(request)
+        if key is None:
+            return get_response()
+
+        cached = cache.get(key)
+        if cached is not None:
+            status, content, headers = cached
+            # 缓存中保存了校验数据, 命中缓存时同样支持条件请求
+            last_modified = headers.get('Last-Modified')
+            response = get_conditional_response(
+                request, etag=headers.get('ETag'),
+                last_modified=parse_http_date_safe(last_modified) if last_modified else None,
+            )
+            if response is not None:
+                return response
+            response = HttpResponse(content, status=status)
+            for header, value in headers.items():
+                response[header] = value
+            return response
+
+        # 写入缓存的响应读取主库, 避免从库延迟时把写入前的数据缓存到新版本号下
+        with use_primary():
+            response = get_response()
+        if isinstance(response, Response) and response.status_code == 200:
+            def store(rendered):
+                headers = {header: rendered[header] for header in CACHED_HEADERS if rendered.has_header(header)}
+                cache.set(key, (rendered.status_code, rendered.content, headers), self.cache_timeout)
+
+            response.add_post_render_callback(store)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CachedResponseMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, lambda: super(CachedResponseMixin, self).retrieve(request, *args, **kwargs)
+        )
+
+
+class AsyncViewMixin:
+    """
+    页面视图的异步版本
+
+    as_async_view()返回的异步视图先启动get_concurrent_queries中与主内容无关的查询(侧边栏/评论等),
+    同时在视图中查询主内容, 两者都完成后把查询结果放入上下文再渲染模板
+    """
+
+    @classmethod
+    def get_concurrent_queries(cls, **kwargs):
+        """{上下文变量名: 查询函数}, kwargs为URL参数"""
+        return {'sidebar': sidebar_data}
+
+    @classmethod
+    def as_async_view(cls, **initkwargs):
+        view = cls.as_view(**initkwargs)
+
+        async def async_view(request, *args, **kwargs):
+            queries = asyncio.ensure_future(gather_queries(cls.get_concurrent_queries(**kwargs)))
+            try:
+                response = await sync_to_async(view)(request, *args, **kwargs)
+            finally:
+                extra_context = await queries
+            # 304等响应不需要渲染
+            if isinstance(response, TemplateResponse) and not response.is_rendered:
+                response.context_data.update(extra_context)
+                response = await sync_to_async(response.render)()
+            return response
+
+        async_view.view_class = cls
+        async_view.view_initkwargs = initkwargs
+        return async_view
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # 在视图中完成主内容的查询, 使其与并发的查询同时进行, 而不是推迟到渲染模板时
+        object_list = context.get('object_list')
+        if isinstance(object_list, QuerySet):
+            len(object_list)
+        return context
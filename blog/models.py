@@ -1,9 +1,10 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 from django.shortcuts import reverse
 from django.utils import timezone
-from django.utils.html import strip_tags
-from markdown import Markdown
+
+from .counters import page_view_buffer
+from .renderers import RENDERER_VERSION, render_body, render_comment, render_excerpt
 
 
 class MyUser(AbstractUser):
@@ -20,6 +21,8 @@ class MyUser(AbstractUser):
 class Category(models.Model):
     """博客分类"""
     name = models.CharField(max_length=100, verbose_name='博客分类')
+    # 冗余的博客数, 在发布/删除博客及修改标签时增量维护
+    blog_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='博客数')
 
     def __str__(self):
         return self.name
@@ -32,6 +35,8 @@ class Category(models.Model):
 class Tag(models.Model):
     """博客标签"""
     name = models.CharField(max_length=100, verbose_name='博客标签')
+    # 冗余的博客数, 在发布/删除博客及修改标签时增量维护
+    blog_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='博客数')
 
     def __str__(self):
         return self.name
@@ -52,6 +57,12 @@ class Blog(models.Model):
     created_time = models.DateTimeField(default=timezone.now, editable=False, verbose_name='发布时间')
     modified_time = models.DateTimeField(default=timezone.now, editable=False, verbose_name='最后修改时间')
     page_view = models.PositiveIntegerField(default=0, editable=False, verbose_name='博客阅读量')
+    # 预渲染的正文HTML与目录, 在保存时生成, 避免每次访问详情页都转换Markdown
+    body_html = models.TextField(blank=True, editable=False, verbose_name='博客正文HTML')
+    toc = models.TextField(blank=True, editable=False, verbose_name='博客目录')
+    render_version = models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='渲染版本')
+    # 冗余的评论数, 在发表/删除评论时增量维护
+    comment_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='评论数')
 
     def __str__(self):
         return self.title
@@ -62,39 +73,107 @@ class Blog(models.Model):
     def save(self, *args, **kwargs):
         # 如果摘要为空则自动取前54个字符为摘要
         if not self.excerpt:
-            # 去除Markdown标记: Markdown文本 -> HTML文本 -> 纯文本
-            md = Markdown(extensions=[
-                'markdown.extensions.extra',
-                'markdown.extensions.codehilite',
-            ])
-            self.excerpt = strip_tags(md.convert(self.body))[:54]
+            self.excerpt = render_excerpt(self.body)
+
+        # 正文可能发生变化时重新渲染HTML与目录
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'body' in update_fields:
+            self.render()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'body_html', 'toc', 'render_version'}
 
         # 更新最后修改时间
         self.modified_time = timezone.now()
 
-        super().save(*args, **kwargs)
+        # 保存与信号中的计数更新在同一事务中完成, 缓存失效在事务提交后执行(见signals.on_commit)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def render(self):
+        """将正文渲染为HTML与目录, 并记录渲染器版本"""
+        self.body_html, self.toc = render_body(self.body)
+        self.render_version = RENDERER_VERSION
+
+    @property
+    def render_outdated(self):
+        return self.render_version != RENDERER_VERSION
+
+    def refresh_render(self):
+        """渲染器版本过期时重新渲染, 不更新最后修改时间"""
+        if not self.render_outdated:
+            return
+        self.render()
+        Blog.objects.filter(pk=self.pk).update(
+            body_html=self.body_html, toc=self.toc, render_version=self.render_version
+        )
 
     def increase_pv(self):
-        self.page_view += 1
-        self.save(update_fields=['page_view'])  # 使用update_fields提高效率
+        # 阅读量先写入缓冲区, 由缓冲区批量写入数据库
+        page_view_buffer.incr(self.pk)
+
+    @property
+    def total_page_view(self):
+        """包含尚未写入数据库部分的阅读量"""
+        return self.page_view + page_view_buffer.pending(self.pk)
 
     class Meta:
         verbose_name = '博客'
         verbose_name_plural = verbose_name
         ordering = ['-created_time']
+        # 归档区间查询与游标分页都按(created_time, id)定位
+        indexes = [models.Index(fields=['created_time', 'id'], name='blog_created_time_idx')]
 
 
 class Comment(models.Model):
     """评论"""
     user = models.ForeignKey(MyUser, on_delete=models.CASCADE, verbose_name='评论用户')
     text = models.TextField(verbose_name='评论内容')
+    # 预渲染的评论HTML, 在保存时生成
+    text_html = models.TextField(blank=True, editable=False, verbose_name='评论内容HTML')
     blog = models.ForeignKey(Blog, on_delete=models.CASCADE, verbose_name='评论文章')
     created_time = models.DateTimeField(default=timezone.now, editable=False, verbose_name='评论时间')
 
     def __str__(self):
         return f'{self.user}: {self.text[:20]}'
 
+    def save(self, *args, **kwargs):
+        self.text_html = render_comment(self.text)
+        # 保存与信号中的计数更新在同一事务中完成, 缓存失效在事务提交后执行(见signals.on_commit)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = '评论'
         verbose_name_plural = verbose_name
         ordering = ['-created_time']
+
+
+class SearchPosting(models.Model):
+    """全文检索倒排索引: 词项 -> 博客"""
+    term = models.CharField(max_length=64, verbose_name='词项')
+    blog = models.ForeignKey(Blog, on_delete=models.CASCADE, related_name='search_postings', verbose_name='博客')
+    weight = models.FloatField(verbose_name='权重')
+
+    def __str__(self):
+        return f'{self.term}: {self.blog_id}'
+
+    class Meta:
+        verbose_name = '检索索引'
+        verbose_name_plural = verbose_name
+        unique_together = ['term', 'blog']
+
+
+class ArchiveMonth(models.Model):
+    """归档: 每月发布的博客数, 在发布/删除博客时增量维护"""
+    year = models.PositiveSmallIntegerField(verbose_name='年份')
+    month = models.PositiveSmallIntegerField(verbose_name='月份')
+    blog_count = models.IntegerField(default=0, verbose_name='博客数')
+
+    def __str__(self):
+        return f'{self.year}年{self.month}月({self.blog_count})'
+
+    class Meta:
+        verbose_name = '归档'
+        verbose_name_plural = verbose_name
+        ordering = ['year', 'month']
+        unique_together = ['year', 'month']
@@ -0,0 +1,95 @@
+from base64 import b64decode, b64encode
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, Cursor
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(CursorPagination):
+    """
+    按(created_time, id)倒序的游标分页
+
+    游标记录上一页边界记录的(created_time, id), 翻页时使用
+    created_time < t OR (created_time = t AND id < pk) 定位, 不需要COUNT(*)和OFFSET,
+    翻到多深的页面查询耗时都不变. 与DRF自带的CursorPagination不同, id参与定位,
+    created_time相同的记录也不需要依靠偏移量翻页
+    """
+    ordering = ('-created_time', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+
+        if self.cursor is None:
+            queryset = queryset.order_by('-created_time', '-id')
+        else:
+            created_time, pk = self.cursor.position
+            if reverse:
+                # 上一页: 取游标之前(更新)的记录, 正序查询后再反转
+                queryset = queryset.filter(
+                    Q(created_time__gt=created_time) | Q(created_time=created_time, id__gt=pk)
+                ).order_by('created_time', 'id')
+            else:
+                queryset = queryset.filter(
+                    Q(created_time__lt=created_time) | Q(created_time=created_time, id__lt=pk)
+                ).order_by('-created_time', '-id')
+
+        # 多取一条记录判断是否还有下一页
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        if self.has_next or self.has_previous:
+            self.display_page_controls = True
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self._position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self._position(self.page[0])))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            reverse, created_time, pk = b64decode(encoded.encode('ascii')).decode('ascii').split('|')
+            position = (parse_datetime(created_time), int(pk))
+            if position[0] is None:
+                raise ValueError
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return Cursor(offset=0, reverse=reverse == 'r', position=position)
+
+    def encode_cursor(self, cursor):
+        created_time, pk = cursor.position
+        token = '|'.join(['r' if cursor.reverse else 'n', created_time.isoformat(), str(pk)])
+        encoded = b64encode(token.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    @staticmethod
+    def _position(instance):
+        if isinstance(instance, dict):
+            return instance['created_time'], instance['id']
+        return instance.created_time, instance.pk
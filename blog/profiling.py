@@ -0,0 +1,149 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from .metrics import current_metrics
+
+_settings = getattr(settings, 'PROFILING', {})
+
+# 性能分析结果目录: 每个请求一个.prof文件(cProfile格式, 可用snakeviz等工具查看调用图)与一个.json元数据
+PROFILE_DIR = Path(_settings.get('DIR', os.path.join(tempfile.gettempdir(), 'blog-project-profiles')))
+# 随机抽样分析的请求比例, 0表示只分析管理员指定的请求
+SAMPLE_RATE = _settings.get('SAMPLE_RATE', 0.0)
+# 最多保留的结果数量, 超出时删除最早的
+MAX_PROFILES = _settings.get('MAX_PROFILES', 200)
+# 管理员通过请求头或查询参数要求分析该请求
+HEADER = 'HTTP_X_PROFILE'
+QUERY_PARAM = '_profile'
+# 请求头与查询参数的这些值(不区分大小写)视为不要求分析
+OFF_VALUES = {'', '0', 'false', 'off', 'no'}
+
+PROFILE_ID_RE = re.compile(r'^\d+-[0-9a-f]{8}$')
+
+
+def profile_requested(request):
+    """请求头或查询参数是否要求分析该请求, 不检查用户"""
+    return any(value is not None and value.strip().lower() not in OFF_VALUES
+               for value in [request.META.get(HEADER), request.GET.get(QUERY_PARAM)])
+
+
+def should_profile(request, sampling=True):
+    """返回分析原因: 'staff'(管理员指定) / 'sampled'(随机抽样), 不分析时返回None; sampling为False时不抽样"""
+    if profile_requested(request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            return 'staff'
+    if sampling and SAMPLE_RATE and random.random() < SAMPLE_RATE:
+        return 'sampled'
+    return None
+
+
+def save_profile(request, response, profiler, duration, reason):
+    """保存分析结果与请求信息, 返回结果id"""
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    profile_id = f'{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}'
+    profiler.dump_stats(PROFILE_DIR / f'{profile_id}.prof')
+    metrics = current_metrics()
+    info = {
+        'id': profile_id,
+        'method': request.method,
+        'path': request.get_full_path(),
+        'status': response.status_code,
+        'duration_ms': duration * 1000,
+        'sql_count': metrics.sql_count if metrics is not None else None,
+        'reason': reason,
+        'user': request.user.get_username() if getattr(request, 'user', None) else '',
+        'time': timezone.now().isoformat(),
+    }
+    (PROFILE_DIR / f'{profile_id}.json').write_text(json.dumps(info, ensure_ascii=False), encoding='utf-8')
+    prune_profiles()
+    return profile_id
+
+
+def prune_profiles(keep=None):
+    keep = MAX_PROFILES if keep is None else keep
+    # 结果id以时间戳开头, 按文件名排序即按时间排序
+    for path in sorted(PROFILE_DIR.glob('*.json'))[:-keep or None]:
+        path.unlink(missing_ok=True)
+        path.with_suffix('.prof').unlink(missing_ok=True)
+
+
+def list_profiles():
+    """全部分析结果的请求信息, 按耗时从长到短排序"""
+    profiles = []
+    for path in PROFILE_DIR.glob('*.json'):
+        try:
+            profiles.append(json.loads(path.read_text(encoding='utf-8')))
+        except (OSError, ValueError):
+            # 文件正在写入或已被删除
+            continue
+    return sorted(profiles, key=lambda info: info['duration_ms'], reverse=True)
+
+
+def profile_path(profile_id):
+    """分析结果文件路径, id无效或结果不存在时返回None"""
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    path = PROFILE_DIR / f'{profile_id}.prof'
+    return path if path.is_file() else None
+
+
+def load_profile(profile_id, sort='cumulative', limit=60):
+    """请求信息与文本格式的分析报告(按sort排序的前limit个函数及其调用的函数)"""
+    path = profile_path(profile_id)
+    if path is None:
+        return None
+    info = json.loads(path.with_suffix('.json').read_text(encoding='utf-8'))
+    stream = io.StringIO()
+    stats = pstats.Stats(str(path), stream=stream).strip_dirs().sort_stats(sort)
+    stats.print_stats(limit)
+    stats.print_callees(limit // 3)
+    return info, stream.getvalue()
+
+
+class RequestProfiler:
+    """
+    在cProfile中执行请求并在结束后保存结果
+
+    每个进程同时只分析一个请求: 同一事件循环中并发的协程共用一个线程, 同时分析会相互争用profiler
+    (Python 3.12起cProfile在整个进程中只能启用一个, 再启用会抛出ValueError); 已有请求在分析时直接处理请求
+    """
+    _active = threading.Lock()
+
+    def __init__(self, request, reason):
+        self.request = request
+        self.reason = reason
+        self.profiler = cProfile.Profile()
+        self.active = False
+
+    def __enter__(self):
+        self.active = self._active.acquire(blocking=False)
+        self.started = time.perf_counter()
+        if self.active:
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.duration = time.perf_counter() - self.started
+        if self.active:
+            self.profiler.disable()
+            self._active.release()
+
+    def save(self, response):
+        if not self.active:
+            return response
+        profile_id = save_profile(self.request, response, self.profiler, self.duration, self.reason)
+        response['X-Profile-Id'] = profile_id
+        return response
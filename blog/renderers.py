@@ -0,0 +1,116 @@
+import queue
+import re
+from collections import Counter
+from contextlib import contextmanager
+
+from django.utils.html import strip_tags
+from django.utils.text import slugify
+from markdown import Markdown
+from markdown.extensions.toc import TocExtension
+
+from . import highlight
+from .metrics import timed
+
+# 渲染器版本号: 修改Markdown拓展配置后需要递增, 以便重新渲染已保存的博客
+RENDERER_VERSION = 1
+
+# 代码块高亮结果按(语言, 代码, 样式)缓存
+highlight.install()
+
+
+def get_body_markdown():
+    """博客正文使用的Markdown对象"""
+    return Markdown(extensions=[
+        'markdown.extensions.extra',  # 基础拓展
+        'markdown.extensions.codehilite',  # 语法高亮拓展
+        # 'markdown.extensions.toc',  # 自动生成目录拓展, 默认使用_数字称作为锚点
+        TocExtension(slugify=slugify),  # 自动生成目录拓展, 使用标题名称作为锚点, 使用django的slugify函数处理中文标题
+    ])
+
+
+def get_excerpt_markdown():
+    """生成摘要使用的Markdown对象"""
+    return Markdown(extensions=[
+        'markdown.extensions.extra',
+        'markdown.extensions.codehilite',
+    ])
+
+
+def get_comment_markdown():
+    """评论使用的Markdown对象"""
+    return Markdown()
+
+
+class RendererPool:
+    """
+    Markdown对象池
+
+    创建Markdown对象需要加载拓展并编译大量正则表达式, 比转换一篇短文还慢.
+    按配置(profile)缓存创建好的对象, 使用后reset()放回池中供下次使用;
+    Markdown对象不是线程安全的, 同一时刻只借给一个线程, 池中没有空闲对象时创建新对象
+    """
+
+    def __init__(self, factories, max_idle=8):
+        self.factories = factories
+        self._idle = {profile: queue.LifoQueue(maxsize=max_idle) for profile in factories}
+        # 各配置创建的对象数, 用于观察池的效果
+        self.created = Counter()
+
+    @contextmanager
+    def renderer(self, profile):
+        idle = self._idle[profile]
+        try:
+            md = idle.get_nowait()
+        except queue.Empty:
+            md = self.factories[profile]()
+            self.created[profile] += 1
+        try:
+            yield md
+        finally:
+            md.reset()
+            try:
+                idle.put_nowait(md)
+            except queue.Full:
+                pass
+
+    def clear(self):
+        for idle in self._idle.values():
+            while not idle.empty():
+                idle.get_nowait()
+
+
+renderer_pool = RendererPool({
+    'body': get_body_markdown,
+    'excerpt': get_excerpt_markdown,
+    'comment': get_comment_markdown,
+})
+
+
+@timed('markdown')
+def render_body(body):
+    """将博客正文转换为HTML, 返回(HTML, 目录)"""
+    with renderer_pool.renderer('body') as md:
+        # 防止XSS攻击: 在转换Markdown之前去除HTML标签
+        html = md.convert(strip_tags(body))
+        toc_html = md.toc
+
+    # 取出body中的[TOC]目录用于其他地方
+    # 不存在目录(Markdown标题文本)则不生成相关HTML
+    m = re.search(r'<div class="toc">\s*<ul>(.*)</ul>\s*</div>', toc_html, re.S)
+    toc = m.group(1) if m is not None else ''
+
+    return html, toc
+
+
+@timed('markdown')
+def render_excerpt(body, length=54):
+    """去除Markdown标记: Markdown文本 -> HTML文本 -> 纯文本"""
+    with renderer_pool.renderer('excerpt') as md:
+        return strip_tags(md.convert(body))[:length]
+
+
+@timed('markdown')
+def render_comment(text):
+    """将评论转换为HTML, 转换前去除HTML标签防止XSS攻击"""
+    with renderer_pool.renderer('comment') as md:
+        return md.convert(strip_tags(text))
@@ -0,0 +1,119 @@
+import contextvars
+import random
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# 记录最近写入时间的Cookie: 写入后的一段时间内该客户端的读取也使用主库, 避免读到复制延迟前的旧数据
+PRIMARY_COOKIE = 'primary_until'
+
+
+class RoutingState:
+    """单个请求的路由状态"""
+
+    def __init__(self, use_primary=False):
+        # 为True时读取也使用主库
+        self.use_primary = use_primary
+        # 请求中是否写入过主库
+        self.wrote = False
+
+
+# 当前请求的路由状态, 随上下文传递到sync_to_async的线程中; 不在请求中(管理命令/shell等)时为None
+_state = contextvars.ContextVar('routing_state', default=None)
+# 为True时当前上下文中的读取使用主库, 见use_primary()
+_force_primary = contextvars.ContextVar('force_primary', default=False)
+# 为True时当前上下文中的写入不计入请求的写入, 见untracked_writes()
+_untracked = contextvars.ContextVar('untracked_writes', default=False)
+
+# 只使用主库且写入不计入请求的写入的应用: 会话在每个请求中读取, 从库延迟会读不到刚保存的会话
+PRIMARY_APPS = {'sessions'}
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def sticky_seconds():
+    # 应大于数据库的复制延迟
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+
+
+class PrimaryReplicaRouter:
+    """
+    读写分离: 写入主库(default), 请求中的读取随机使用DATABASE_REPLICAS中的从库
+
+    以下情况读取使用主库:
+    - 不在请求中(管理命令/信号以外的后台任务等), 保证读到最新的数据
+    - 请求中已经写入过主库, 之后的读取可能依赖刚写入的数据
+    - 客户端最近(REPLICA_STICKY_SECONDS秒内)写入过, 如发表博客/评论后跳转的页面
+    - 在use_primary()中, 如生成写入缓存的数据
+    - PRIMARY_APPS中的模型(会话)
+
+    只有内容的写入才使之后的读取使用主库并通知客户端: 会话及untracked_writes()中的写入(阅读量缓冲区)
+    在匿名GET请求中也会发生, 不影响读取的路由
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        pool = replicas()
+        if (state is None or state.use_primary or _force_primary.get() or not pool
+                or model._meta.app_label in PRIMARY_APPS):
+            return DEFAULT_DB_ALIAS
+        return random.choice(pool)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None and not _untracked.get() and model._meta.app_label not in PRIMARY_APPS:
+            state.wrote = state.use_primary = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 配置的数据库都是主库或主库的从库, 数据相同, 允许从不同数据库读取的对象相互关联
+        return True
+
+
+@contextmanager
+def use_primary():
+    """
+    其中的读取使用主库
+
+    用于生成写入带版本号缓存的数据: 写入主库后版本号立即更换, 从库延迟时读到的写入前的数据会存到新版本号下,
+    之后的读取(包括刚写入的客户端)都会读到旧数据
+    """
+    token = _force_primary.set(True)
+    try:
+        yield
+    finally:
+        _force_primary.reset(token)
+
+
+@contextmanager
+def untracked_writes():
+    """其中的写入不计入请求的写入, 用于与请求内容无关的写入(如阅读量缓冲区写入数据库)"""
+    token = _untracked.set(True)
+    try:
+        yield
+    finally:
+        _untracked.reset(token)
+
+
+def start_request(request):
+    """开始路由当前请求, 返回用于结束的令牌"""
+    try:
+        use_primary = float(request.COOKIES.get(PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        use_primary = False
+    return _state.set(RoutingState(use_primary))
+
+
+def finish_request(response, token):
+    """结束路由: 请求中写入过主库时, 通知客户端之后的读取使用主库"""
+    state = _state.get()
+    _state.reset(token)
+    if state.wrote and replicas():
+        seconds = sticky_seconds()
+        response.set_cookie(PRIMARY_COOKIE, str(time.time() + seconds), max_age=seconds, httponly=True,
+                            samesite='Lax')
+    return response
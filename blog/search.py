@@ -0,0 +1,163 @@
+import html
+import math
+import re
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+from django.utils.html import escape, strip_tags
+from django.utils.safestring import mark_safe
+
+from .cache import get_or_set_versioned, model_namespace
+from .models import Blog, SearchPosting
+
+# 标题中出现的词项权重
+TITLE_WEIGHT = 5
+# 词项最大长度, 与SearchPosting.term字段长度一致
+MAX_TERM_LENGTH = 64
+# 博客总数(计算idf)的缓存时间, 博客增删时随版本号失效, 过期时间仅作为兜底
+BLOG_COUNT_TIMEOUT = 60 * 60
+
+# 英文单词/数字
+WORD_RE = re.compile(r'[0-9a-z_]+')
+# 中日韩文字
+CJK_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+')
+
+
+def tokenize(text, unigrams=False):
+    """
+    分词: 英文按单词切分并转为小写, 中日韩文字按相邻两字(bigram)切分,
+    单独出现的一个汉字作为一个词项
+
+    unigrams为True时同时输出每个汉字, 用于建立索引: 检索单个汉字(如"书")时也能命中"好书"
+    """
+    text = text.lower()
+    for word in WORD_RE.findall(text):
+        yield word[:MAX_TERM_LENGTH]
+    for run in CJK_RE.findall(text):
+        if len(run) == 1:
+            yield run
+            continue
+        for i in range(len(run) - 1):
+            yield run[i:i + 2]
+        if unigrams:
+            yield from run
+
+
+def count_terms(title, body):
+    """统计博客的词频, 标题中的词项计TITLE_WEIGHT次"""
+    tf = Counter(tokenize(body, unigrams=True))
+    for term in tokenize(title, unigrams=True):
+        tf[term] += TITLE_WEIGHT
+    return tf
+
+
+def build_postings(blog_id, tf, model=SearchPosting):
+    """根据词频生成倒排索引记录, 迁移中以model传入历史模型"""
+    return [
+        # 对词频取对数, 避免个别高频词项主导排序
+        model(term=term, blog_id=blog_id, weight=1 + math.log(count))
+        for term, count in tf.items()
+    ]
+
+
+def index_blog(blog):
+    """重建单篇博客的索引"""
+    with transaction.atomic():
+        SearchPosting.objects.filter(blog=blog).delete()
+        SearchPosting.objects.bulk_create(build_postings(blog.pk, count_terms(blog.title, blog.body)))
+
+
+class SearchResults:
+    """
+    按相关度排序的检索结果
+
+    只在首次使用时执行一次排序查询得到博客id列表, 切片时只查询当前页的博客,
+    可直接交给Paginator分页
+    """
+
+    def __init__(self, query, queryset=None):
+        self.query = (query or '').strip()
+        self.terms = list(dict.fromkeys(tokenize(self.query)))
+        self.queryset = queryset if queryset is not None else Blog.objects.all()
+        self._ranking = None
+
+    @property
+    def ranking(self):
+        if self._ranking is None:
+            self._ranking = self._rank()
+        return self._ranking
+
+    def _rank(self):
+        if not self.terms:
+            return []
+
+        postings = SearchPosting.objects.filter(term__in=self.terms)
+        # 有过滤条件时只在过滤后的博客中检索
+        if self.queryset.query.has_filters():
+            postings = postings.filter(blog__in=self.queryset.values('pk'))
+
+        # 文档频率
+        df = dict(postings.order_by().values_list('term').annotate(Count('pk')))
+        # 所有词项都需要命中
+        if len(df) < len(self.terms):
+            return []
+
+        total = get_or_set_versioned(model_namespace(Blog), ['count'], Blog.objects.count, BLOG_COUNT_TIMEOUT)
+        idf = {term: math.log(1 + total / df[term]) for term in self.terms}
+        score = Sum(F('weight') * Case(
+            *[When(term=term, then=Value(idf[term])) for term in self.terms],
+            output_field=FloatField(),
+        ))
+        return list(
+            postings.values('blog_id')
+            .annotate(matched=Count('pk'), score=score)
+            .filter(matched=len(self.terms))
+            .order_by('-score', '-blog_id')
+            .values_list('blog_id', 'score')
+        )
+
+    def count(self):
+        return len(self.ranking)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        ranking = self.ranking[index]
+        blogs = self.queryset.in_bulk([pk for pk, _ in ranking])
+        results = []
+        for pk, score in ranking:
+            blog = blogs.get(pk)
+            if blog is None:
+                continue
+            blog.score = score
+            # 去掉标签后的HTML仍包含&lt;等实体, 还原为原文后再转义
+            blog.snippet = highlight(html.unescape(strip_tags(blog.body_html)) or blog.body, self.query)
+            results.append(blog)
+        return results
+
+
+def highlight(text, query, length=120):
+    """截取文本中第一处命中位置附近的片段, 并用<mark>标记命中的关键词"""
+    needles = {word for word in query.split() if word}
+    needles.update(tokenize(query))
+    if not needles:
+        return escape(text[:length])
+    pattern = re.compile('|'.join(re.escape(n) for n in sorted(needles, key=len, reverse=True)), re.I)
+
+    m = pattern.search(text)
+    start = max(m.start() - length // 3, 0) if m is not None else 0
+    snippet = text[start:start + length]
+
+    parts, pos = [], 0
+    for m in pattern.finditer(snippet):
+        parts.append(escape(snippet[pos:m.start()]))
+        parts.append(f'<mark>{escape(m.group())}</mark>')
+        pos = m.end()
+    parts.append(escape(snippet[pos:]))
+    prefix = '...' if start > 0 else ''
+    suffix = '...' if start + length < len(text) else ''
+    return mark_safe(prefix + ''.join(parts) + suffix)
@@ -1,7 +1,15 @@
 from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
 
+from .counters import page_view_buffer
+from .metrics import timed
 from .models import Blog, Category, Tag, MyUser, Comment
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -24,23 +32,156 @@ class MyUserSerializer(serializers.ModelSerializer):
 class BlogListSerializer(serializers.ModelSerializer):
     category = CategorySerializer()
     author = MyUserSerializer()
+    page_view = serializers.IntegerField(source='total_page_view', read_only=True)
 
     class Meta:
         model = Blog
-        exclude = ['body', 'tags']
+        exclude = ['body', 'body_html', 'toc', 'render_version', 'tags']
+
+
+class BlogSearchSerializer(BlogListSerializer):
+    score = serializers.FloatField(read_only=True)
+    snippet = serializers.CharField(read_only=True)
 
 
 class BlogRetrieveSerializer(serializers.ModelSerializer):
     category = CategorySerializer()
     author = MyUserSerializer()
+    page_view = serializers.IntegerField(source='total_page_view', read_only=True)
     tags = TagSerializer(many=True)
 
     class Meta:
         model = Blog
-        fields = '__all__'
+        # 预渲染的HTML/目录只供页面使用, 接口只返回Markdown正文
+        exclude = ['body_html', 'toc', 'render_version']
 
 
 class CommentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Comment
         fields = '__all__'
+
+
+class FastSerializer:
+    """
+    高性能序列化
+
+    按序列化器的字段定义, 用values()一次查询取出全部字段(包括外键关联的分类/作者),
+    多对多字段(标签)再用一次查询取出, 直接拼装出与序列化器完全相同的数据,
+    不创建模型实例, 也不经过序列化器逐字段get_attribute的处理流程
+    """
+    # 由模型属性计算的字段: source -> (需要查询的字段, 计算函数)
+    computed_sources = {
+        'total_page_view': (['id', 'page_view'], lambda row: row['page_view'] + page_view_buffer.pending(row['id'])),
+    }
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self._plan = None
+
+    @property
+    def plan(self):
+        # 字段定义在首次使用时解析, 此时模型已加载完成
+        if self._plan is None:
+            self._plan = self._build_plan()
+        return self._plan
+
+    def _build_plan(self):
+        serializer = self.serializer_class()
+        model = serializer.Meta.model
+        # 分页需要id与created_time
+        lookups = ['id', 'created_time']
+        fields = []
+        for name, field in serializer.fields.items():
+            if isinstance(field, serializers.ListSerializer):
+                # 多对多字段: 按关联模型的反向查询名一次查出全部博客的关联数据
+                related_name = model._meta.get_field(field.source).related_query_name()
+                children = list(field.child.fields.items())
+                fields.append(('many', name, (field.source, related_name, children)))
+            elif isinstance(field, serializers.BaseSerializer):
+                # 外键字段: 通过values()的跨表查询取出
+                children = [(sub, f'{field.source}__{child.source}', child) for sub, child in field.fields.items()]
+                lookups.extend(lookup for _, lookup, _ in children)
+                fields.append(('nested', name, children))
+            elif field.source in self.computed_sources:
+                sources, func = self.computed_sources[field.source]
+                lookups.extend(sources)
+                fields.append(('computed', name, (func, field)))
+            else:
+                lookups.append(field.source)
+                fields.append(('scalar', name, field))
+        return list(dict.fromkeys(lookups)), fields
+
+    def values(self, queryset):
+        """只查询序列化需要的字段"""
+        lookups, _ = self.plan
+        return queryset.values(*lookups)
+
+    @timed('serialize')
+    def to_representation(self, rows):
+        rows = list(rows)
+        _, fields = self.plan
+        many = {
+            name: self._fetch_many(rows, *spec) for kind, name, spec in fields if kind == 'many'
+        }
+
+        result = []
+        for row in rows:
+            item = {}
+            for kind, name, spec in fields:
+                if kind == 'scalar':
+                    value = row[spec.source]
+                    item[name] = None if value is None else spec.to_representation(value)
+                elif kind == 'computed':
+                    func, field = spec
+                    item[name] = field.to_representation(func(row))
+                elif kind == 'nested':
+                    item[name] = {
+                        sub: None if row[lookup] is None else child.to_representation(row[lookup])
+                        for sub, lookup, child in spec
+                    }
+                else:
+                    item[name] = many[name].get(row['id'], [])
+            result.append(item)
+        return result
+
+    def _fetch_many(self, rows, source, related_name, children):
+        model = self.serializer_class.Meta.model
+        related_model = model._meta.get_field(source).related_model
+        related = {}
+        ids = [row['id'] for row in rows]
+        if not ids:
+            return related
+        lookups = [child.source for _, child in children]
+        for value in related_model.objects.filter(**{f'{related_name}__in': ids}).values(related_name, *lookups):
+            related.setdefault(value[related_name], []).append({
+                sub: None if value[child.source] is None else child.to_representation(value[child.source])
+                for sub, child in children
+            })
+        return related
+
+
+fast_blog_list_serializer = FastSerializer(BlogListSerializer)
+fast_blog_retrieve_serializer = FastSerializer(BlogRetrieveSerializer)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    使用orjson的JSON渲染器, 输出与JSONRenderer逐字节相同
+
+    未安装orjson或需要缩进输出时使用JSONRenderer
+    """
+
+    @timed('serialize')
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # orjson不支持的类型(如惰性翻译字符串/Decimal)以及日期时间交给JSONRenderer使用的编码器处理
+        ret = orjson.dumps(
+            data, default=self.encoder_class().default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS,
+        )
+        # 与JSONRenderer一致, 转义\u2028与\u2029
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
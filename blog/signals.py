@@ -0,0 +1,157 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .archives import archive_month, update_archive_counts
+from .auth import invalidate_user
+from .counts import adjust_count
+from .cache import COMMENTS, SIDEBAR, bump_generation, comments_namespace, model_namespace
+from .models import Blog, Category, Tag, Comment, MyUser
+from .search import index_blog
+
+
+@receiver(post_save, sender=Blog)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    # 只有标题或正文变化时才需要重建索引
+    if update_fields is not None and not {'title', 'body'} & set(update_fields):
+        return
+    index_blog(instance)
+
+
+@receiver(post_save, sender=Blog)
+def increase_archive_count(sender, instance, created, **kwargs):
+    # 发布时间不可修改, 只有新发布的博客影响归档
+    if created:
+        update_archive_counts({archive_month(instance.created_time): 1})
+
+
+@receiver(post_delete, sender=Blog)
+def decrease_archive_count(sender, instance, **kwargs):
+    update_archive_counts({archive_month(instance.created_time): -1})
+
+
+def on_commit(func, *args):
+    """
+    在当前事务提交后执行缓存失效, 不在事务中时立即执行
+
+    提交前其他进程仍读到旧数据, 如果此时就递增版本号, 按旧数据生成的缓存会写入新版本号下,
+    在过期前一直被使用
+    """
+    transaction.on_commit(partial(func, *args))
+
+
+# 冗余计数: 模型 -> (外键字段, 被计数的模型, 计数字段)
+COUNTED_RELATIONS = {
+    Blog: ('category', Category, 'blog_count'),
+    Comment: ('blog', Blog, 'comment_count'),
+}
+
+
+@receiver(pre_save, sender=Blog)
+@receiver(pre_save, sender=Comment)
+def remember_relation(sender, instance, update_fields=None, **kwargs):
+    # 记录修改前的分类/博客, 保存后据此调整计数
+    field = COUNTED_RELATIONS[sender][0]
+    instance._previous_relation = None
+    if instance._state.adding or (update_fields is not None and field not in update_fields):
+        return
+    instance._previous_relation = sender.objects.filter(pk=instance.pk)\
+        .values_list(f'{field}_id', flat=True).first()
+
+
+@receiver(post_save, sender=Blog)
+@receiver(post_save, sender=Comment)
+def update_relation_count(sender, instance, created, **kwargs):
+    field, model, count_field = COUNTED_RELATIONS[sender]
+    current = getattr(instance, f'{field}_id')
+    previous = instance.__dict__.pop('_previous_relation', None)
+    if created:
+        adjust_count(model, [current], count_field, 1)
+    elif previous is not None and previous != current:
+        adjust_count(model, [previous], count_field, -1)
+        adjust_count(model, [current], count_field, 1)
+
+
+@receiver(post_delete, sender=Blog)
+@receiver(post_delete, sender=Comment)
+def decrease_relation_count(sender, instance, **kwargs):
+    field, model, count_field = COUNTED_RELATIONS[sender]
+    adjust_count(model, [getattr(instance, f'{field}_id')], count_field, -1)
+
+
+@receiver(pre_delete, sender=Blog)
+def remember_tags(sender, instance, **kwargs):
+    # 删除博客时级联删除的标签关联不发送m2m_changed信号, 先记录博客的标签
+    instance._previous_tags = list(instance.tags.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Blog)
+def decrease_tag_count(sender, instance, **kwargs):
+    adjust_count(Tag, instance.__dict__.pop('_previous_tags', []), 'blog_count', -1)
+
+
+@receiver(m2m_changed, sender=Blog.tags.through)
+def update_tag_count(sender, instance, action, reverse, pk_set, **kwargs):
+    # reverse为True时instance为标签, 否则instance为博客
+    if action in ('pre_remove', 'pre_clear'):
+        # 移除不存在的关联不影响计数, 先查出实际被移除的关联
+        own, other = ('tag', 'blog') if reverse else ('blog', 'tag')
+        relations = sender.objects.filter(**{own: instance.pk})
+        if pk_set is not None:
+            relations = relations.filter(**{f'{other}__in': pk_set})
+        instance._removed_relations = list(relations.values_list(f'{other}_id', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if action == 'post_add':
+            # pk_set只包含新增的关联
+            pks, delta = pk_set, 1
+        else:
+            pks, delta = instance.__dict__.pop('_removed_relations', []), -1
+        if reverse:
+            adjust_count(Tag, [instance.pk], 'blog_count', delta * len(pks))
+        else:
+            adjust_count(Tag, pks, 'blog_count', delta)
+
+
+@receiver(post_save, sender=Blog)
+@receiver(post_delete, sender=Blog)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(m2m_changed, sender=Blog.tags.through)
+def invalidate_sidebar(sender, **kwargs):
+    # 侧边栏(最新文章/归档/分类/标签)数据变化, 使侧边栏缓存失效
+    on_commit(bump_generation, SIDEBAR)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comments(sender, instance, **kwargs):
+    # 发表或删除评论后使该博客的评论列表缓存失效
+    on_commit(bump_generation, COMMENTS, comments_namespace(instance.blog_id))
+
+
+@receiver(post_save, sender=Blog)
+@receiver(post_delete, sender=Blog)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(m2m_changed, sender=Blog.tags.through)
+def invalidate_responses(sender, **kwargs):
+    # 递增模型的版本号, 使依赖该模型的接口响应缓存失效
+    if sender is Blog.tags.through:
+        on_commit(bump_generation, model_namespace(Blog), model_namespace(Tag))
+    else:
+        on_commit(bump_generation, model_namespace(sender))
+
+
+@receiver(post_save, sender=MyUser)
+@receiver(post_delete, sender=MyUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # 用户信息(包括密码, 影响会话校验)变化后, 下次请求重新从数据库读取
+    on_commit(invalidate_user, instance.pk)
@@ -0,0 +1,15 @@
+from django import template
+
+from ..assets import bundle_tags
+
+register = template.Library()
+
+
+@register.simple_tag
+def bundle(name):
+    """
+    引用资源包: 执行build_assets后为带内容哈希的合并文件, 否则为合并前的各个文件
+
+    用法: {% bundle 'blog.css' %}
+    """
+    return bundle_tags(name)
@@ -1,21 +1,29 @@
+from functools import partial
+
 from django import template
-from django.db.models import Count
-from django.db.models.functions import ExtractYear, ExtractMonth
 
-from ..models import Blog, Category, Tag
+from ..cache import SIDEBAR, get_or_set_versioned
+from ..metrics import timed
+from ..models import ArchiveMonth, Blog, Category, Tag
 
 register = template.Library()
 
+# 侧边栏数据只在发布/修改/删除博客时变化, 缓存键带有版本号, 由信号递增版本号使缓存失效
+# 过期时间仅作为兜底
+SIDEBAR_TIMEOUT = 60 * 60
+# 页面侧边栏(base.html)显示的最新文章数, 也是show_recent_blogs的默认数量
+RECENT_BLOGS_NUM = 4
 
-@register.inclusion_tag('blog/inclusions/_recent_blogs.html', takes_context=True)
-def show_recent_blogs(context, num=5):
-    return {
-        'recent_blog_list': Blog.objects.all()[:num],
-    }
 
+@timed('sidebar')
+def recent_blogs(num=5):
+    return get_or_set_versioned(
+        SIDEBAR, ['recent_blogs', num], lambda: list(Blog.objects.only('pk', 'title')[:num]), SIDEBAR_TIMEOUT
+    )
 
-@register.inclusion_tag('blog/inclusions/_archives.html', takes_context=True)
-def show_archives(context):
+
+@timed('sidebar')
+def archives():
     # 统计每月发布的文章数
     # 方法一:
     # date_list = Blog.objects.dates('created_time', 'month', order='DESC')
@@ -28,31 +36,72 @@ def show_archives(context):
     # }
 
     # 方法二:
-    return {
-        # 按年份和月份分组
-        'date_list': Blog.objects.annotate(
-            year=ExtractYear('created_time'), month=ExtractMonth('created_time')
-        )
-            # 生成只包含上一步分组结果的字典
-            .values('year', 'month')
-            # 排序
-            .order_by('year', 'month')
-            # 再次分组将year与month相同的元素聚合
-            .annotate(blog_count=Count('pk'))
-    }
+    # Blog.objects.annotate(year=ExtractYear('created_time'), month=ExtractMonth('created_time'))
+    #     .values('year', 'month').order_by('year', 'month').annotate(blog_count=Count('pk'))
+    # 需要全表扫描并分组, 博客数量很多时很慢
+
+    # 方法三: 读取发布/删除博客时增量维护的归档数据
+    return get_or_set_versioned(
+        SIDEBAR, ['archives'],
+        lambda: list(ArchiveMonth.objects.filter(blog_count__gt=0).values('year', 'month', 'blog_count')),
+        SIDEBAR_TIMEOUT,
+    )
+
+
+@timed('sidebar')
+def categories():
+    # 过滤分类下文章数量(冗余字段)大于0的分类
+    return get_or_set_versioned(
+        SIDEBAR, ['categories'], lambda: list(Category.objects.filter(blog_count__gt=0)), SIDEBAR_TIMEOUT
+    )
+
+
+@timed('sidebar')
+def tags():
+    # 过滤标签下文章数量(冗余字段)大于0的标签
+    return get_or_set_versioned(
+        SIDEBAR, ['tags'], lambda: list(Tag.objects.filter(blog_count__gt=0)), SIDEBAR_TIMEOUT
+    )
+
+
+# 侧边栏各项数据, 异步视图预先并发获取后放入上下文的sidebar中
+SIDEBAR_DATA = {
+    'recent_blogs': partial(recent_blogs, RECENT_BLOGS_NUM),
+    'archives': archives,
+    'categories': categories,
+    'tags': tags,
+}
+
+
+def sidebar_data():
+    return {name: func() for name, func in SIDEBAR_DATA.items()}
+
+
+def get_sidebar(context, name, default):
+    """优先使用上下文中预先获取的侧边栏数据"""
+    sidebar = context.get('sidebar') or {}
+    if name in sidebar:
+        return sidebar[name]
+    return default()
+
+
+@register.inclusion_tag('blog/inclusions/_recent_blogs.html', takes_context=True)
+def show_recent_blogs(context, num=RECENT_BLOGS_NUM):
+    if num != RECENT_BLOGS_NUM:
+        return {'recent_blog_list': recent_blogs(num)}
+    return {'recent_blog_list': get_sidebar(context, 'recent_blogs', partial(recent_blogs, num))}
+
+
+@register.inclusion_tag('blog/inclusions/_archives.html', takes_context=True)
+def show_archives(context):
+    return {'date_list': get_sidebar(context, 'archives', archives)}
 
 
 @register.inclusion_tag('blog/inclusions/_categories.html', takes_context=True)
 def show_categories(context):
-    return {
-        # 按文章分类分组, 过滤分类下文章数量大于0的分类
-        'category_list': Category.objects.annotate(blog_count=Count('blog')).filter(blog_count__gt=0),
-    }
+    return {'category_list': get_sidebar(context, 'categories', categories)}
 
 
 @register.inclusion_tag('blog/inclusions/_tags.html', takes_context=True)
 def show_tags(context):
-    return {
-        # 按文章标签分组, 过滤标签下文章数量大于0的标签
-        'tag_list': Tag.objects.annotate(blog_count=Count('blog')).filter(blog_count__gt=0),
-    }
+    return {'tag_list': get_sidebar(context, 'tags', tags)}
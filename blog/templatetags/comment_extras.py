@@ -1,12 +1,17 @@
 from django import template
-from django.utils.html import strip_tags
-from markdown import markdown
+from django.template.loader import render_to_string
 
+from ..cache import comments_namespace, get_or_set_versioned
 from ..forms import CommentForm
+from ..metrics import timed
 from ..models import Comment
+from ..renderers import render_comment
 
 register = template.Library()
 
+# 评论列表缓存在发表/删除评论时失效, 过期时间仅作为兜底
+COMMENTS_TIMEOUT = 60 * 60
+
 
 @register.inclusion_tag(filename='blog/inclusions/_comment_form.html', takes_context=True)
 def show_comment_form(context, blog, form=None):
@@ -19,15 +24,27 @@ def show_comment_form(context, blog, form=None):
     }
 
 
-@register.inclusion_tag(filename='blog/inclusions/_comment_list.html', takes_context=True)
+@timed('comments')
+def comment_list_html(blog_pk):
+    """评论列表, 渲染结果按博客缓存"""
+    def render():
+        # 一次查询取出评论及评论用户
+        comment_list = list(Comment.objects.filter(blog_id=blog_pk).select_related('user'))
+        for comment in comment_list:
+            # 兼容保存时尚未预渲染的旧评论
+            if not comment.text_html:
+                comment.text_html = render_comment(comment.text)
+        return render_to_string('blog/inclusions/_comment_list.html', {
+            'comment_list': comment_list,
+            'comment_count': len(comment_list),
+        })
+
+    return get_or_set_versioned(comments_namespace(blog_pk), ['html'], render, COMMENTS_TIMEOUT)
+
+
+@register.simple_tag(takes_context=True)
 def show_comments(context, blog):
-    """评论列表"""
-    comment_list = Comment.objects.filter(blog=blog)
-    # 支持Markdown
-    for comment in comment_list:
-        comment.text = markdown(strip_tags(comment.text))
-    comment_count = comment_list.count()
-    return {
-        'comment_list': comment_list,
-        'comment_count': comment_count,
-    }
+    """评论列表, 优先使用异步视图预先获取的结果"""
+    if 'comment_html' in context:
+        return context['comment_html']
+    return comment_list_html(blog.pk)
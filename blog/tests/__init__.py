@@ -0,0 +1,52 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+
+from blog.counters import page_view_buffer
+from blog.models import Category, MyUser
+from blog.throttling import throttle_store
+from login import captcha
+from login.captcha import CaptchaPool
+
+
+def create_user(username='admin', **extra_fields):
+    """创建用户, 邮箱与密码由用户名生成"""
+    return MyUser.objects.create_user(username, f'{username}@example.com', username, **extra_fields)
+
+
+def create_category(name='Python学习笔记'):
+    return Category.objects.create(name=name)
+
+
+class SharedStateMixin:
+    """
+    每个测试前后重置测试数据库以外的共享状态
+
+    缓存与限流令牌桶保存在进程外, 阅读量缓冲在进程内存中, 都不会随测试事务回滚
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        throttle_store.clear()
+
+    def tearDown(self):
+        page_view_buffer.clear()
+        super().tearDown()
+
+    def patch_captcha_pool(self, size=5, min_size=1):
+        """以请求中补充的小验证码池代替全局验证码池(测试数据库不能在后台线程中写入)"""
+        pool = CaptchaPool(size=size, min_size=min_size, background=False)
+        patcher = mock.patch.object(captcha, 'captcha_pool', pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return pool
+
+
+class BlogTestCase(SharedStateMixin, TestCase):
+    pass
+
+
+class BlogTransactionTestCase(SharedStateMixin, TransactionTestCase):
+    pass
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.archives import rebuild_archives
+from blog.models import ArchiveMonth, Blog
+from blog.tests import BlogTestCase, create_category, create_user
+
+
+class ArchiveTestCase(BlogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.category = create_category()
+
+    def create_blog(self, *args):
+        return Blog.objects.create(author=self.user, category=self.category, title='标题', body='正文',
+                                   created_time=timezone.make_aware(datetime(*args)))
+
+    def archives(self):
+        return list(ArchiveMonth.objects.filter(blog_count__gt=0).values_list('year', 'month', 'blog_count'))
+
+    def test_incremental(self):
+        blog = self.create_blog(2020, 1, 31, 23, 59)
+        self.create_blog(2020, 1, 1)
+        self.create_blog(2020, 2, 1)
+        self.assertEqual(self.archives(), [(2020, 1, 2), (2020, 2, 1)])
+
+        # 修改博客不影响归档
+        blog.title = '新标题'
+        blog.save()
+        blog.delete()
+        self.assertEqual(self.archives(), [(2020, 1, 1), (2020, 2, 1)])
+
+        # 增量维护的结果与全表统计一致
+        rebuild_archives()
+        self.assertEqual(self.archives(), [(2020, 1, 1), (2020, 2, 1)])
+
+    def test_archive_page(self):
+        # 按当前时区的月份边界过滤
+        self.create_blog(2020, 1, 31, 23, 59)
+        self.create_blog(2020, 2, 1)
+        self.create_blog(2020, 12, 31, 23, 59)
+        for year, month, count in [(2020, 1, 1), (2020, 2, 1), (2020, 12, 1), (2021, 1, 0)]:
+            response = self.client.get(reverse('blog:archive', kwargs={'year': year, 'month': month}))
+            self.assertEqual(len(response.context['blog_list']), count)
+        response = self.client.get(reverse('blog:archive', kwargs={'year': 2020, 'month': 13}))
+        self.assertEqual(len(response.context['blog_list']), 0)
+
+    def test_api_filter(self):
+        self.create_blog(2020, 1, 31, 23, 59)
+        self.create_blog(2020, 2, 1)
+        self.create_blog(2021, 2, 1)
+        url = reverse('blog:blog-list')
+        for i, (params, count) in enumerate([
+            ({'created_year': 2020}, 2),
+            ({'created_year': 2020, 'created_month': 2}, 1),
+            ({'created_month': 2}, 2),
+        ]):
+            response = self.client.get(url, params, REMOTE_ADDR=f'10.0.0.{i}')
+            self.assertEqual(len(response.json()['results']), count)
@@ -0,0 +1,77 @@
+import gzip
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.template import Context, Template
+from django.test import SimpleTestCase
+
+from blog import assets
+
+BUNDLES = {
+    'test.css': ['blog/css/pace.css', 'blog/css/bootstrap.min.css'],
+    'test.js': ['blog/js/script.js'],
+}
+
+
+class AssetsTestCase(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        dist_dir = Path(tmp.name).resolve()
+        patcher = mock.patch.multiple(
+            assets, DIST_DIR=dist_dir, MANIFEST_FILE=dist_dir / 'manifest.json',
+            BUNDLES=BUNDLES, _manifest_cache={},
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.dist_dir = dist_dir
+
+    def render(self, name):
+        return Template('{% load assets %}{% bundle name %}').render(Context({'name': name}))
+
+    def test_minify_css(self):
+        css = '/* 注释 */\na > b ,\nc {\n  content: "x , y" ;\n  color: red;\n}\n'
+        self.assertEqual(assets.minify_css(css), 'a>b,c{content: "x , y";color: red}')
+        self.assertEqual(
+            assets.rewrite_css_urls('a{background:url("../img/a.png")}', 'blog/css/a.css', 'blog/dist/a.css'),
+            'a{background:url("../img/a.png")}',
+        )
+        self.assertEqual(
+            assets.rewrite_css_urls('a{background:url(a.png)}', 'blog/css/a.css', 'blog/dist/a.css'),
+            'a{background:url(../css/a.png)}',
+        )
+
+    def test_build(self):
+        # 未构建时引用合并前的文件
+        self.assertIn('/static/blog/css/pace.css', self.render('test.css'))
+
+        manifest = assets.build()
+        self.assertRegex(manifest['test.css'], r'^blog/dist/test\.[0-9a-f]{12}\.css$')
+        path = self.dist_dir / manifest['test.css'].split('/', 2)[2]
+        content = path.read_bytes()
+        self.assertEqual(gzip.decompress(path.with_name(path.name + '.gz').read_bytes()), content)
+        self.assertIn(b'.pace .pace-progress{', content)
+        self.assertEqual(self.render('test.css'), f'<link rel="stylesheet" href="/static/{manifest["test.css"]}">')
+        self.assertEqual(self.render('test.js'), f'<script src="/static/{manifest["test.js"]}"></script>')
+
+        # 内容不变时文件名不变, 删除过期的构建产物
+        stale = self.dist_dir / 'test.000000000000.css'
+        stale.write_text('')
+        self.assertEqual(assets.build(), manifest)
+        self.assertFalse(stale.exists())
+
+    def test_serve(self):
+        url = '/static/' + assets.build()['test.css']
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Cache-Control'], assets.IMMUTABLE_CACHE_CONTROL)
+        content = gzip.decompress(b''.join(response.streaming_content))
+
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(response.streaming_content), content)
+
+        for path in [url + '.gz', '/static/blog/dist/../css/pace.css', '/static/blog/dist/missing.css']:
+            self.assertEqual(self.client.get(path).status_code, 404)
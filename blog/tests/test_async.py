@@ -0,0 +1,61 @@
+import re
+
+from asgiref.sync import async_to_sync
+from django.test import override_settings
+from django.urls import reverse
+
+from blog.models import Blog, Comment, Tag
+from blog.tests import BlogTransactionTestCase, create_category, create_user
+
+# 每次请求不同的内容: CSRF令牌与阅读量
+VARYING_RE = re.compile(r'name="csrfmiddlewaretoken" value="[^"]*"|\d+ 阅读')
+
+
+class AsyncViewTestCase(BlogTransactionTestCase):
+    """并发查询在其他线程的数据库连接中执行, 测试数据需要提交"""
+
+    def setUp(self):
+        super().setUp()
+        user = create_user()
+        category = create_category()
+        tag = Tag.objects.create(name='Django')
+        self.blog = Blog.objects.create(author=user, category=category, title='标题', body='正文 python')
+        self.blog.tags.add(tag)
+        Comment.objects.create(user=user, blog=self.blog, text='评论')
+        self.urls = [
+            reverse('blog:list'),
+            reverse('blog:detail', kwargs={'pk': self.blog.pk}),
+            reverse('blog:archive', kwargs={'year': self.blog.created_time.year, 'month': self.blog.created_time.month}),
+            reverse('blog:category', kwargs={'pk': category.pk}),
+            reverse('blog:tag', kwargs={'pk': tag.pk}),
+            reverse('blog:author', kwargs={'pk': user.pk}),
+            reverse('blog:search') + '?query=python',
+        ]
+
+    def assertSamePages(self):
+        for url in self.urls:
+            response = self.client.get(url)
+            async_response = async_to_sync(self.async_client.get)(url)
+            self.assertEqual(async_response.status_code, 200)
+            # 侧边栏/评论由异步视图预先获取
+            self.assertIn('sidebar', async_response.context)
+            self.assertEqual(VARYING_RE.sub('', async_response.content.decode()),
+                             VARYING_RE.sub('', response.content.decode()))
+
+    def test_same_content(self):
+        self.assertSamePages()
+
+    @override_settings(ASYNC_CONCURRENT_QUERIES=False)
+    def test_sequential(self):
+        self.assertSamePages()
+
+    def test_not_modified(self):
+        url = reverse('blog:detail', kwargs={'pk': self.blog.pk})
+        etag = async_to_sync(self.async_client.get)(url)['ETag']
+        # Django 3.2的异步测试客户端直接使用HTTP请求头名称
+        response = async_to_sync(self.async_client.get)(url, **{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_not_found(self):
+        response = async_to_sync(self.async_client.get)(reverse('blog:detail', kwargs={'pk': 0}))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,53 @@
+from django.core.cache import cache
+from django.urls import reverse
+
+from blog.models import Blog, Comment
+from blog.tests import BlogTestCase, create_category, create_user
+
+
+class CachedSessionTestCase(BlogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.blog = Blog.objects.create(author=cls.user, category=create_category(), title='标题', body='正文')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def test_no_session_queries(self):
+        url = reverse('blog:list')
+        self.client.get(url)
+        # 会话与用户都从缓存读取, 与匿名请求的查询数相同
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.context['user'], self.user)
+
+    def test_new_comment(self):
+        url = reverse('blog:comment', kwargs={'pk': self.blog.pk})
+        self.client.post(url, {'text': '预热'})
+        # 查询博客, 在事务中(保存点)写入评论并更新评论数; 不再查询用户
+        with self.assertNumQueries(5):
+            response = self.client.post(url, {'text': '评论'})
+        self.assertRedirects(response, self.blog.get_absolute_url(), fetch_redirect_response=False)
+        self.assertEqual(Comment.objects.get(text='评论').user, self.user)
+
+    def test_invalidate(self):
+        url = reverse('blog:list')
+        self.client.get(url)
+        self.user.first_name = '管理员'
+        # 缓存在事务提交后失效
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.client.get(url).context['user'].first_name, '管理员')
+
+        # 修改密码后会话失效
+        self.user.set_password('new password')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertFalse(self.client.get(url).context['user'].is_authenticated)
+
+        # 缓存被清空后会话仍然可以从数据库读取
+        self.client.force_login(self.user)
+        cache.clear()
+        self.assertEqual(self.client.get(url).context['user'], self.user)
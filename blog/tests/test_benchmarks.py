@@ -0,0 +1,57 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from blog.benchmarks import COMMENT_TEXT, Benchmark, compare, default_endpoints, serialization_benchmark, \
+    session_benchmark
+from blog.models import Blog, Comment, MyUser
+from blog.tests import BlogTestCase
+from blog.throttling import throttle_store
+
+
+class BenchmarkTestCase(BlogTestCase):
+    """用少量数据运行一遍基准测试, 保证全部页面与接口都能正常响应"""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('seed', users=3, categories=2, tags=5, posts=12, comments=30, pool_size=3,
+                     index=True, stdout=StringIO())
+
+    def setUp(self):
+        super().setUp()
+        self.patch_captcha_pool()
+
+    def test_all_endpoints(self):
+        endpoints = default_endpoints()
+        results = Benchmark(iterations=2, warmup=1).run(endpoints)
+        self.assertEqual(set(results), {ep.name for ep in endpoints})
+        for result in results.values():
+            self.assertGreaterEqual(result['p95_ms'], result['p50_ms'])
+
+    def test_keep_existing_comments(self):
+        # 在已有数据上测试时, 只删除测试中发表的评论
+        existing = Comment.objects.create(user=MyUser.objects.first(), blog=Blog.objects.first(), text=COMMENT_TEXT)
+        count = Comment.objects.count()
+        endpoints = [ep for ep in default_endpoints() if ep.method == 'post']
+        Benchmark(iterations=2, warmup=1).run(endpoints)
+        self.assertEqual(Comment.objects.count(), count)
+        self.assertTrue(Comment.objects.filter(pk=existing.pk).exists())
+
+    def test_default_iterations(self):
+        # 默认的请求次数超过发表评论的限流频率, 基准测试使用临时的令牌桶与更高的频率
+        path = throttle_store.path
+        endpoints = [ep for ep in default_endpoints() if ep.name == 'api comment create']
+        results = Benchmark().run(endpoints)
+        self.assertEqual(list(results), ['api comment create'])
+        self.assertEqual(set(session_benchmark(endpoints)), {'api comment create'})
+        self.assertEqual(throttle_store.path, path)
+
+    def test_serialization(self):
+        results = serialization_benchmark(rows=10, rounds=1)
+        self.assertEqual(set(results), {'list', 'retrieve'})
+        self.assertEqual(results['list']['rows'], 10)
+
+    def test_compare(self):
+        baseline = {'list': {'p50_ms': 10, 'p95_ms': 20, 'queries': 2}}
+        self.assertEqual(compare({'list': {'p50_ms': 11, 'p95_ms': 21, 'queries': 2}}, baseline), [])
+        self.assertEqual(len(compare({'list': {'p50_ms': 20, 'p95_ms': 21, 'queries': 3}}, baseline)), 2)
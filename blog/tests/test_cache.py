@@ -0,0 +1,49 @@
+import tempfile
+
+from django.core.cache import cache
+from django.test import override_settings
+
+from blog.cache import COMMENTS, SIDEBAR, bump_generation, get_generation, get_or_set_versioned, versioned_key
+from blog.models import Blog, Comment
+from blog.tests import BlogTestCase, create_category, create_user
+
+
+class GenerationTestCase(BlogTestCase):
+    def test_bump(self):
+        generation = get_generation('test')
+        self.assertEqual(get_generation('test'), generation)
+        key = versioned_key('test', 1)
+        self.assertEqual(get_or_set_versioned('test', [1], lambda: '旧数据'), '旧数据')
+
+        bump_generation('test')
+        self.assertNotEqual(get_generation('test'), generation)
+        self.assertNotEqual(versioned_key('test', 1), key)
+        self.assertEqual(get_or_set_versioned('test', [1], lambda: '新数据'), '新数据')
+
+        # 版本号丢失后重新初始化, 不会与之前的版本号重复
+        cache.clear()
+        self.assertNotEqual(versioned_key('test', 1), key)
+
+    def test_bump_after_commit(self):
+        user = create_user()
+        generations = get_generation(SIDEBAR), get_generation(COMMENTS)
+        with self.captureOnCommitCallbacks() as callbacks:
+            blog = Blog.objects.create(author=user, category=create_category(), title='标题', body='正文')
+            Comment.objects.create(user=user, blog=blog, text='评论')
+        # 事务提交前其他进程读到的仍是旧数据, 版本号不变
+        self.assertEqual((get_generation(SIDEBAR), get_generation(COMMENTS)), generations)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_generation(SIDEBAR), generations[0])
+        self.assertNotEqual(get_generation(COMMENTS), generations[1])
+
+    def test_file_based_cache(self):
+        # 生产环境使用的FileBasedCache不支持原子递增, 版本号直接写入新值
+        with tempfile.TemporaryDirectory() as directory, override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory,
+        }}):
+            generations = {get_generation('test')}
+            for _ in range(3):
+                bump_generation('test')
+                generations.add(get_generation('test'))
+            self.assertEqual(len(generations), 4)
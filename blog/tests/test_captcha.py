@@ -0,0 +1,63 @@
+import datetime
+from unittest import mock
+
+from captcha.models import CaptchaStore
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.tests import BlogTestCase
+from login.forms import LoginForm
+
+
+class CaptchaPoolTestCase(BlogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pool = self.patch_captcha_pool(size=5, min_size=2)
+
+    def test_pick(self):
+        self.pool.fill()
+        self.assertEqual(CaptchaStore.objects.count(), 5)
+        # 池中剩余数量不低于min_size时不访问数据库
+        with self.assertNumQueries(0):
+            keys = [self.pool.pick() for _ in range(3)]
+        self.assertEqual(len(set(keys)), 3)
+
+        # 低于min_size时补充, 同时删除过期的验证码
+        CaptchaStore.objects.filter(hashkey=keys[0]).update(expiration=timezone.now())
+        self.pool.pick()
+        self.assertEqual(self.pool.stats()['entries'], 5)
+        self.assertFalse(CaptchaStore.objects.filter(hashkey=keys[0]).exists())
+
+    def test_expired_entries(self):
+        self.pool.fill()
+        # 在池中存放过久的验证码不再取出
+        with mock.patch.object(timezone, 'now', return_value=timezone.now() + datetime.timedelta(minutes=11)):
+            key = self.pool.pick()
+        self.assertEqual(self.pool.stats()['fallbacks'], 1)
+        self.assertTrue(CaptchaStore.objects.filter(hashkey=key).exists())
+
+    def test_form(self):
+        self.pool.fill()
+        response = self.client.get(reverse('login:login'))
+        key = response.context['login_form']['captcha'].field.widget._key
+        store = CaptchaStore.objects.get(hashkey=key)
+
+        # 图片已经预先绘制
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('captcha-image', kwargs={'key': key}))
+        self.assertEqual(response['Content-Type'], 'image/png')
+
+        data = {'username': 'admin', 'password': 'admin', 'captcha_0': key, 'captcha_1': 'wrong'}
+        self.assertIn('captcha', LoginForm(data).errors)
+        # 校验与删除只需要一条语句, 验证码不能重复使用
+        data['captcha_1'] = store.response.upper()
+        with self.assertNumQueries(1):
+            self.assertTrue(LoginForm(data).is_valid())
+        self.assertIn('captcha', LoginForm(data).errors)
+        self.assertEqual(self.client.get(reverse('captcha-image', kwargs={'key': key})).status_code, 410)
+
+    def test_refresh(self):
+        self.pool.fill()
+        response = self.client.get(reverse('captcha-refresh'), HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.json()['image_url'], reverse('captcha-image', args=[response.json()['key']]))
+        self.assertEqual(self.pool.stats()['served'], 1)
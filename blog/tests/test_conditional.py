@@ -0,0 +1,68 @@
+from unittest import mock
+
+from django.urls import reverse
+
+from blog.models import Blog, Comment
+from blog.renderers import RENDERER_VERSION
+from blog.tests import BlogTestCase, create_category, create_user
+
+
+class ConditionalGetTestCase(BlogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.blog = Blog.objects.create(author=cls.user, category=create_category(), title='标题', body='正文')
+
+    def assertNotModified(self, url, queries):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('ETag'))
+        # 304响应最多只查询校验数据
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        return response
+
+    def test_detail(self):
+        url = reverse('blog:detail', kwargs={'pk': self.blog.pk})
+        etag = self.client.get(url)['ETag']
+        self.assertNotModified(url, 1)
+        # 发表评论后页面变化
+        Comment.objects.create(user=self.user, blog=self.blog, text='评论')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_detail_renderer_upgrade(self):
+        url = reverse('blog:detail', kwargs={'pk': self.blog.pk})
+        etag = self.client.get(url)['ETag']
+        # 升级渲染器后重新渲染的页面不返回304
+        with mock.patch('blog.models.RENDERER_VERSION', RENDERER_VERSION + 1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_detail_if_modified_since(self):
+        url = reverse('blog:detail', kwargs={'pk': self.blog.pk})
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_detail_varies_by_user(self):
+        url = reverse('blog:detail', kwargs={'pk': self.blog.pk})
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list(self):
+        url = reverse('blog:list')
+        etag = self.client.get(url)['ETag']
+        self.assertNotModified(url, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.blog.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_api_list(self):
+        self.assertNotModified(reverse('blog:blog-list'), 0)
+
+    def test_api_retrieve(self):
+        # 校验数据保存在响应缓存中, 不需要查询
+        self.assertNotModified(reverse('blog:blog-detail', kwargs={'pk': self.blog.pk}), 0)
+
+    def test_api_comments(self):
+        self.assertNotModified(reverse('blog:blog-list-comments', kwargs={'pk': self.blog.pk}), 0)
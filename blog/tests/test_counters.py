@@ -0,0 +1,87 @@
+from unittest import mock
+
+from django.db import DatabaseError, connection
+from django.test.utils import CaptureQueriesContext
+
+from blog.counters import PageViewBuffer
+from blog.models import Blog
+from blog.tests import BlogTestCase, create_category, create_user
+
+
+class PageViewBufferTestCase(BlogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user, category = create_user(), create_category()
+        cls.blogs = [Blog.objects.create(author=user, category=category, title=f'标题{i}', body='正文')
+                     for i in range(3)]
+
+    def setUp(self):
+        super().setUp()
+        self.buffer = PageViewBuffer(flush_threshold=5, flush_interval=60, background=False)
+
+    def page_views(self):
+        return list(Blog.objects.order_by('pk').values_list('page_view', flat=True))
+
+    def test_threshold(self):
+        for _ in range(4):
+            self.buffer.incr(self.blogs[0].pk)
+        self.assertEqual(self.page_views(), [0, 0, 0])
+        self.assertEqual(self.buffer.pending(self.blogs[0].pk), 4)
+
+        self.buffer.incr(self.blogs[1].pk)
+        self.assertEqual(self.page_views(), [4, 1, 0])
+        self.assertEqual(self.buffer.pending(self.blogs[0].pk), 0)
+
+    def test_interval(self):
+        with mock.patch('blog.counters.time.monotonic', return_value=1000):
+            buffer = PageViewBuffer(flush_threshold=100, flush_interval=10, background=False)
+        with mock.patch('blog.counters.time.monotonic', return_value=1009):
+            buffer.incr(self.blogs[0].pk)
+        self.assertEqual(self.page_views(), [0, 0, 0])
+        # 距上次写入超过间隔, 下一次计数时写入
+        with mock.patch('blog.counters.time.monotonic', return_value=1010):
+            buffer.incr(self.blogs[0].pk)
+        self.assertEqual(self.page_views(), [2, 0, 0])
+
+    def test_group_by_delta(self):
+        buffer = PageViewBuffer(flush_threshold=100, background=False)
+        for blog, n in zip(self.blogs, [2, 2, 1]):
+            buffer.incr(blog.pk, n)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(buffer.flush(), 5)
+        # 增量相同的博客合并为一条UPDATE语句
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE')]), 2)
+        self.assertEqual(self.page_views(), [2, 2, 1])
+        self.assertEqual(buffer.flush(), 0)
+
+    def test_pending_inflight(self):
+        pk = self.blogs[0].pk
+        self.buffer.incr(pk, 3)
+        seen = []
+
+        def record(execute, sql, params, many, context):
+            # 写入数据库期间, 正在写入的阅读量仍计入pending()
+            seen.append(self.buffer.pending(pk))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            self.buffer.flush()
+        self.assertIn(3, seen)
+        self.assertEqual(self.buffer.pending(pk), 0)
+
+    def test_requeue_on_error(self):
+        pk = self.blogs[0].pk
+        self.buffer.incr(pk, 3)
+
+        def fail(execute, sql, params, many, context):
+            if sql.startswith('UPDATE'):
+                raise DatabaseError('database is locked')
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(fail), self.assertLogs('blog.counters', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 0)
+        # 写入失败的阅读量放回缓冲区, 下次写入
+        self.assertEqual(self.buffer.pending(pk), 3)
+        self.buffer.incr(pk)
+        self.assertEqual(self.buffer.flush(), 4)
+        self.assertEqual(self.page_views(), [4, 0, 0])
@@ -0,0 +1,76 @@
+from blog.counts import repair_counts
+from blog.models import Blog, Category, Comment, Tag
+from blog.tests import BlogTestCase, create_category, create_user
+
+
+class DenormalizedCountTestCase(BlogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.python, cls.django = create_category('Python'), create_category('Django')
+        cls.tags = [Tag.objects.create(name=f'标签{i}') for i in range(3)]
+
+    def create_blog(self, category):
+        return Blog.objects.create(author=self.user, category=category, title='标题', body='正文')
+
+    def assertCounts(self, blogs=None, categories=None, tags=None):
+        # 增量维护的计数与重新统计的结果一致
+        self.assertEqual(repair_counts(), {'博客': 0, '博客分类': 0, '博客标签': 0})
+        if blogs is not None:
+            self.assertEqual([Blog.objects.get(pk=b.pk).comment_count for b in blogs[0]], blogs[1])
+        if categories is not None:
+            self.assertEqual([Category.objects.get(pk=c.pk).blog_count for c in categories[0]], categories[1])
+        if tags is not None:
+            self.assertEqual(list(Tag.objects.order_by('pk').values_list('blog_count', flat=True)), tags)
+
+    def test_comment_count(self):
+        blog, other = self.create_blog(self.python), self.create_blog(self.python)
+        comments = [Comment.objects.create(user=self.user, blog=blog, text='评论') for _ in range(3)]
+        self.assertCounts(blogs=([blog, other], [3, 0]))
+
+        comments[0].delete()
+        comments[1].blog = other
+        comments[1].save()
+        self.assertCounts(blogs=([blog, other], [1, 1]))
+
+    def test_category_count(self):
+        blog = self.create_blog(self.python)
+        self.create_blog(self.python)
+        self.assertCounts(categories=([self.python, self.django], [2, 0]))
+
+        blog.category = self.django
+        blog.save()
+        self.assertCounts(categories=([self.python, self.django], [1, 1]))
+
+        blog.delete()
+        self.assertCounts(categories=([self.python, self.django], [1, 0]))
+
+    def test_tag_count(self):
+        blog, other = self.create_blog(self.python), self.create_blog(self.python)
+        blog.tags.add(*self.tags)
+        # 重复添加已有的关联
+        blog.tags.add(self.tags[0])
+        other.tags.set(self.tags[:2])
+        self.assertCounts(tags=[2, 2, 1])
+
+        # 移除不存在的关联
+        other.tags.remove(self.tags[1], self.tags[2])
+        self.assertCounts(tags=[2, 1, 1])
+
+        self.tags[0].blog_set.remove(blog)
+        self.tags[2].blog_set.add(other)
+        self.assertCounts(tags=[1, 1, 2])
+
+        other.tags.clear()
+        self.assertCounts(tags=[0, 1, 1])
+
+        blog.delete()
+        self.assertCounts(tags=[0, 0, 0])
+
+    def test_repair(self):
+        blog = self.create_blog(self.python)
+        blog.tags.add(self.tags[0])
+        Blog.objects.update(comment_count=5)
+        Tag.objects.update(blog_count=0)
+        self.assertEqual(repair_counts(), {'博客': 1, '博客分类': 0, '博客标签': 1})
+        self.assertCounts(blogs=([blog], [0]), tags=[1, 0, 0])
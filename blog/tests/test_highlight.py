@@ -0,0 +1,48 @@
+from django.test import SimpleTestCase
+
+from blog.highlight import HighlightCache, highlight_cache
+from blog.renderers import get_body_markdown, render_body
+
+BODY = '''# 代码
+
+```python
+def hello():
+    print('hello')
+```
+
+    :::js
+    console.log('hello');
+'''
+
+
+class HighlightCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        highlight_cache.clear()
+
+    def test_render(self):
+        html, _ = render_body(BODY)
+        self.assertEqual(highlight_cache.stats()['misses'], 2)
+        self.assertIn('<span class="k">def</span>', html)
+
+        # 再次渲染时两个代码块都从缓存读取, 结果不变
+        self.assertEqual(render_body(BODY)[0], html)
+        self.assertEqual(highlight_cache.stats()['hits'], 2)
+        self.assertEqual(get_body_markdown().convert(BODY), html)
+
+    def test_key(self):
+        render_body('```python\nx = 1\n```')
+        # 语言不同的相同代码不能使用缓存
+        html, _ = render_body('```text\nx = 1\n```')
+        self.assertEqual(highlight_cache.stats()['hits'], 0)
+        self.assertNotIn('class="n"', html)
+
+    def test_lru(self):
+        cache = HighlightCache(max_entries=2)
+        cache.set('a', 'A')
+        cache.set('b', 'B')
+        cache.get('a')
+        cache.set('c', 'C')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 'A')
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.stats()['entries'], 2)
@@ -0,0 +1,106 @@
+import os
+import re
+
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from blog.metrics import HISTOGRAMS, Histogram, MetricsStore, metrics_store, timer
+from blog.models import Blog, Comment
+from blog.tests import BlogTestCase, create_category, create_user
+
+
+def server_timing(response):
+    """解析Server-Timing响应头: {名称: 耗时(毫秒)}"""
+    return {name: float(dur) for name, dur in re.findall(r'(\w+);dur=([\d.]+)', response['Server-Timing'])}
+
+
+class MetricsTestCase(BlogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = create_user()
+        cls.blog = Blog.objects.create(author=user, category=create_category(), title='标题', body='# 正文')
+        Comment.objects.create(user=user, blog=cls.blog, text='**评论**')
+
+    def setUp(self):
+        super().setUp()
+        for histogram in HISTOGRAMS:
+            histogram.clear()
+        metrics_store.clear()
+
+    def test_server_timing(self):
+        url = reverse('blog:detail', kwargs={'pk': self.blog.pk})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        timing = server_timing(response)
+        self.assertTrue({'total', 'sql', 'template', 'comments', 'sidebar'} <= set(timing))
+        self.assertIn(f'desc="{len(queries)} queries"', response['Server-Timing'])
+        self.assertGreaterEqual(timing['total'], timing['template'])
+
+        # 异步视图中并发执行的查询同样计入
+        async_response = async_to_sync(self.async_client.get)(url)
+        self.assertIn('sql;dur=', async_response['Server-Timing'])
+
+        response = self.client.get(reverse('blog:blog-list'), REMOTE_ADDR='10.0.0.1')
+        self.assertIn('serialize', server_timing(response))
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('blog:list'))
+        self.client.get(reverse('blog:list'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        content = response.content.decode()
+        self.assertIn('blog_request_duration_seconds_count{view="blog:list",method="GET",status="200"} 2', content)
+        self.assertIn('blog_request_sql_queries_bucket{view="blog:list",le="+Inf"} 2', content)
+        self.assertIn('blog_request_timer_seconds_count{view="blog:list",timer="template"} 2', content)
+
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.1').status_code, 404)
+
+    @override_settings(METRICS={'TOKEN': 'secret', 'ALLOWED_IPS': ['127.0.0.1']})
+    def test_metrics_token(self):
+        # 设置令牌后不再按IP判断(反向代理之后所有请求都来自127.0.0.1)
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 404)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer secret', REMOTE_ADDR='10.0.0.1').status_code,
+                         200)
+
+    def test_workers(self):
+        # 抓取时汇总所有worker进程写入的统计数据, 已退出的进程的计数仍然计入
+        histogram = Histogram('test_seconds', '测试', ['name'], (0.1, 1))
+        store = MetricsStore(metrics_store.path, interval=60)
+        self.addCleanup(store.clear)
+        for worker, value in [('1-a', 0.05), ('2-b', 0.5)]:
+            store._pid, store._worker = os.getpid(), worker
+            histogram.clear()
+            histogram.observe(value, 'a')
+            store.save([histogram], force=True)
+        # 未到写入间隔时不写入
+        histogram.observe(5, 'a')
+        store.save([histogram])
+        self.assertEqual(store.load([histogram]), {'test_seconds': {('a',): [1, 2, 0.55, 2]}})
+
+        self.client.get(reverse('blog:list'))
+        response = self.client.get(reverse('metrics'))
+        self.assertIn('blog_request_duration_seconds_count{view="blog:list",method="GET",status="200"} 1',
+                      response.content.decode())
+
+    def test_histogram(self):
+        histogram = Histogram('test_seconds', '测试', ['name'], (0.1, 1))
+        for value in [0.05, 0.5, 5]:
+            histogram.observe(value, 'a"b')
+        self.assertEqual(histogram.render(), '\n'.join([
+            '# HELP test_seconds 测试',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{name="a\\"b",le="0.1"} 1',
+            'test_seconds_bucket{name="a\\"b",le="1"} 2',
+            'test_seconds_bucket{name="a\\"b",le="+Inf"} 3',
+            'test_seconds_sum{name="a\\"b"} 5.55',
+            'test_seconds_count{name="a\\"b"} 3',
+        ]))
+
+    def test_timer_outside_request(self):
+        with timer('markdown'):
+            pass
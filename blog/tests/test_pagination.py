@@ -0,0 +1,66 @@
+from datetime import timedelta
+from urllib.parse import parse_qs, urlparse
+
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from blog.models import Blog
+from blog.pagination import KeysetPagination
+from blog.tests import BlogTestCase, create_category, create_user
+
+
+class KeysetPaginationTestCase(BlogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user, category = create_user(), create_category()
+        now = timezone.now()
+        # 前三篇博客的发布时间相同
+        times = [now - timedelta(days=2)] * 3 + [now - timedelta(days=1), now]
+        for i, created_time in enumerate(times):
+            Blog.objects.create(author=user, category=category, title=f'标题{i}', body='正文', created_time=created_time)
+        cls.expected = list(Blog.objects.order_by('-created_time', '-id').values_list('pk', flat=True))
+
+    def paginate(self, url='/api-blog/'):
+        paginator = KeysetPagination()
+        paginator.page_size = 2
+        page = paginator.paginate_queryset(Blog.objects.all(), Request(APIRequestFactory().get(url)))
+        return [blog.pk for blog in page], paginator.get_next_link(), paginator.get_previous_link()
+
+    def test_forward_and_backward(self):
+        pages, links = [], []
+        page, next_link, previous_link = self.paginate()
+        self.assertIsNone(previous_link)
+        while True:
+            pages.append(page)
+            if next_link is None:
+                break
+            page, next_link, previous_link = self.paginate(next_link)
+            links.append(previous_link)
+        # 发布时间相同的博客按id翻页, 不重复也不遗漏
+        self.assertEqual(sum(pages, []), self.expected)
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+
+        # 从最后一页向前翻页
+        previous_pages = []
+        previous_link = links[-1]
+        while previous_link is not None:
+            page, next_link, previous_link = self.paginate(previous_link)
+            self.assertIsNotNone(next_link)
+            previous_pages.append(page)
+        self.assertEqual(previous_pages, pages[-2::-1])
+
+    def test_invalid_cursor(self):
+        url = reverse('blog:blog-list')
+        for i, cursor in enumerate(['abc', 'bnx8eHw=', 'bnxub3QtYS1kYXRlfDE=']):
+            response = self.client.get(url, {'cursor': cursor}, REMOTE_ADDR=f'10.0.0.{i}')
+            self.assertEqual(response.status_code, 404)
+
+    def test_api(self):
+        response = self.client.get(reverse('blog:blog-list'), REMOTE_ADDR='10.0.1.1')
+        data = response.json()
+        self.assertIsNone(data['previous'])
+        self.assertEqual([blog['id'] for blog in data['results']], self.expected)
+        self.assertIsNone(data['next'])
+        self.assertIn('cursor', parse_qs(urlparse(self.paginate()[1]).query))
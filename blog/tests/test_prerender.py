@@ -0,0 +1,68 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from blog.models import Blog
+from blog.renderers import RENDERER_VERSION, render_body
+from blog.tests import BlogTestCase, create_category, create_user
+
+
+class PrerenderTestCase(BlogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.category = create_category()
+
+    def create_blog(self, body='# 标题\n\n正文'):
+        return Blog.objects.create(author=self.user, category=self.category, title='标题', body=body)
+
+    def outdate(self, blog):
+        # 模拟升级渲染器前保存的博客
+        Blog.objects.filter(pk=blog.pk).update(body_html='', toc='', render_version=RENDERER_VERSION - 1)
+
+    def test_render_on_save(self):
+        blog = self.create_blog()
+        blog.refresh_from_db()
+        self.assertEqual((blog.body_html, blog.toc), render_body('# 标题\n\n正文'))
+        self.assertEqual(blog.render_version, RENDERER_VERSION)
+
+        # 只更新其他字段时不重新渲染
+        Blog.objects.filter(pk=blog.pk).update(body_html='旧HTML')
+        blog.title = '新标题'
+        blog.save(update_fields=['title'])
+        blog.refresh_from_db()
+        self.assertEqual(blog.body_html, '旧HTML')
+
+        blog.body = '## 新正文'
+        blog.save(update_fields=['body'])
+        blog.refresh_from_db()
+        self.assertEqual(blog.body_html, render_body('## 新正文')[0])
+
+    def test_refresh_in_detail(self):
+        blog = self.create_blog()
+        self.outdate(blog)
+        response = self.client.get(reverse('blog:detail', kwargs={'pk': blog.pk}))
+        self.assertContains(response, render_body(blog.body)[0])
+        refreshed = Blog.objects.get(pk=blog.pk)
+        self.assertFalse(refreshed.render_outdated)
+        # 重新渲染不算作修改
+        self.assertEqual(refreshed.modified_time, blog.modified_time)
+
+    def test_rerender_command(self):
+        outdated, current = self.create_blog(), self.create_blog()
+        self.outdate(outdated)
+        Blog.objects.filter(pk=current.pk).update(body_html='旧HTML')
+
+        call_command('rerender_blogs', batch_size=1, stdout=StringIO())
+        self.assertEqual(Blog.objects.get(pk=outdated.pk).body_html, render_body(outdated.body)[0])
+        self.assertEqual(Blog.objects.get(pk=current.pk).body_html, '旧HTML')
+
+        call_command('rerender_blogs', '--all', stdout=StringIO())
+        self.assertEqual(Blog.objects.get(pk=current.pk).body_html, render_body(current.body)[0])
+
+    def test_api_excludes_html(self):
+        blog = self.create_blog()
+        data = self.client.get(reverse('blog:blog-detail', kwargs={'pk': blog.pk}), REMOTE_ADDR='10.0.0.1').json()
+        self.assertEqual(data['body'], blog.body)
+        self.assertTrue({'body_html', 'toc', 'render_version'}.isdisjoint(data))
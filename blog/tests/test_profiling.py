@@ -0,0 +1,99 @@
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.urls import reverse
+
+from blog import profiling
+from blog.models import Blog
+from blog.tests import BlogTestCase, BlogTransactionTestCase, create_category, create_user
+
+
+class ProfilingTestCase(BlogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = create_user(is_staff=True)
+        cls.user = create_user('user')
+        cls.blog = Blog.objects.create(author=cls.staff, category=create_category(), title='标题', body='正文')
+
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.object(profiling, 'PROFILE_DIR', Path(tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.url = reverse('blog:detail', kwargs={'pk': self.blog.pk})
+
+    def test_staff(self):
+        self.client.force_login(self.staff)
+        self.assertFalse(self.client.get(self.url).has_header('X-Profile-Id'))
+        profile_id = self.client.get(self.url, HTTP_X_PROFILE='1')['X-Profile-Id']
+        self.client.get(self.url, {'_profile': 1})
+        for value in ['0', 'false', 'Off', '']:
+            self.assertFalse(self.client.get(self.url, {'_profile': value}).has_header('X-Profile-Id'))
+        self.assertFalse(self.client.get(self.url, HTTP_X_PROFILE='0').has_header('X-Profile-Id'))
+
+        profiles = profiling.list_profiles()
+        self.assertEqual(len(profiles), 2)
+        self.assertIn(self.url, {info['path'] for info in profiles})
+        self.assertGreaterEqual(profiles[0]['duration_ms'], profiles[1]['duration_ms'])
+        self.assertIsNotNone(profiles[0]['sql_count'])
+
+        response = self.client.get(reverse('blog:profiles'))
+        self.assertContains(response, reverse('blog:profile', args=[profile_id]))
+        response = self.client.get(reverse('blog:profile', args=[profile_id]), {'sort': 'tottime'})
+        self.assertContains(response, 'function calls')
+        response = self.client.get(reverse('blog:profile', args=[profile_id]), {'download': 1})
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="{profile_id}.prof"')
+        self.assertEqual(self.client.get(reverse('blog:profile', args=['..%2Fx'])).status_code, 404)
+
+    def test_not_staff(self):
+        self.client.force_login(self.user)
+        self.assertFalse(self.client.get(self.url, HTTP_X_PROFILE='1').has_header('X-Profile-Id'))
+        self.assertEqual(self.client.get(reverse('blog:profiles')).status_code, 302)
+
+    def test_sampling(self):
+        with mock.patch.object(profiling, 'SAMPLE_RATE', 1.0):
+            self.assertTrue(self.client.get(self.url).has_header('X-Profile-Id'))
+        self.assertEqual(profiling.list_profiles()[0]['reason'], 'sampled')
+
+    def test_prune(self):
+        with mock.patch.object(profiling, 'SAMPLE_RATE', 1.0), mock.patch.object(profiling, 'MAX_PROFILES', 2):
+            ids = [self.client.get(self.url)['X-Profile-Id'] for _ in range(3)]
+        self.assertEqual({info['id'] for info in profiling.list_profiles()}, set(ids[1:]))
+        self.assertEqual(len(list(profiling.PROFILE_DIR.iterdir())), 4)
+
+    def test_one_at_a_time(self):
+        request = self.client.get(self.url).wsgi_request
+        with mock.patch.object(profiling, 'SAMPLE_RATE', 1.0):
+            # 异步请求不抽样
+            self.assertIsNone(profiling.should_profile(request, sampling=False))
+            with profiling.RequestProfiler(request, 'sampled') as outer:
+                # 已有请求在分析时不再分析
+                response = self.client.get(self.url)
+            self.assertFalse(response.has_header('X-Profile-Id'))
+            self.assertTrue(outer.active)
+            self.assertTrue(self.client.get(self.url).has_header('X-Profile-Id'))
+
+
+class AsyncProfilingTestCase(BlogTransactionTestCase):
+    """异步请求的视图在其他线程的数据库连接中执行, 测试数据需要提交"""
+
+    def setUp(self):
+        super().setUp()
+        self.staff = create_user(is_staff=True)
+        blog = Blog.objects.create(author=self.staff, category=create_category(), title='标题', body='正文')
+        self.url = reverse('blog:detail', kwargs={'pk': blog.pk})
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.object(profiling, 'PROFILE_DIR', Path(tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_staff(self):
+        # 只在要求分析时读取登录用户(需要查询数据库, 不能在事件循环中执行)
+        self.async_client.force_login(self.staff)
+        self.assertFalse(async_to_sync(self.async_client.get)(self.url).has_header('X-Profile-Id'))
+        self.assertTrue(async_to_sync(self.async_client.get)(self.url + '?_profile=1').has_header('X-Profile-Id'))
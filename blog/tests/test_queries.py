@@ -0,0 +1,113 @@
+from django.urls import reverse
+
+from blog.models import Blog, Comment, Tag
+from blog.tests import BlogTestCase, create_category, create_user
+
+
+class QueryBudgetTestCase(BlogTestCase):
+    """
+    各页面/接口的SQL查询数量预算
+
+    测试数据的博客数和评论数都多于一页, 一旦模板或序列化器逐行查询关联对象,
+    查询数量就会随数据量增长而超出预算
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.category = create_category()
+        tags = [Tag.objects.create(name=name) for name in ['django', 'Python', 'Docker']]
+        for i in range(12):
+            blog = Blog.objects.create(
+                author=cls.user, category=cls.category, title=f'数据库优化 {i}',
+                body=f'# 标题{i}\n\n使用索引可以让数据库查询更快\n\n```python\nprint({i})\n```',
+            )
+            blog.tags.add(*tags)
+            for j in range(3):
+                Comment.objects.create(user=cls.user, blog=blog, text=f'评论 **{j}**')
+        cls.blog = blog
+        cls.tag = tags[0]
+
+    def get(self, url):
+        # 每次请求使用不同的IP, 避免匿名请求被限流
+        self.requests = getattr(self, 'requests', 0) + 1
+        return self.client.get(url, REMOTE_ADDR=f'10.0.0.{self.requests}')
+
+    def assertQueryBudget(self, url, budget, warm_up=True):
+        if warm_up:
+            # 第一次请求填充侧边栏缓存, 之后为稳定状态
+            self.get(url)
+        with self.assertNumQueries(budget):
+            response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list(self):
+        self.assertQueryBudget(reverse('blog:list'), 2)
+
+    def test_list_sidebar_cold(self):
+        # 侧边栏缓存为空时, 4个侧边栏各查询一次
+        self.assertQueryBudget(reverse('blog:list'), 6, warm_up=False)
+
+    def test_detail(self):
+        self.assertQueryBudget(reverse('blog:detail', kwargs={'pk': self.blog.pk}), 1)
+
+    def test_archive(self):
+        created_time = self.blog.created_time
+        self.assertQueryBudget(reverse('blog:archive', kwargs={
+            'year': created_time.year, 'month': created_time.month,
+        }), 2)
+
+    def test_category(self):
+        self.assertQueryBudget(reverse('blog:category', kwargs={'pk': self.category.pk}), 3)
+
+    def test_tag(self):
+        self.assertQueryBudget(reverse('blog:tag', kwargs={'pk': self.tag.pk}), 3)
+
+    def test_author(self):
+        self.assertQueryBudget(reverse('blog:author', kwargs={'pk': self.user.pk}), 3)
+
+    def test_search(self):
+        # 博客总数(计算idf)从缓存读取
+        self.assertQueryBudget(reverse('blog:search') + '?query=数据库', 3)
+
+    # 以下接口的响应会被缓存, 预算为未命中缓存时的查询数
+    def test_api_blog_list(self):
+        self.assertQueryBudget(reverse('blog:blog-list'), 1, warm_up=False)
+
+    def test_api_blog_retrieve(self):
+        self.assertQueryBudget(reverse('blog:blog-detail', kwargs={'pk': self.blog.pk}), 2, warm_up=False)
+
+    def test_api_blog_comments(self):
+        self.assertQueryBudget(reverse('blog:blog-list-comments', kwargs={'pk': self.blog.pk}), 2, warm_up=False)
+
+    def test_api_blog_search(self):
+        self.assertQueryBudget(reverse('blog:blog-search') + '?query=数据库', 4, warm_up=False)
+
+    def test_api_tag_list(self):
+        self.assertQueryBudget(reverse('blog:tag-list'), 2, warm_up=False)
+
+    def test_api_category_list(self):
+        self.assertQueryBudget(reverse('blog:category-list'), 2, warm_up=False)
+
+    def test_api_cached(self):
+        # 命中响应缓存时不查询数据库
+        for url in [
+            reverse('blog:blog-list'),
+            reverse('blog:blog-detail', kwargs={'pk': self.blog.pk}),
+            reverse('blog:blog-list-comments', kwargs={'pk': self.blog.pk}),
+            reverse('blog:tag-list'),
+        ]:
+            self.assertQueryBudget(url, 0)
+
+    def test_api_comment_list(self):
+        self.assertQueryBudget(reverse('blog:comment-list'), 2)
+
+    def test_login(self):
+        # 验证码从预先生成的验证码池中取出, 不访问数据库
+        self.patch_captcha_pool()
+        self.assertQueryBudget(reverse('login:login'), 0)
+
+    def test_register(self):
+        self.patch_captcha_pool()
+        self.assertQueryBudget(reverse('login:register'), 0)
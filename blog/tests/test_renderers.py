@@ -0,0 +1,43 @@
+from django.test import SimpleTestCase
+from django.utils.html import strip_tags
+
+from blog.renderers import get_body_markdown, get_comment_markdown, render_body, render_comment, renderer_pool
+
+BODY = '''# 标题
+
+[TOC]
+
+## 小节
+
+正文[^1], 缩写HTML
+
+*[HTML]: Hyper Text Markup Language
+[^1]: 脚注
+
+```python
+print('hello')
+```
+'''
+
+
+class RendererPoolTestCase(SimpleTestCase):
+    def test_reuse(self):
+        md = get_body_markdown()
+        expected = md.convert(strip_tags(BODY)), md.toc
+        # 复用的对象不会残留上一次转换的脚注/缩写/目录等状态
+        for text in ['# 标题\n\n其他正文[^a]\n\n[^a]: 其他脚注', BODY, BODY]:
+            html, toc = render_body(text)
+        self.assertEqual(html, expected[0])
+        self.assertIn(toc, expected[1])
+        self.assertEqual(render_comment('**评论**'), get_comment_markdown().convert('**评论**'))
+
+    def test_pool(self):
+        renderer_pool.clear()
+        created = renderer_pool.created['comment']
+        for _ in range(3):
+            render_comment('评论')
+        self.assertEqual(renderer_pool.created['comment'], created + 1)
+
+        # 同时使用时各自使用不同的对象
+        with renderer_pool.renderer('comment') as first, renderer_pool.renderer('comment') as second:
+            self.assertIsNot(first, second)
@@ -0,0 +1,82 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.db import router
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+
+from blog import routers
+from blog.auth import CachedModelBackend
+from blog.models import Blog, Category
+from blog.templatetags.blog_extras import categories
+from blog.tests import BlogTransactionTestCase, create_category, create_user
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTestCase(BlogTransactionTestCase):
+    """主库与从库是两个独立的SQLite数据库, 测试中从库没有同步主库的数据"""
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        super().setUp()
+        self.category = create_category()
+
+    def category_found(self):
+        # 分类页面不缓存, 从库中没有该分类时返回404
+        response = self.client.get(reverse('blog:category', kwargs={'pk': self.category.pk}))
+        return response.status_code == 200
+
+    def test_read_from_replica(self):
+        # 不在请求中时读写都使用主库
+        self.assertEqual(router.db_for_read(Category), 'default')
+        self.assertEqual(Category.objects.count(), 1)
+        # 请求中从从库读取
+        self.assertFalse(self.category_found())
+
+    def test_sticky(self):
+        # 客户端最近写入过, 读取使用主库
+        self.client.cookies[routers.PRIMARY_COOKIE] = str(time.time() + 5)
+        self.assertTrue(self.category_found())
+        self.client.cookies[routers.PRIMARY_COOKIE] = str(time.time() - 1)
+        self.assertFalse(self.category_found())
+
+    def test_read_your_writes(self):
+        token = routers.start_request(RequestFactory().post('/'))
+        self.assertEqual(router.db_for_read(Category), 'replica')
+        category = Category.objects.create(name='Django')
+        # 写入后同一请求中的读取使用主库
+        self.assertEqual(router.db_for_read(Category), 'default')
+        self.assertEqual(Category.objects.get(pk=category.pk), category)
+        response = routers.finish_request(HttpResponse(), token)
+        self.assertEqual(response.cookies[routers.PRIMARY_COOKIE]['max-age'], 5)
+
+        token = routers.start_request(RequestFactory().get('/'))
+        response = routers.finish_request(HttpResponse(), token)
+        self.assertNotIn(routers.PRIMARY_COOKIE, response.cookies)
+
+    def test_cache_fill_from_primary(self):
+        # 写入缓存的数据读取主库
+        user = create_user()
+        Category.objects.filter(pk=self.category.pk).update(blog_count=1)
+        response = self.client.get(reverse('blog:category-list'), REMOTE_ADDR='10.0.0.1')
+        self.assertEqual([category['name'] for category in response.json()['results']], ['Python学习笔记'])
+
+        token = routers.start_request(RequestFactory().get('/'))
+        self.assertEqual([category.name for category in categories()], ['Python学习笔记'])
+        self.assertEqual(CachedModelBackend().get_user(user.pk), user)
+        with routers.use_primary():
+            self.assertEqual(router.db_for_read(Category), 'default')
+        self.assertEqual(router.db_for_read(Category), 'replica')
+        routers.finish_request(HttpResponse(), token)
+
+    def test_untracked_writes(self):
+        token = routers.start_request(RequestFactory().get('/'))
+        # 会话与阅读量的写入不计入请求的写入
+        self.assertEqual(router.db_for_write(Session), 'default')
+        self.assertEqual(router.db_for_read(Session), 'default')
+        with routers.untracked_writes():
+            router.db_for_write(Blog)
+        self.assertEqual(router.db_for_read(Category), 'replica')
+        response = routers.finish_request(HttpResponse(), token)
+        self.assertNotIn(routers.PRIMARY_COOKIE, response.cookies)
@@ -0,0 +1,89 @@
+from importlib import import_module
+
+from django.apps import apps
+from django.urls import reverse
+
+from blog.models import Blog, SearchPosting
+from blog.search import SearchResults, highlight, tokenize
+from blog.tests import BlogTestCase, create_category, create_user
+
+
+class TokenizeTestCase(BlogTestCase):
+    def test_tokenize(self):
+        self.assertEqual(list(tokenize('Django ORM优化, 书')), ['django', 'orm', '优化', '书'])
+        self.assertEqual(list(tokenize('数据库')), ['数据', '据库'])
+        # 建立索引时同时输出单个汉字
+        self.assertEqual(list(tokenize('数据库', unigrams=True)), ['数据', '据库', '数', '据', '库'])
+
+
+class SearchTestCase(BlogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.category = create_user(), create_category()
+        cls.book = cls.create_blog('读书笔记', '这是一本好书')
+        cls.orm = cls.create_blog('Django ORM', '数据库查询优化, 使用索引')
+        cls.index = cls.create_blog('索引', '数据库索引的原理\n\n```python\nif a < b:\n    pass\n```')
+
+    @classmethod
+    def create_blog(cls, title, body):
+        return Blog.objects.create(author=cls.user, category=cls.category, title=title, body=body)
+
+    def titles(self, query, queryset=None):
+        return [blog.title for blog in SearchResults(query, queryset)]
+
+    def test_single_character(self):
+        self.assertEqual(self.titles('书'), ['读书笔记'])
+        self.assertEqual(self.titles('库'), ['索引', 'Django ORM'])
+
+    def test_all_terms(self):
+        self.assertEqual(self.titles('django 数据库'), ['Django ORM'])
+        self.assertEqual(self.titles('django 好书'), [])
+        self.assertEqual(self.titles('  '), [])
+
+    def test_ranking(self):
+        # 标题中的词项权重更高
+        self.assertEqual(self.titles('索引'), ['索引', 'Django ORM'])
+        # 在过滤后的博客中检索
+        self.assertEqual(self.titles('索引', Blog.objects.exclude(pk=self.index.pk)), ['Django ORM'])
+
+    def test_pagination(self):
+        results = SearchResults('数据库')
+        self.assertEqual(len(results), 2)
+        self.assertEqual([blog.title for blog in results[1:2]], ['Django ORM'])
+        response = self.client.get(reverse('blog:search'), {'query': '书'})
+        self.assertContains(response, '读书笔记')
+
+    def test_snippet(self):
+        blog = SearchResults('pass')[0]
+        # 代码中的<只转义一次
+        self.assertIn('a &lt; b', blog.snippet)
+        self.assertIn('<mark>pass</mark>', blog.snippet)
+        self.assertEqual(highlight('a < b 好书' + '正文' * 100, '书', length=12), '... b 好<mark>书</mark>正文正文正文正...')
+
+    def test_backfill_migration(self):
+        # 迁移为还没有索引的已有博客建立索引, 不重复建立已有的索引
+        SearchPosting.objects.filter(blog=self.book).delete()
+        count = SearchPosting.objects.count()
+        migration = import_module('blog.migrations.0007_backfill_search_index')
+        migration.build_index(apps, None)
+        self.assertEqual(self.titles('好书'), ['读书笔记'])
+        self.assertEqual(SearchPosting.objects.filter(blog=self.book).count() + count, SearchPosting.objects.count())
+
+    def test_index_maintenance(self):
+        blog = self.create_blog('新博客', '旧内容')
+        self.assertEqual(self.titles('旧内容'), ['新博客'])
+        blog.body = '新内容'
+        blog.save()
+        self.assertEqual(self.titles('旧内容'), [])
+        self.assertEqual(self.titles('新内容'), ['新博客'])
+
+        # 只更新其他字段时不重建索引
+        with self.assertNumQueries(0):
+            SearchResults('新内容')
+        SearchPosting.objects.filter(blog=blog).delete()
+        blog.save(update_fields=['excerpt'])
+        self.assertFalse(SearchPosting.objects.filter(blog=blog).exists())
+
+        blog.save()
+        blog.delete()
+        self.assertFalse(SearchPosting.objects.filter(blog_id=blog.pk).exists())
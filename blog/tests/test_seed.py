@@ -0,0 +1,30 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+
+from blog.counts import repair_counts
+from blog.models import ArchiveMonth, Blog, Comment, MyUser, SearchPosting
+from blog.tests import BlogTestCase
+from blog.transfer import CONTENT_MODELS
+
+
+class SeedTestCase(BlogTestCase):
+    def seed(self, **options):
+        call_command('seed', users=3, categories=2, tags=5, pool_size=3, index=True, stdout=StringIO(), **options)
+
+    def test_clear(self):
+        self.seed(posts=8, comments=20)
+        with CaptureQueriesContext(connection) as queries:
+            self.seed(posts=3, comments=5, clear=True, seed=1)
+        # 清空数据时每张表只执行一条DELETE语句, 不逐行查询与触发信号
+        deletes = [q['sql'] for q in queries if q['sql'].startswith('DELETE')]
+        self.assertEqual(len([sql for sql in deletes if 'WHERE' not in sql]), len(CONTENT_MODELS))
+
+        self.assertEqual((Blog.objects.count(), Comment.objects.count()), (3, 5))
+        self.assertEqual(MyUser.objects.filter(is_superuser=False).count(), 3)
+        self.assertEqual(ArchiveMonth.objects.aggregate(total=Sum('blog_count'))['total'], 3)
+        self.assertEqual(SearchPosting.objects.order_by().values('blog').distinct().count(), 3)
+        self.assertEqual(repair_counts(), {'博客': 0, '博客分类': 0, '博客标签': 0})
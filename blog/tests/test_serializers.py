@@ -0,0 +1,56 @@
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+
+from blog.counters import page_view_buffer
+from blog.models import Blog, Tag
+from blog.serializers import BlogListSerializer, BlogRetrieveSerializer, FastJSONRenderer, \
+    fast_blog_list_serializer, fast_blog_retrieve_serializer
+from blog.tests import BlogTestCase, create_category, create_user
+
+
+class FastSerializerTestCase(BlogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = create_user()
+        category = create_category()
+        tags = [Tag.objects.create(name=f'标签{i}') for i in range(3)]
+        for i in range(4):
+            # 包含需要转义的字符与特殊的行分隔符
+            blog = Blog.objects.create(author=user, category=category, title=f'标题{i} "引号" \u2028',
+                                       body=f'# 目录\n\n正文{i} <b>\\  ')
+            blog.tags.set(tags[:i])
+
+    def setUp(self):
+        super().setUp()
+        # 尚未写入数据库的阅读量也要计入
+        page_view_buffer.incr(Blog.objects.first().pk)
+
+    def assertSameBytes(self, fast_data, data):
+        expected = JSONRenderer().render(data)
+        self.assertEqual(FastJSONRenderer().render(fast_data), expected)
+        self.assertEqual(JSONRenderer().render(fast_data), expected)
+
+    def test_list(self):
+        queryset = Blog.objects.select_related('category', 'author').order_by('-created_time', '-id')
+        self.assertSameBytes(
+            fast_blog_list_serializer.to_representation(fast_blog_list_serializer.values(queryset)),
+            BlogListSerializer(queryset, many=True).data,
+        )
+
+    def test_retrieve(self):
+        for blog in Blog.objects.all():
+            row = fast_blog_retrieve_serializer.values(Blog.objects.filter(pk=blog.pk)).get()
+            self.assertSameBytes(
+                fast_blog_retrieve_serializer.to_representation([row])[0],
+                BlogRetrieveSerializer(blog).data,
+            )
+
+    def test_api(self):
+        # 接口输出与序列化器一致
+        blog = Blog.objects.select_related('category', 'author').prefetch_related('tags').last()
+        response = self.client.get(reverse('blog:blog-detail', kwargs={'pk': blog.pk}), REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.content, JSONRenderer().render(BlogRetrieveSerializer(blog).data))
+
+        response = self.client.get(reverse('blog:blog-list'), REMOTE_ADDR='10.0.0.2')
+        queryset = Blog.objects.select_related('category', 'author').order_by('-created_time', '-id')
+        self.assertEqual(response.json()['results'], BlogListSerializer(queryset, many=True).data)
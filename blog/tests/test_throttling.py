@@ -0,0 +1,85 @@
+import tempfile
+import threading
+from pathlib import Path
+
+from django.test import TestCase
+from django.urls import reverse
+
+from blog.models import Blog
+from blog.tests import BlogTestCase, create_category, create_user
+from blog.throttling import TokenBucketStore
+
+
+class TokenBucketStoreTestCase(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = TokenBucketStore(Path(tmp.name) / 'throttle.sqlite3')
+
+    def test_bucket(self):
+        # 容量3, 每秒补充0.5个令牌
+        results = [self.store.consume('a', 3, 0.5, now=100) for _ in range(4)]
+        self.assertEqual([allowed for allowed, _ in results], [True, True, True, False])
+        self.assertEqual(results[-1][1], 2.0)
+        self.assertTrue(self.store.consume('a', 3, 0.5, now=102)[0])
+        self.assertFalse(self.store.consume('a', 3, 0.5, now=102)[0])
+        # 不同的键互不影响
+        self.assertTrue(self.store.consume('b', 3, 0.5, now=102)[0])
+
+    def test_shared(self):
+        # 多个连接(对应多个worker进程)共享同一个令牌桶
+        stores = [TokenBucketStore(self.store.path) for _ in range(4)]
+        allowed = []
+
+        def worker(store):
+            for _ in range(10):
+                allowed.append(store.consume('shared', 20, 0.001)[0])
+
+        threads = [threading.Thread(target=worker, args=(store,)) for store in stores]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(allowed.count(True), 20)
+
+    def test_purge(self):
+        self.store.PURGE_INTERVAL = 2
+        self.store.consume('a', 1, 1, now=100)
+        self.store.consume('b', 1, 1, now=200)
+        keys = [row[0] for row in self.store.connection().execute('SELECT key FROM bucket')]
+        self.assertEqual(keys, ['b'])
+
+
+class ThrottleTestCase(BlogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.blog = Blog.objects.create(author=cls.user, category=create_category(), title='标题', body='正文')
+
+    def setUp(self):
+        super().setUp()
+        self.patch_captcha_pool()
+
+    def test_anon(self):
+        url = reverse('blog:blog-list')
+        statuses = [self.client.get(url, REMOTE_ADDR='10.0.0.1').status_code for _ in range(6)]
+        self.assertEqual(statuses, [200] * 5 + [429])
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+    def test_comment_writes(self):
+        self.client.force_login(self.user)
+        url = reverse('blog:comment-list')
+        data = {'text': '评论', 'blog': self.blog.pk, 'user': self.user.pk}
+        statuses = [self.client.post(url, data).status_code for _ in range(11)]
+        self.assertEqual(statuses, [201] * 10 + [429])
+        # 读取评论不受发表频率限制
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_login(self):
+        url = reverse('login:login')
+        data = {'username': 'admin', 'password': 'wrong'}
+        statuses = [self.client.post(url, data).status_code for _ in range(11)]
+        self.assertEqual(statuses, [200] * 10 + [429])
+        response = self.client.post(url, data)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(self.client.get(url).status_code, 200)
@@ -0,0 +1,103 @@
+import json
+import os
+import tempfile
+
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.http import FileResponse
+from django.urls import reverse
+
+from blog.models import ArchiveMonth, Blog, Category, Comment, MyUser, Tag
+from blog.search import SearchResults
+from blog.tests import BlogTestCase, create_category, create_user
+from blog.transfer import clear_content, export_lines, import_lines
+
+
+def snapshot():
+    """导入前后需要一致的数据"""
+    return {
+        'categories': list(Category.objects.order_by('pk').values('id', 'name', 'blog_count')),
+        'tags': list(Tag.objects.order_by('pk').values('id', 'name', 'blog_count')),
+        'blogs': list(Blog.objects.order_by('pk').values()),
+        'blog_tags': list(Blog.tags.through.objects.order_by('blog_id', 'tag_id').values_list('blog_id', 'tag_id')),
+        'comments': list(Comment.objects.order_by('pk').values('id', 'blog_id', 'user__username', 'text',
+                                                                'text_html', 'created_time')),
+        'archives': list(ArchiveMonth.objects.order_by('year', 'month').values_list('year', 'month', 'blog_count')),
+    }
+
+
+class TransferTestCase(BlogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = MyUser.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        reader = create_user('reader')
+        categories = [create_category(), create_category('Django')]
+        tags = [Tag.objects.create(name=name) for name in ['ORM', '性能', '测试']]
+        for i in range(5):
+            blog = Blog.objects.create(
+                author=cls.admin, category=categories[i % 2], title=f'博客{i}', body=f'# 标题{i}\n\n正文 "引号" {i}',
+            )
+            blog.tags.set(tags[:i % 4])
+            Comment.objects.create(user=reader, blog=blog, text=f'**评论{i}**')
+        Comment.objects.create(user=cls.admin, blog=blog, text='回复')
+
+    def test_round_trip(self):
+        expected = snapshot()
+        lines = list(export_lines(batch_size=2))
+        # 分批读取不影响导出结果
+        self.assertEqual(lines[1:], list(export_lines(batch_size=100))[1:])
+        self.assertEqual([json.loads(line)['type'] for line in lines],
+                         ['meta'] + ['category'] * 2 + ['tag'] * 3 + ['blog'] * 5 + ['comment'] * 6)
+
+        clear_content()
+        MyUser.objects.filter(username='reader').delete()
+        # 导入后全表重建归档数据
+        ArchiveMonth.objects.create(year=2000, month=1, blog_count=3)
+        counts = import_lines(lines, batch_size=2)
+        self.assertEqual(counts, {'category': 2, 'tag': 3, 'blog': 5, 'comment': 6})
+        self.assertEqual(snapshot(), expected)
+        # 不存在的用户创建为不能登录的账号
+        self.assertFalse(MyUser.objects.get(username='reader').has_usable_password())
+        # 同时建立检索索引
+        self.assertEqual([blog.title for blog in SearchResults('标题3')], ['博客3'])
+        # 重置了自增序列, 之后创建的记录不会与导入的主键冲突
+        blog = Blog.objects.create(author=self.admin, category_id=expected['categories'][0]['id'], title='新博客',
+                                   body='正文')
+        self.assertGreater(blog.pk, expected['blogs'][-1]['id'])
+
+    def test_invalid_lines(self):
+        with self.assertRaisesMessage(ValueError, '第2行不是有效的导出记录'):
+            import_lines(['{"type": "meta", "version": 1}', 'not json'])
+        with self.assertRaisesMessage(ValueError, '不支持的导出格式版本'):
+            import_lines(['{"type": "meta", "version": 99}'])
+
+    def test_commands(self):
+        expected = snapshot()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'blogs.ndjson.gz')
+            call_command('export_blogs', output=path, batch_size=2, stderr=open(os.devnull, 'w'))
+            call_command('import_blogs', path, clear=True, stdout=open(os.devnull, 'w'))
+        self.assertEqual(snapshot(), expected)
+
+    def test_export_view(self):
+        url = reverse('blog:export')
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(self.admin)
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn('attachment;', response['Content-Disposition'])
+        lines = b''.join(response.streaming_content).decode().splitlines(keepends=True)
+        self.assertEqual(lines[1:], list(export_lines())[1:])
+
+    def test_export_view_asgi(self):
+        # ASGI部署时先写入临时文件, 导出完整的数据
+        self.async_client.force_login(self.admin)
+        response = async_to_sync(self.async_client.get)(reverse('blog:export'))
+        self.assertIsInstance(response, FileResponse)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn('attachment;', response['Content-Disposition'])
+        lines = b''.join(response.streaming_content).decode().splitlines(keepends=True)
+        self.assertEqual(len(lines), 17)
+        self.assertEqual(lines[1:], list(export_lines())[1:])
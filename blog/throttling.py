@@ -0,0 +1,188 @@
+import functools
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.throttling import AnonRateThrottle, ScopedRateThrottle, SimpleRateThrottle
+
+
+class TokenBucketStore:
+    """
+    保存在SQLite文件中的令牌桶
+
+    DRF默认的限流类在缓存中保存每个客户端的请求时间列表, 每次请求都要读出并写回整个列表;
+    未配置共享缓存时记录在各个进程的内存中, 多个worker进程各自限流. 令牌桶每个客户端只有一行
+    (剩余令牌数, 更新时间), 同一台主机上的所有进程共享同一个SQLite文件, 在写事务中读取并更新
+
+    path为None时使用进程独立的临时文件, 进程退出时删除(测试)
+    """
+
+    # 每隔多少次请求删除一次已经回满的令牌桶(回满的桶与不存在的桶等价)
+    PURGE_INTERVAL = 1000
+
+    def __init__(self, path=None):
+        self._local = threading.local()
+        self._requests = 0
+        if path is None:
+            self._tmpdir = tempfile.TemporaryDirectory(prefix='blog-project-throttle-')
+            path = os.path.join(self._tmpdir.name, 'throttle.sqlite3')
+        self.path = str(path)
+
+    def connection(self):
+        # 每个线程使用独立的连接; fork出的worker进程不能使用父进程的连接; 文件更换后重新连接
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid() or self._local.path != self.path:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS bucket ('
+                'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL)'
+            )
+            self._local.conn, self._local.pid, self._local.path = conn, os.getpid(), self.path
+        return conn
+
+    def consume(self, key, capacity, rate, now=None):
+        """
+        从令牌桶中取出一个令牌
+
+        capacity: 桶的容量(允许的突发请求数), rate: 每秒补充的令牌数
+        返回(是否允许, 需要等待的秒数)
+        """
+        now = time.time() if now is None else now
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM bucket WHERE key = ?', [key]).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute(
+                'INSERT OR REPLACE INTO bucket (key, tokens, updated, full_at) VALUES (?, ?, ?, ?)',
+                [key, tokens, now, now + (capacity - tokens) / rate],
+            )
+            self._requests += 1
+            if self._requests % self.PURGE_INTERVAL == 0:
+                conn.execute('DELETE FROM bucket WHERE full_at <= ?', [now])
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+    def clear(self):
+        self.connection().execute('DELETE FROM bucket')
+
+    @contextmanager
+    def temporary(self):
+        """其中使用临时目录中的新文件, 不读写运行中的网站的令牌桶(基准测试)"""
+        path = self.path
+        with tempfile.TemporaryDirectory(prefix='blog-project-throttle-') as directory:
+            self.path = os.path.join(directory, 'throttle.sqlite3')
+            try:
+                yield self
+            finally:
+                self.path = path
+                conn = getattr(self._local, 'conn', None)
+                if conn is not None:
+                    conn.close()
+                    self._local.conn = None
+
+
+_settings = getattr(settings, 'THROTTLE_STORE', {})
+
+throttle_store = TokenBucketStore(
+    _settings.get('PATH', os.path.join(tempfile.gettempdir(), 'blog-project-throttle.sqlite3'))
+)
+
+
+@contextmanager
+def override_rates(rate):
+    """其中所有的限流频率都替换为rate"""
+    rates = SimpleRateThrottle.THROTTLE_RATES
+    original = dict(rates)
+    rates.update(dict.fromkeys(rates, rate))
+    try:
+        yield
+    finally:
+        rates.clear()
+        rates.update(original)
+
+
+class TokenBucketThrottleMixin:
+    """
+    以令牌桶代替请求时间列表的限流
+
+    频率"N/period"对应容量为N、每period补充N个令牌的令牌桶: 允许连续N次请求,
+    之后平均每period/N秒允许一次
+    """
+    store = throttle_store
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        allowed, self._wait = self.store.consume(self.key, self.num_requests, self.num_requests / self.duration)
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class AnonTokenBucketThrottle(TokenBucketThrottleMixin, AnonRateThrottle):
+    """匿名用户的限流(频率: anon)"""
+
+
+class ScopedTokenBucketThrottle(TokenBucketThrottleMixin, ScopedRateThrottle):
+    """按视图的throttle_scope限流, 登录用户按用户id, 匿名用户按IP; 视图没有throttle_scope时不限流"""
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+
+class RequestThrottle(TokenBucketThrottleMixin, SimpleRateThrottle):
+    """普通Django视图使用的按IP限流"""
+
+    def __init__(self, scope):
+        self.scope = scope
+        super().__init__()
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+def rate_limit(scope, methods=('POST',)):
+    """
+    按IP限制普通Django视图的请求频率, 频率为REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'][scope]
+
+    只限制methods中的请求方法, 超出频率时返回429
+    """
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods:
+                throttle = RequestThrottle(scope)
+                if not throttle.allow_request(request, None):
+                    wait = math.ceil(throttle.wait())
+                    response = HttpResponse(f'请求过于频繁, 请{wait}秒后再试', status=429,
+                                            content_type='text/plain; charset=utf-8')
+                    response['Retry-After'] = str(wait)
+                    return response
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
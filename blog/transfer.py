@@ -0,0 +1,217 @@
+import datetime
+import json
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .archives import rebuild_archives
+from .cache import COMMENTS, SIDEBAR, bump_generation, model_namespace
+from .counts import repair_counts
+from .models import ArchiveMonth, Blog, Category, Comment, MyUser, SearchPosting, Tag
+from .search import build_postings, count_terms
+
+# 导出格式版本, 格式不兼容地变化时递增
+FORMAT_VERSION = 1
+CONTENT_TYPE = 'application/x-ndjson'
+
+BLOG_FIELDS = ['id', 'title', 'body', 'excerpt', 'category_id', 'created_time', 'modified_time', 'page_view',
+               'body_html', 'toc', 'render_version']
+COMMENT_FIELDS = ['id', 'blog_id', 'text', 'text_html', 'created_time']
+# 博客数据的全部表, 按外键依赖顺序排列(引用其他表的在前)
+CONTENT_MODELS = [SearchPosting, Comment, Blog.tags.through, Blog, Tag, Category, ArchiveMonth]
+
+
+def clear_content():
+    """
+    清空博客/评论/分类/标签以及检索索引与归档数据
+
+    直接对每张表执行一条DELETE语句: 通过ORM删除会先查询出全部记录, 再逐行触发信号
+    (更新冗余计数/归档/缓存版本号), 数据量大时非常慢. 所有数据都被删除, 冗余计数与归档不需要重新统计
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model in CONTENT_MODELS:
+            cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
+    bump_generation(SIDEBAR, COMMENTS, *(model_namespace(model) for model in [Blog, Category, Tag, Comment]))
+
+
+def _keyset_batches(queryset, batch_size):
+    """
+    按主键分批读取values()记录
+
+    每批一条 pk > 上一批最大主键 的查询, 不使用OFFSET也不在整个导出期间占用游标,
+    内存占用只与batch_size有关
+    """
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1]['id']
+
+
+class ExportEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder只保留到毫秒, 导出的时间保留完整精度
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _dumps(record):
+    return json.dumps(record, ensure_ascii=False, cls=ExportEncoder) + '\n'
+
+
+def export_lines(batch_size=1000):
+    """
+    以NDJSON格式逐行导出分类/标签/博客/评论, 每行一条记录, 以type字段区分
+
+    被引用的记录总在引用它的记录之前, 导入时可以按顺序逐批写入; 作者与评论用户以用户名表示,
+    不导出密码等账号信息
+    """
+    yield _dumps({'type': 'meta', 'version': FORMAT_VERSION, 'exported_time': timezone.now()})
+    for model, kind in [(Category, 'category'), (Tag, 'tag')]:
+        for batch in _keyset_batches(model.objects.values('id', 'name'), batch_size):
+            for row in batch:
+                yield _dumps({'type': kind, **row})
+
+    blogs = Blog.objects.values(*BLOG_FIELDS, author_username=F('author__username'))
+    for batch in _keyset_batches(blogs, batch_size):
+        tags = {}
+        for blog_id, tag_id in Blog.tags.through.objects.filter(blog_id__in=[row['id'] for row in batch])\
+                .order_by('tag_id').values_list('blog_id', 'tag_id'):
+            tags.setdefault(blog_id, []).append(tag_id)
+        for row in batch:
+            yield _dumps({'type': 'blog', **row, 'tag_ids': tags.get(row['id'], [])})
+
+    comments = Comment.objects.values(*COMMENT_FIELDS, username=F('user__username'))
+    for batch in _keyset_batches(comments, batch_size):
+        for row in batch:
+            yield _dumps({'type': 'comment', **row})
+
+
+class Importer:
+    """
+    导入export_lines导出的数据
+
+    同类记录每batch_size条在一个事务中bulk_create, 保留原主键; 遇到主键冲突等错误时抛出异常,
+    之前的批次已经提交. 全部写入后重置自增序列, 并重新统计冗余计数与归档数据
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.counts = Counter()
+        # 用户名 -> 用户id, 导入的数据中不存在的用户创建为不能登录的账号
+        self._user_ids = {}
+        self._kind = None
+        self._pending = []
+
+    def load(self, lines):
+        for number, line in enumerate(lines, 1):
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                kind = record.pop('type')
+            except (ValueError, KeyError, AttributeError):
+                raise ValueError(f'第{number}行不是有效的导出记录')
+            if kind == 'meta':
+                if record.get('version') != FORMAT_VERSION:
+                    raise ValueError(f'不支持的导出格式版本: {record.get("version")}')
+                continue
+            if kind not in self.WRITERS:
+                raise ValueError(f'第{number}行的记录类型未知: {kind}')
+            # 类型变化时先写入上一类型的记录, 保证被引用的记录已经存在
+            if kind != self._kind or len(self._pending) >= self.batch_size:
+                self.flush()
+                self._kind = kind
+            self._pending.append(record)
+        self.flush()
+        self.finish()
+        return self.counts
+
+    def flush(self):
+        if not self._pending:
+            return
+        with transaction.atomic():
+            self.WRITERS[self._kind](self, self._pending)
+        self.counts[self._kind] += len(self._pending)
+        self._pending = []
+
+    def finish(self):
+        # 显式指定了主键, 需要重置自增序列(PostgreSQL等)
+        sequence_sql = connection.ops.sequence_reset_sql(no_style(), [MyUser, Category, Tag, Blog, Comment])
+        if sequence_sql:
+            with connection.cursor() as cursor:
+                for sql in sequence_sql:
+                    cursor.execute(sql)
+        # bulk_create不触发信号, 重新统计冗余计数与归档数据并使缓存失效
+        repair_counts()
+        rebuild_archives()
+        bump_generation(SIDEBAR, COMMENTS, *(model_namespace(model) for model in [Blog, Category, Tag, Comment]))
+
+    def _resolve_users(self, usernames):
+        missing = set(usernames) - self._user_ids.keys()
+        if not missing:
+            return
+        self._user_ids.update(MyUser.objects.filter(username__in=missing).values_list('username', 'id'))
+        missing -= self._user_ids.keys()
+        if missing:
+            # 所有新建的账号共用一个不可用的密码, 需要时由管理员重置
+            password = make_password(None)
+            MyUser.objects.bulk_create([MyUser(username=username, password=password) for username in missing])
+            self._user_ids.update(MyUser.objects.filter(username__in=missing).values_list('username', 'id'))
+
+    def _write_named(self, model, records):
+        model.objects.bulk_create([model(id=record['id'], name=record['name']) for record in records])
+
+    def _write_categories(self, records):
+        self._write_named(Category, records)
+
+    def _write_tags(self, records):
+        self._write_named(Tag, records)
+
+    def _write_blogs(self, records):
+        self._resolve_users(record['author_username'] for record in records)
+        blogs, blog_tags, postings = [], [], []
+        for record in records:
+            values = {field: record[field] for field in BLOG_FIELDS}
+            values['created_time'] = parse_datetime(values['created_time'])
+            values['modified_time'] = parse_datetime(values['modified_time'])
+            blogs.append(Blog(author_id=self._user_ids[record['author_username']], **values))
+            blog_tags.extend(Blog.tags.through(blog_id=record['id'], tag_id=tag_id) for tag_id in record['tag_ids'])
+            postings.extend(build_postings(record['id'], count_terms(record['title'], record['body'])))
+        Blog.objects.bulk_create(blogs)
+        Blog.tags.through.objects.bulk_create(blog_tags)
+        SearchPosting.objects.bulk_create(postings, batch_size=5000)
+
+    def _write_comments(self, records):
+        self._resolve_users(record['username'] for record in records)
+        Comment.objects.bulk_create([
+            Comment(
+                id=record['id'], user_id=self._user_ids[record['username']], blog_id=record['blog_id'],
+                text=record['text'], text_html=record['text_html'],
+                created_time=parse_datetime(record['created_time']),
+            )
+            for record in records
+        ])
+
+    WRITERS = {
+        'category': _write_categories,
+        'tag': _write_tags,
+        'blog': _write_blogs,
+        'comment': _write_comments,
+    }
+
+
+def import_lines(lines, batch_size=1000):
+    """导入NDJSON记录(字符串或字节行的可迭代对象), 返回{记录类型: 导入数量}"""
+    return Importer(batch_size).load(lines)
@@ -12,19 +12,33 @@ router.register(prefix='api-comment', viewset=views.CommentViewSet)
 
 app_name = 'blog'
 
-urlpatterns = [
-    # 前端页面
-    path('list/', views.BlogListView.as_view(), name='list'),
-    path('detail/<int:pk>/', views.BlogDetail.as_view(), name='detail'),
-    path('archive/<int:year>/<int:month>/', views.BlogFilterByCreatedTimeView.as_view(), name='archive'),
-    path('category/<int:pk>/', views.BlogFilterByCategoryView.as_view(), name='category'),
-    path('tag/<int:pk>/', views.BlogFilterByTagView.as_view(), name='tag'),
-    path('author/<int:pk>/', views.BlogFilterByAuthor.as_view(), name='author'),
-    path('create/', views.new_blog, name='create'),
-    path('search', views.BlogSearchView.as_view(), name='search'),
-    path('comment/<int:pk>', views.new_comment, name='comment'),
-
-    # API页面
-    path("", include(router.urls)),
-    path("auth/", include("rest_framework.urls", namespace="rest_framework")),
-]
+
+def get_urlpatterns(async_views=False):
+    """async_views为True时页面使用异步视图, 供ASGI部署使用(见blog.async_urls)"""
+    def page(view_class):
+        return view_class.as_async_view() if async_views else view_class.as_view()
+
+    return [
+        # 前端页面
+        path('list/', page(views.BlogListView), name='list'),
+        path('detail/<int:pk>/', page(views.BlogDetail), name='detail'),
+        path('archive/<int:year>/<int:month>/', page(views.BlogFilterByCreatedTimeView), name='archive'),
+        path('category/<int:pk>/', page(views.BlogFilterByCategoryView), name='category'),
+        path('tag/<int:pk>/', page(views.BlogFilterByTagView), name='tag'),
+        path('author/<int:pk>/', page(views.BlogFilterByAuthor), name='author'),
+        path('create/', views.new_blog, name='create'),
+        path('search', page(views.BlogSearchView), name='search'),
+        path('comment/<int:pk>', views.new_comment, name='comment'),
+        # 请求性能分析结果(管理员)
+        path('profiles/', views.profile_list, name='profiles'),
+        path('profiles/<str:profile_id>/', views.profile_detail, name='profile'),
+        # 流式导出博客数据(管理员)
+        path('export/', views.export_blogs, name='export'),
+
+        # API页面
+        path("", include(router.urls)),
+        path("auth/", include("rest_framework.urls", namespace="rest_framework")),
+    ]
+
+
+urlpatterns = get_urlpatterns()
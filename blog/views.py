@@ -1,68 +1,93 @@
-import re
+import tempfile
+from functools import partial
 
+from django.core.handlers.asgi import ASGIRequest
 from django.shortcuts import get_object_or_404, render, redirect
-from django.utils.text import slugify
-from django.utils.html import strip_tags
 from django.views.generic import ListView, DetailView, CreateView
-from django.db.models import Q
 from django.contrib import messages
+from django.db.models import Max, prefetch_related_objects
 from django.views.decorators.http import require_POST, require_http_methods
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from markdown import Markdown
-from markdown.extensions.toc import TocExtension
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.utils import timezone
 from pure_pagination.mixins import PaginationMixin
-from rest_framework import viewsets, mixins
+from rest_framework import viewsets, mixins, permissions
 from rest_framework.decorators import action
-
+from rest_framework.generics import get_object_or_404 as get_object_or_404_api
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+
+from .archives import archive_filter
+from .cache import COMMENTS, SIDEBAR, get_generation
+from .conditional import conditional_response, make_etag
 from .models import Blog, Category, Tag, Comment, MyUser
-from .serializers import BlogListSerializer, BlogRetrieveSerializer, TagSerializer,\
-    CategorySerializer, CommentSerializer
+from .serializers import BlogListSerializer, BlogRetrieveSerializer, BlogSearchSerializer, TagSerializer,\
+    CategorySerializer, CommentSerializer, FastJSONRenderer, fast_blog_list_serializer, fast_blog_retrieve_serializer
+from .search import SearchResults
 from .filters import BlogFilter
+from .mixins import AsyncViewMixin, CachedResponseMixin
+from .pagination import KeysetPagination
+from .profiling import list_profiles, load_profile, profile_path
+from .transfer import CONTENT_TYPE as EXPORT_CONTENT_TYPE, export_lines
 from .forms import CommentForm, BlogForm
+from .templatetags.comment_extras import comment_list_html
 
 
-class BlogListView(PaginationMixin, ListView):
+class BlogListView(AsyncViewMixin, PaginationMixin, ListView):
     model = Blog
+    # 一次查询取出列表模板需要的分类/作者(评论数为冗余字段), 列表页不需要正文
+    queryset = Blog.objects.select_related('category', 'author').defer('body', 'body_html', 'toc')
     template_name = 'blog/list.html'
     paginate_by = 5
 
+    def get(self, request, *args, **kwargs):
+        # 列表内容只在博客/分类/标签/评论变化时改变, 以这些数据的缓存版本号作为校验数据
+        etag = make_etag(request, request.get_full_path(), get_generation(SIDEBAR), get_generation(COMMENTS))
+        return conditional_response(request, etag, None, partial(super().get, request, *args, **kwargs))
+
 
-class BlogDetail(DetailView):
+class BlogDetail(AsyncViewMixin, DetailView):
     model = Blog
+    queryset = Blog.objects.select_related('category', 'author').annotate(last_comment_time=Max('comment__created_time'))
     template_name = 'blog/detail.html'
 
+    @classmethod
+    def get_concurrent_queries(cls, **kwargs):
+        # 评论列表只依赖URL中的博客id, 与博客同时查询
+        return {**super().get_concurrent_queries(**kwargs), 'comment_html': partial(comment_list_html, kwargs['pk'])}
+
+    def get(self, request, *args, **kwargs):
+        self.object = blog = self.get_object()
+        # 根据博客修改时间与最新评论时间判断页面是否变化, 未变化时不渲染页面直接返回304;
+        # 升级渲染器后重新渲染的正文不更新修改时间, ETag中包含渲染器版本
+        last_modified = max(filter(None, [blog.modified_time, blog.last_comment_time]))
+        etag = make_etag(
+            request, blog.pk, blog.modified_time, blog.last_comment_time, blog.comment_count, blog.render_version,
+            get_generation(SIDEBAR),
+        )
+        return conditional_response(
+            request, etag, last_modified,
+            lambda: self.render_to_response(self.get_context_data(object=blog)),
+        )
+
     def get_object(self, queryset=None):
         blog = super().get_object(queryset)
 
         # 文章阅读量+1
         blog.increase_pv()
 
-        # 防止XSS攻击: 在转换Markdown之前去除HTML标签
-        blog.body = strip_tags(blog.body)
-
-        # 创建Markdown对象
-        md = Markdown(extensions=[
-            'markdown.extensions.extra',  # 基础拓展
-            'markdown.extensions.codehilite',  # 语法高亮拓展
-            # 'markdown.extensions.toc',  # 自动生成目录拓展, 默认使用_数字称作为锚点
-            TocExtension(slugify=slugify),  # 自动生成目录拓展, 使用标题名称作为锚点, 使用django的slugify函数处理中文标题
-        ])
-        # 使用第三方库Markdown将Markdown格式文本转换为HTML格式
-        blog.body = md.convert(blog.body)
-
-        # 取出body中的[TOC]目录用于其他地方
-        # 不存在目录(Markdown标题文本)则不生成相关HTML
-        m = re.search(r'<div class="toc">\s*<ul>(.*)</ul>\s*</div>', md.toc, re.S)
-        blog.toc = m.group(1) if m is not None else ''
+        # 正文HTML与目录已在保存时渲染, 仅在渲染器版本变化时重新渲染
+        blog.refresh_render()
 
         return blog
 
 
 class BlogFilterByCreatedTimeView(BlogListView):
     def get_queryset(self):
-        return super().get_queryset().filter(
-            created_time__year=self.kwargs.get('year'), created_time__month=self.kwargs.get('month')
-        )
+        # 使用发布时间区间过滤, 可以利用created_time上的索引
+        return archive_filter(super().get_queryset(), self.kwargs.get('year'), self.kwargs.get('month'))
 
 
 class BlogFilterByCategoryView(BlogListView):
@@ -85,8 +110,13 @@ class BlogFilterByAuthor(BlogListView):
 
 class BlogSearchView(BlogListView):
     def get_queryset(self):
-        query = self.request.GET.get('query')
-        return super().get_queryset().filter(Q(title__contains=query) | Q(body__contains=query))
+        # 使用倒排索引检索, 结果按相关度排序并带有高亮摘要(摘要需要正文HTML)
+        return SearchResults(self.request.GET.get('query'), super().get_queryset().defer(None))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('query', '')
+        return context
 
 
 @require_http_methods(['GET', 'POST'])
@@ -100,9 +130,9 @@ def new_blog(request):
         form = BlogForm(request.POST)
         print(form)
         if form.is_valid():
-            author = get_object_or_404(MyUser, pk=request.user.pk)
             blog = form.save(commit=False)
-            blog.author = author
+            # 认证中间件已经取得用户, 不再重复查询
+            blog.author = request.user
             blog.save()
             messages.add_message(request, messages.SUCCESS, '博客发布成功!', extra_tags='success')
             return redirect(blog)
@@ -116,12 +146,11 @@ def new_blog(request):
 @login_required
 def new_comment(request, pk):
     blog = get_object_or_404(Blog, pk=pk)
-    user = get_object_or_404(MyUser, pk=request.user.pk)
     form = CommentForm(request.POST)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.blog = blog
-        comment.user = user
+        comment.user = request.user
         comment.save()
         messages.add_message(request, messages.SUCCESS, '评论发表成功!', extra_tags='success')
         return redirect(blog)
@@ -134,42 +163,201 @@ def new_comment(request, pk):
     })
 
 
-class BlogViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Blog.objects.all()  # 响应数据
+# 分析报告可选的排序方式
+PROFILE_SORT_KEYS = ['cumulative', 'tottime', 'ncalls']
+
+
+@staff_member_required
+def profile_list(request):
+    """按耗时从长到短列出保存的请求性能分析结果"""
+    return render(request, 'blog/profiles.html', context={'profiles': list_profiles()})
+
+
+@staff_member_required
+def profile_detail(request, profile_id):
+    """单个请求的分析报告, download参数下载cProfile原始结果"""
+    if 'download' in request.GET:
+        path = profile_path(profile_id)
+        if path is None:
+            raise Http404
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name)
+    sort = request.GET.get('sort')
+    result = load_profile(profile_id, sort=sort if sort in PROFILE_SORT_KEYS else 'cumulative')
+    if result is None:
+        raise Http404
+    info, report = result
+    return render(request, 'blog/profile.html', context={'info': info, 'report': report})
+
+
+# ASGI部署导出时在内存中缓冲的最大字节数, 超过后写入临时文件
+EXPORT_SPOOL_SIZE = 8 * 1024 * 1024
+
+
+@staff_member_required
+def export_blogs(request):
+    """
+    流式导出全部博客数据(NDJSON), 边查询边输出, 数据量再大也不会占用大量内存
+
+    ASGI部署时流式响应在事件循环中迭代, 其中不能执行查询, 因此在视图(工作线程)中先写入临时文件再返回
+    """
+    filename = f'blog-export-{timezone.localtime():%Y%m%d-%H%M%S}.ndjson'
+    if isinstance(request, ASGIRequest):
+        output = tempfile.SpooledTemporaryFile(EXPORT_SPOOL_SIZE)
+        for line in export_lines():
+            output.write(line.encode('utf-8'))
+        output.seek(0)
+        return FileResponse(output, as_attachment=True, filename=filename, content_type=EXPORT_CONTENT_TYPE)
+    response = StreamingHttpResponse(export_lines(), content_type=EXPORT_CONTENT_TYPE)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+class BlogViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Blog.objects.select_related('category', 'author')  # 响应数据
     filterset_class = BlogFilter  # 过滤器类
+    pagination_class = KeysetPagination  # 游标分页, 翻页耗时不随页数增长
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    throttle_scope = 'blogs'  # 限流频率
+    # 高性能序列化: 以values()取数据, 输出与序列化器相同
+    fast_serializers = {
+        'list': fast_blog_list_serializer,
+        'retrieve': fast_blog_retrieve_serializer,
+    }
+    # 响应缓存依赖的模型
+    cache_dependencies = {
+        'default': [Blog, Category, Tag, Comment],
+        'list_comments': [Comment],
+    }
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # 为不同的action定制查询, 避免逐行查询关联对象
+        if self.action == 'list':
+            return queryset.defer('body', 'body_html', 'toc')
+        elif self.action == 'list_comments':
+            return queryset.annotate(last_comment_time=Max('comment__created_time'))
+        return queryset
 
     def get_serializer_class(self):
         # 为不同的action定制不同的序列化器
         if self.action == 'list':
             return BlogListSerializer
+        elif self.action == 'search':
+            return BlogSearchSerializer
         else:
             return BlogRetrieveSerializer
 
+    def list_etag(self, request):
+        # 列表数据只在博客/分类/标签/评论(评论数)变化时改变
+        return make_etag(request, request.get_full_path(), request.accepted_renderer.format,
+                         get_generation(SIDEBAR), get_generation(COMMENTS))
+
+    def get_fast_serializer(self, request):
+        # JSON格式使用高性能序列化, 可浏览API仍使用序列化器
+        if request.accepted_renderer.format == 'json':
+            return self.fast_serializers.get(self.action)
+        return None
+
+    def list(self, request, *args, **kwargs):
+        # 先判断条件请求, 再读取响应缓存
+        return conditional_response(request, self.list_etag(request), None,
+                                    partial(self.cached_response, request, partial(self.list_response, request)))
+
+    def list_response(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        fast = self.get_fast_serializer(request)
+        if fast is not None:
+            queryset = fast.values(queryset)
+            serialize = fast.to_representation
+        else:
+            serialize = lambda rows: self.get_serializer(rows, many=True).data
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serialize(page))
+        return Response(serialize(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        fast = self.get_fast_serializer(request)
+
+        def get_response():
+            if fast is not None:
+                queryset = fast.values(self.filter_queryset(self.get_queryset()))
+                row = get_object_or_404_api(queryset, pk=self.kwargs[self.lookup_field])
+                pk, modified_time, comment_count = row['id'], row['modified_time'], row['comment_count']
+                serialize = lambda: Response(fast.to_representation([row])[0])
+            else:
+                instance = self.get_object()
+                pk, modified_time, comment_count = instance.pk, instance.modified_time, instance.comment_count
+
+                def serialize():
+                    # 确定需要序列化后再查询标签
+                    prefetch_related_objects([instance], 'tags')
+                    return Response(self.get_serializer(instance).data)
+
+            etag = make_etag(request, pk, modified_time, comment_count, request.accepted_renderer.format,
+                             get_generation(SIDEBAR))
+            return conditional_response(request, etag, modified_time, serialize)
+
+        # 缓存的响应中保存了校验数据, 命中缓存时无需查询博客
+        return self.cached_response(request, get_response)
+
     # 自定义行为(action名称为函数名)
     @action(methods=['GET'], detail=True, url_path='comments')
     def list_comments(self, request, *args, **kwargs):
-        # 根据 URL 传入的参数值(前提设置detail为True)获取到博客文章记录
-        blog = self.get_object()
-        # 获取文章下关联的全部评论
-        queryset = blog.comment_set.all().order_by("-created_time")
-        # 对评论列表进行分页，根据 URL 传入的参数获取指定页的评论
-        page = self.paginate_queryset(queryset)
-        # 序列化评论
-        serializer = CommentSerializer(page, many=True)
-        # 返回分页后的评论列表
-        return self.get_paginated_response(serializer.data)
-
-
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+        def get_response():
+            # 根据 URL 传入的参数值(前提设置detail为True)获取到博客文章记录
+            blog = self.get_object()
+            # 评论列表只在发表/删除评论时变化
+            etag = make_etag(request, request.get_full_path(), request.accepted_renderer.format,
+                             blog.last_comment_time, blog.comment_count)
+
+            def paginate():
+                # 获取文章下关联的全部评论(排序由游标分页决定)
+                queryset = blog.comment_set.all()
+                # 对评论列表进行分页，根据 URL 传入的参数获取指定页的评论
+                page = self.paginate_queryset(queryset)
+                # 序列化评论
+                serializer = CommentSerializer(page, many=True)
+                # 返回分页后的评论列表
+                return self.get_paginated_response(serializer.data)
+
+            return conditional_response(request, etag, blog.last_comment_time, paginate)
+
+        return self.cached_response(request, get_response)
+
+    # 检索结果按相关度排序, 使用页码分页
+    @action(methods=['GET'], detail=False, url_path='search', pagination_class=PageNumberPagination)
+    def search(self, request, *args, **kwargs):
+        def get_response():
+            # 在过滤后的博客中按相关度检索
+            results = SearchResults(request.query_params.get('query'), self.filter_queryset(self.get_queryset()))
+            page = self.paginate_queryset(results)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        # 索引只在博客变化时更新, 与列表使用相同的校验数据
+        return conditional_response(request, self.list_etag(request), None,
+                                    partial(self.cached_response, request, get_response))
+
+
+class TagViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    cache_dependencies = {'default': [Tag, Blog]}
 
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoryViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    cache_dependencies = {'default': [Category, Blog]}
 
 
 class CommentViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, viewsets.GenericViewSet):
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
+
+    @property
+    def throttle_scope(self):
+        # 只限制发表评论的频率
+        return None if self.request.method in permissions.SAFE_METHODS else 'comment_writes'
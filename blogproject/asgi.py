@@ -13,4 +13,5 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blogproject.settings')
 
+# ASGI请求的页面由异步视图处理, 见blog.middleware.async_views_middleware与ASYNC_ROOT_URLCONF
 application = get_asgi_application()
@@ -0,0 +1,4 @@
+"""ASGI部署使用的URL配置, 博客页面使用异步视图(由blog.middleware.async_views_middleware选择)"""
+from .urls import get_urlpatterns
+
+urlpatterns = get_urlpatterns('blog.async_urls')
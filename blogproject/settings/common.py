@@ -1,8 +1,14 @@
+import os
+import sys
+import tempfile
 from pathlib import Path
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# 是否在运行测试(python manage.py test)
+TESTING = sys.argv[1:2] == ['test']
+
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -27,20 +33,39 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # 统计请求耗时/SQL查询, 放在最外层
+    'blog.middleware.instrumentation_middleware',
+    'blog.middleware.async_views_middleware',
+    # 读写分离的路由状态, 需要在SessionMiddleware之前
+    'blog.middleware.replica_routing_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # 按需性能分析, 需要已认证的用户
+    'blog.middleware.profiling_middleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# 读写分离: 写入主库(default), 请求中的读取使用DATABASE_REPLICAS中的从库
+DATABASE_ROUTERS = ['blog.routers.PrimaryReplicaRouter']
+# 从库的数据库别名, 为空时全部使用主库
+DATABASE_REPLICAS = []
+# 客户端写入后多少秒内的读取仍使用主库(应大于复制延迟)
+REPLICA_STICKY_SECONDS = 5
+
 ROOT_URLCONF = 'blogproject.urls'
+# ASGI部署使用的URL配置(页面使用异步视图), 设为None时两种部署使用相同的同步视图
+ASYNC_ROOT_URLCONF = 'blogproject.async_urls'
+# 异步视图中侧边栏/评论等查询在独立线程(独立数据库连接)中与主内容并发执行
+ASYNC_CONCURRENT_QUERIES = True
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # 在Django模板后端的基础上统计模板渲染耗时
+        'BACKEND': 'blog.metrics.InstrumentedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -86,6 +111,12 @@ STATIC_URL = '/static/'
 # 自定义用户类
 AUTH_USER_MODEL = 'blog.MyUser'
 
+# 认证后端: 已登录用户从缓存读取, 用户信息变化时失效
+AUTHENTICATION_BACKENDS = ['blog.auth.CachedModelBackend']
+
+# 会话: 优先从缓存读取, 写入时同时写入数据库(缓存被清空时不会丢失登录状态)
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 # 主页
 INDEX_URL = 'blog:list'
 
@@ -96,6 +127,46 @@ PAGINATION_SETTINGS = {
     'SHOW_FIRST_PAGE_WHEN_INVALID': True,  # 当请求了不存在页，显示第一页
 }
 
+# 代码块高亮缓存设置
+CODE_HIGHLIGHT_CACHE = {
+    'MAX_ENTRIES': 1000,  # 最多缓存的代码块数量, 超出时淘汰最久未使用的
+}
+
+# 验证码池设置
+CAPTCHA_POOL = {
+    'SIZE': 100,  # 每个进程预先生成的验证码数量
+    'MIN_SIZE': 20,  # 剩余数量低于该值时在后台补充
+    'MAX_AGE': 10,  # 验证码在池中最多存放的分钟数
+    'BACKGROUND': True,  # 在后台线程中补充, 为False时在请求中补充
+}
+
+# 统计数据接口(/metrics/)设置
+METRICS = {
+    # 访问令牌, 设置后Prometheus需要以 Authorization: Bearer <TOKEN> 请求, 不再按IP判断
+    'TOKEN': None,
+    # 未设置TOKEN时允许访问的IP(Prometheus所在主机); 在反向代理之后所有请求都来自代理的IP, 必须设置TOKEN
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+    # 同一台主机上所有worker进程共享的统计数据文件, 抓取时汇总; 测试时为None, 使用每次运行独立的临时文件
+    'STORE': None if TESTING else os.path.join(tempfile.gettempdir(), 'blog-project-metrics.sqlite3'),
+    # 各进程写入统计数据的间隔(秒)
+    'SYNC_INTERVAL': 5,
+}
+
+# 请求性能分析设置
+PROFILING = {
+    'DIR': os.path.join(tempfile.gettempdir(), 'blog-project-profiles'),  # 结果保存目录
+    'SAMPLE_RATE': 0.0,  # 随机抽样分析的请求比例, 0表示只分析管理员指定的请求
+    'MAX_PROFILES': 200,  # 最多保留的结果数量
+}
+
+# 博客阅读量缓冲设置
+PAGE_VIEW_BUFFER = {
+    'FLUSH_THRESHOLD': 100,  # 未写入数据库的阅读量累计达到该值时写入
+    'FLUSH_INTERVAL': 10,  # 距上次写入超过该秒数时写入
+    # 启动定时写入线程并在进程退出时写入剩余的阅读量; 测试时关闭, 避免测试结束后写入开发数据库
+    'BACKGROUND': not TESTING,
+}
+
 # django-rest-framework设置
 REST_FRAMEWORK = {
     # 设置 DEFAULT_PAGINATION_CLASS 后，将全局启用分页，所有 List 接口的返回结果都会被分页。
@@ -107,13 +178,23 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.IsAuthenticatedOrReadOnly'],
     # 过滤器后端, 需要安装django_filters
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
-    # 限流类
+    # 限流类: 令牌桶保存在同一台主机上所有worker进程共享的SQLite文件中
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
+        'blog.throttling.AnonTokenBucketThrottle',
+        'blog.throttling.ScopedTokenBucketThrottle',
     ],
     # 限流频率
     'DEFAULT_THROTTLE_RATES': {
         'anon': '5/min',
+        'blogs': '60/min',  # 博客接口
+        'comment_writes': '10/min',  # 发表评论
+        'login': '10/min',  # 登录尝试
     }
 }
 
+# 限流令牌桶的存储位置, 同一台主机上的进程共享; 测试时为None, 使用每次运行独立的临时文件,
+# 不会清空运行中的网站的令牌桶
+THROTTLE_STORE = {
+    'PATH': None if TESTING else os.path.join(tempfile.gettempdir(), 'blog-project-throttle.sqlite3'),
+}
+
@@ -1,4 +1,5 @@
 from .common import *
+import os
 
 SECRET_KEY = 'g-)4nx^l)mv=@du%j#5pi9!%-r^9b@5lcg3=&**8us*2aap59_'
 
@@ -10,6 +11,15 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR.parent / 'blog-project.db',
-    }
+    },
+    # 本地测试读写分离使用的从库, 由python manage.py sync_replica从主库复制
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR.parent / 'blog-project-replica.db',
+    },
 }
 
+# 设置环境变量BLOG_USE_REPLICA=1时页面/接口从从库读取
+if os.environ.get('BLOG_USE_REPLICA'):
+    DATABASE_REPLICAS = ['replica']
+
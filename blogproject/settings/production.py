@@ -15,3 +15,24 @@ DATABASES = {
         'PASSWORD': 'root',
     }
 }
+
+# 从库: 环境变量DJANGO_DB_REPLICA_HOSTS为逗号分隔的从库主机, 其他设置与主库相同
+REPLICA_HOSTS = [host.strip() for host in os.environ.get('DJANGO_DB_REPLICA_HOSTS', '').split(',') if host.strip()]
+for i, host in enumerate(REPLICA_HOSTS):
+    DATABASES[f'replica{i}'] = {**DATABASES['default'], 'HOST': host}
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+# 统计数据接口: 部署在nginx之后, 所有请求的来源IP都是127.0.0.1, 只能通过令牌访问; 未设置令牌时不允许访问
+METRICS = {
+    **METRICS,
+    'TOKEN': os.environ.get('DJANGO_METRICS_TOKEN'),
+    'ALLOWED_IPS': [],
+}
+
+# 缓存: 多个worker进程需要共享缓存, 保证信号使缓存失效后所有进程都能读到新数据
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': '/var/tmp/blog-project-cache',
+    }
+}
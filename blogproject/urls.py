@@ -19,6 +19,8 @@ from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 from rest_framework import permissions
 
+from blog import assets, metrics
+
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -33,15 +35,24 @@ schema_view = get_schema_view(
     permission_classes=(permissions.AllowAny,),
 )
 
-urlpatterns = [
-    # 文档
-    re_path(r'^swagger(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), name='schema-json'),
-    path(r'swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path(r'redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
-    # 验证码
-    path('captcha/', include('captcha.urls')),
-
-    path('admin/', admin.site.urls),
-    path('blog/', include('blog.urls')),
-    path('login/', include('login.urls')),
-]
+
+def get_urlpatterns(blog_urls='blog.urls'):
+    return [
+        # 文档
+        re_path(r'^swagger(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), name='schema-json'),
+        path(r'swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
+        path(r'redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+        # 验证码(URL与captcha.urls相同, 使用验证码池)
+        path('captcha/', include('login.captcha_urls')),
+
+        path('admin/', admin.site.urls),
+        path('blog/', include(blog_urls)),
+        path('login/', include('login.urls')),
+        # 构建后的静态资源(带内容哈希), 响应允许浏览器永久缓存
+        re_path(assets.serve_pattern(), assets.serve, name='assets'),
+        # Prometheus统计数据
+        path('metrics/', metrics.metrics_view, name='metrics'),
+    ]
+
+
+urlpatterns = get_urlpatterns()
@@ -0,0 +1,203 @@
+import collections
+import datetime
+import json
+import logging
+import secrets
+import threading
+
+from captcha import views as captcha_views
+from captcha.conf import settings as captcha_settings
+from captcha.fields import CaptchaField, CaptchaTextInput
+from captcha.helpers import captcha_audio_url, captcha_image_url
+from captcha.models import CaptchaStore
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections
+from django.http import Http404, HttpResponse
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def image_cache_key(key, scale=1):
+    return f'captcha:image:{key}:{scale}'
+
+
+class CaptchaPool:
+    """
+    预先生成的验证码池
+
+    默认每次显示登录/注册表单都要写入一条验证码记录, 浏览器随后请求图片时再查询记录并绘制图片,
+    大量机器请求/login/时数据库和CPU压力都很大. 验证码池在后台线程中批量写入记录并绘制图片(图片存入缓存),
+    显示表单时从内存中取出一个未使用的验证码, 不访问数据库; 池中剩余数量低于min_size时在后台补充,
+    同时批量删除过期的记录
+
+    每个进程有自己的池, 验证码记录在数据库中, 任意进程都可以校验
+    """
+
+    def __init__(self, size=100, min_size=20, max_age=10, background=True):
+        self.size = size
+        self.min_size = min_size
+        # 验证码在池中最多存放的分钟数, 取出后还有CAPTCHA_TIMEOUT分钟的有效期
+        self.max_age = max_age
+        # 是否在后台线程中补充, 否则在取出验证码的请求中补充
+        self.background = background
+        self._entries = collections.deque()
+        self._lock = threading.Lock()
+        self._filling = False
+        self.generated = self.served = self.fallbacks = 0
+
+    def generate(self, count):
+        """批量生成验证码记录并绘制图片, 返回[(hashkey, 过期时间)]"""
+        get_challenge = captcha_settings.get_challenge()
+        expiration = timezone.now() + datetime.timedelta(
+            minutes=int(captcha_settings.CAPTCHA_TIMEOUT) + self.max_age
+        )
+        stores = []
+        for _ in range(count):
+            challenge, response = get_challenge()
+            stores.append(CaptchaStore(
+                challenge=challenge, response=response.lower(), hashkey=secrets.token_hex(20), expiration=expiration,
+            ))
+        CaptchaStore.objects.bulk_create(stores)
+
+        timeout = (expiration - timezone.now()).total_seconds()
+        for store in stores:
+            response = captcha_views.captcha_image(None, store.hashkey)
+            cache.set(image_cache_key(store.hashkey), response.content, timeout)
+        self.generated += count
+        return [(store.hashkey, expiration) for store in stores]
+
+    def fill(self):
+        """删除过期的验证码, 并将池补充到size个"""
+        try:
+            CaptchaStore.objects.filter(expiration__lte=timezone.now()).delete()
+            count = self.size - len(self._entries)
+            if count > 0:
+                self._entries.extend(self.generate(count))
+        finally:
+            with self._lock:
+                self._filling = False
+
+    def _fill_in_background(self):
+        try:
+            self.fill()
+        except Exception:
+            logger.exception('补充验证码池失败')
+        finally:
+            close_old_connections()
+
+    def refill(self):
+        """剩余数量低于min_size时补充, 同时只有一个线程在补充"""
+        with self._lock:
+            if self._filling or len(self._entries) >= self.min_size:
+                return
+            self._filling = True
+        if self.background:
+            threading.Thread(target=self._fill_in_background, name='captcha-pool', daemon=True).start()
+        else:
+            self.fill()
+
+    def pick(self):
+        """取出一个验证码, 池为空时直接生成"""
+        # 取出后至少还要有CAPTCHA_TIMEOUT分钟的有效期供用户填写
+        deadline = timezone.now() + datetime.timedelta(minutes=int(captcha_settings.CAPTCHA_TIMEOUT))
+        key = None
+        while key is None:
+            try:
+                key, expiration = self._entries.popleft()
+            except IndexError:
+                break
+            if expiration <= deadline:
+                key = None
+        self.refill()
+        if key is None:
+            self.fallbacks += 1
+            return CaptchaStore.generate_key()
+        self.served += 1
+        return key
+
+    def clear(self):
+        self._entries.clear()
+        self.generated = self.served = self.fallbacks = 0
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'generated': self.generated,
+            'served': self.served,
+            'fallbacks': self.fallbacks,
+        }
+
+
+_settings = getattr(settings, 'CAPTCHA_POOL', {})
+
+captcha_pool = CaptchaPool(
+    size=_settings.get('SIZE', 100),
+    min_size=_settings.get('MIN_SIZE', 20),
+    max_age=_settings.get('MAX_AGE', 10),
+    background=_settings.get('BACKGROUND', True),
+)
+
+
+class PooledCaptchaTextInput(CaptchaTextInput):
+    """从验证码池取验证码的输入框"""
+
+    def fetch_captcha_store(self, name, value, attrs=None, generator=None):
+        key = captcha_pool.pick()
+        self._value = [key, '']
+        self._key = key
+        self.id_ = self.build_attrs(attrs).get('id', None)
+
+
+class PooledCaptchaField(CaptchaField):
+    """
+    使用验证码池的验证码字段
+
+    校验时以一条DELETE语句同时完成校验与删除(防止重复使用), 不再每次提交都删除过期记录
+    (由验证码池补充时批量删除)
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('widget', PooledCaptchaTextInput())
+        super().__init__(*args, **kwargs)
+
+    def clean(self, value):
+        super(CaptchaField, self).clean(value)
+        key, response, value[1] = value[0], (value[1] or '').strip().lower(), ''
+        if not self.required and not response:
+            return value
+        # 测试模式下输入passed直接通过
+        passed = captcha_settings.CAPTCHA_TEST_MODE and response == 'passed'
+        used = CaptchaStore.objects.filter(hashkey=key)
+        if not passed:
+            used = used.filter(response=response, expiration__gt=timezone.now())
+        deleted, _ = used.delete()
+        cache.delete_many([image_cache_key(key, scale) for scale in (1, 2)])
+        if not deleted and not passed:
+            raise ValidationError(self.error_messages['invalid'], code='invalid')
+        return value
+
+
+def captcha_image(request, key, scale=1):
+    """验证码图片, 优先使用验证码池预先绘制的图片"""
+    content = cache.get(image_cache_key(key, scale))
+    if content is not None:
+        return HttpResponse(content, content_type='image/png')
+    response = captcha_views.captcha_image(request, key, scale)
+    if response.status_code == 200:
+        cache.set(image_cache_key(key, scale), response.content, int(captcha_settings.CAPTCHA_TIMEOUT) * 60)
+    return response
+
+
+def captcha_refresh(request):
+    """刷新验证码, 从验证码池取出新的验证码"""
+    if request.headers.get('x-requested-with') != 'XMLHttpRequest':
+        raise Http404
+    key = captcha_pool.pick()
+    return HttpResponse(json.dumps({
+        'key': key,
+        'image_url': captcha_image_url(key),
+        'audio_url': captcha_audio_url(key) if captcha_settings.CAPTCHA_FLITE_PATH else None,
+    }), content_type='application/json')
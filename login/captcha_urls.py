@@ -0,0 +1,13 @@
+from django.urls import re_path
+
+from captcha import views
+
+from . import captcha
+
+# 与captcha.urls相同的URL与名称, 图片与刷新使用验证码池
+urlpatterns = [
+    re_path(r'image/(?P<key>\w+)/$', captcha.captcha_image, name='captcha-image', kwargs={'scale': 1}),
+    re_path(r'image/(?P<key>\w+)@2/$', captcha.captcha_image, name='captcha-image-2x', kwargs={'scale': 2}),
+    re_path(r'audio/(?P<key>\w+).wav$', views.captcha_audio, name='captcha-audio'),
+    re_path(r'refresh/$', captcha.captcha_refresh, name='captcha-refresh'),
+]
@@ -1,5 +1,6 @@
 from django import forms
-from captcha.fields import CaptchaField, CaptchaTextInput
+
+from .captcha import PooledCaptchaField, PooledCaptchaTextInput
 
 
 class LoginForm(forms.Form):
@@ -12,7 +13,7 @@ class LoginForm(forms.Form):
         max_length=256, label='密码',
         widget=forms.PasswordInput(attrs={'class': 'form-control', 'placeholder': "Password"})
     )
-    captcha = CaptchaField(label='验证码', widget=CaptchaTextInput(attrs={'class': 'form-control'}))
+    captcha = PooledCaptchaField(label='验证码', widget=PooledCaptchaTextInput(attrs={'class': 'form-control'}))
 
 
 class RegisterForm(forms.Form):
@@ -30,4 +31,4 @@ class RegisterForm(forms.Form):
         widget=forms.PasswordInput(attrs={'class': 'form-control'})
     )
     email = forms.EmailField(widget=forms.EmailInput(attrs={'class': 'form-control'}))
-    captcha = CaptchaField(label='验证码', widget=CaptchaTextInput(attrs={'class': 'form-control'}))
+    captcha = PooledCaptchaField(label='验证码', widget=PooledCaptchaTextInput(attrs={'class': 'form-control'}))
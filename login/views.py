@@ -8,6 +8,7 @@ from django.views.decorators.http import require_GET
 from django.conf import settings
 
 from .forms import LoginForm, RegisterForm
+from blog.throttling import rate_limit
 # 关联任意Django User拓展类
 from blog.models import MyUser as User
 
@@ -15,6 +16,7 @@ from blog.models import MyUser as User
 INDEX_URL = settings.INDEX_URL
 
 
+@rate_limit('login')
 def login(request):
     if request.user.is_authenticated:
         return redirect(INDEX_URL)